@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from regex_registry import register
+
+# Ancrages structurels des factures, repérés en une seule passe sur le texte
+ANCHORS = {
+    'facture': r'FACTURE',
+    'numero_client': r'N°\s*client',
+    'libelle': r'Libellé',
+    'detail_tva': r'Détail de la TVA',
+    'total_ht': r'Total\s+HT',
+    'total_ttc': r'Total\s+TTC',
+    'sous_total': r'Sous-total',
+    'page': r'Page\s+\d+\s+de\s+\d+',
+    'echeance': r'Echéance\(s\)',
+    'ugs': r'UGS',
+}
+
+ANCHOR_SCAN = register(
+    'anchors.scan',
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in ANCHORS.items())
+)
+
+Span = Tuple[int, int]
+
+class AnchorIndex:
+    """
+    Index des ancrages et des sections d'un texte de facture.
+
+    Le texte est parcouru une seule fois par une expression combinant tous
+    les ancrages. Les extracteurs cherchent ensuite leurs motifs dans leur
+    seule section via search(text, start, end), sans copier ni rescanner le
+    texte depuis le début :
+
+    - entete : du début du texte au tableau des articles
+    - articles : du tableau des articles aux totaux ; sur une facture de
+      plusieurs pages dont un tableau "Libellé" suit le premier "Détail de la
+      TVA", jusqu'au dernier "Détail de la TVA" qui suit le dernier tableau
+    - totaux : des totaux à la fin du texte
+
+    Une section dont les ancrages sont absents couvre tout le texte, ce qui
+    revient à la recherche sur le texte complet.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.positions: Dict[str, List[Span]] = {name: [] for name in ANCHORS}
+        for match in ANCHOR_SCAN.finditer(text):
+            self.positions[match.lastgroup].append(match.span())
+        self._sections = None
+
+    def all(self, name) -> List[Span]:
+        """Toutes les occurrences d'un ancrage, dans l'ordre du texte"""
+        return self.positions[name]
+
+    def first(self, name, start=0) -> Optional[Span]:
+        """Première occurrence d'un ancrage à partir de la position start"""
+        spans = self.positions[name]
+        index = bisect_left(spans, (start, start))
+        return spans[index] if index < len(spans) else None
+
+    def between(self, name, start, end) -> List[Span]:
+        """Occurrences d'un ancrage entièrement comprises dans [start, end)"""
+        spans = self.positions[name]
+        index = bisect_left(spans, (start, start))
+        found = []
+        while index < len(spans) and spans[index][1] <= end:
+            found.append(spans[index])
+            index += 1
+        return found
+
+    def pages(self) -> List[Span]:
+        """
+        Découpe le texte aux indicateurs "Page X de Y" (exclus des pages).
+
+        Le texte qui précède le premier indicateur forme la première page,
+        puis chaque page s'étend d'un indicateur au suivant.
+        """
+        markers = self.positions['page']
+        if not markers:
+            return []
+        pages = []
+        if markers[0][0] > 0:
+            pages.append((0, markers[0][0]))
+        for index, (_, marker_end) in enumerate(markers):
+            next_start = markers[index + 1][0] if index + 1 < len(markers) else len(self.text)
+            pages.append((marker_end, next_start))
+        return pages
+
+    def _line_start(self, position):
+        return self.text.rfind('\n', 0, position) + 1
+
+    def _compute_sections(self):
+        text_end = len(self.text)
+
+        # Début des articles : en-tête "Libellé" (MEG), sinon la ligne de
+        # description qui précède le premier code UGS (internet)
+        articles_start = None
+        libelle = self.first('libelle')
+        ugs = self.positions['ugs']
+        if libelle:
+            articles_start = libelle[0]
+        elif ugs:
+            ugs_line = self._line_start(ugs[0][0])
+            articles_start = self._line_start(ugs_line - 1) if ugs_line > 0 else 0
+
+        # Début des totaux : "Détail de la TVA", sinon le premier total HT/TTC,
+        # sinon le sous-total qui suit le dernier article internet
+        totals_start = None
+        detail = self.first('detail_tva', articles_start or 0)
+        if detail:
+            totals_start = detail[0]
+        else:
+            totals = [span for span in (self.first('total_ht', articles_start or 0),
+                                        self.first('total_ttc', articles_start or 0)) if span]
+            if totals:
+                totals_start = min(totals)[0]
+            elif ugs:
+                sous_total = self.first('sous_total', ugs[-1][1])
+                if sous_total:
+                    totals_start = sous_total[0]
+
+        # Facture sur plusieurs pages : un "Détail de la TVA" peut précéder le
+        # tableau d'articles d'une page suivante, dont les articles seraient
+        # sinon hors de la section
+        articles_end = totals_start if totals_start is not None else text_end
+        if libelle and detail:
+            last_libelle = self.positions['libelle'][-1]
+            if last_libelle[0] > detail[0]:
+                last_detail = self.positions['detail_tva'][-1]
+                articles_end = last_detail[0] if last_detail[0] > last_libelle[0] else text_end
+
+        header_end = articles_start if articles_start is not None else totals_start
+        self._sections = {
+            'document': (0, text_end),
+            'entete': (0, header_end if header_end is not None else text_end),
+            'articles': (articles_start or 0, articles_end),
+            'totaux': (totals_start or 0, text_end),
+        }
+
+    def section(self, name) -> Span:
+        """Bornes (début, fin) d'une section : document, entete, articles ou totaux"""
+        if self._sections is None:
+            self._compute_sections()
+        return self._sections[name]
+
+    def section_text(self, name) -> str:
+        """Texte d'une section (copie : préférer section() avec search(text, start, end))"""
+        start, end = self.section(name)
+        return self.text[start:end]
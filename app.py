@@ -1,20 +1,26 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import FileResponse
-import shutil
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
+import shutil
 import tempfile
 import uvicorn
 import logging
 import os
 from datetime import datetime
 import pytz
-from typing import List
-from pdf_extractor import extract_text_from_pdf
-from billing_extractor import InvoiceExtractor
-from create_invoice_excel import create_invoice_dataframe, format_excel
+from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pdf_extractor import extract_text_from_pdf, extract_texts_from_pdfs, get_text_cache
+from invoice_splitter import iter_parsed_invoices, split_invoices
+from create_invoice_excel import create_invoice_tables, excel_writer, write_invoice_sheets
+from parquet_export import PARQUET_EXPORT_ENABLED, export_parquet
+from jobs import DONE, JOBS_DIR, JobManager, JobStore, progress
+from reconciliation import RECONCILIATION_ENABLED, reconcile, report_path, write_reconciliation_report
 import json
 import traceback
-import pandas as pd
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -33,82 +39,130 @@ def generate_excel_filename():
     timestamp = current_time.strftime('%y%m%d%H%M%S')
     return f'factures_auto_{timestamp}.xlsx'
 
-def process_pdfs(pdf_paths):
-    """Traite les PDFs et génère un fichier Excel"""
-    logger.info(f"Starting PDF processing for paths: {pdf_paths}")
+def process_pdfs(pdf_files, output_dir=TEMP_DIR, executor=None):
+    """
+    Traite les PDFs et génère un fichier Excel dans output_dir
 
-    # Initialiser l'extracteur
-    extractor = InvoiceExtractor()
+    pdf_files contient des chemins de fichiers, ou des tuples (nom, contenu)
+    pour des PDF déjà en mémoire (bytes, memoryview ou objet fichier).
+    output_dir reçoit aussi factures.json et le rapport d'anomalies : un
+    dossier propre à chaque requête, pour que deux requêtes simultanées
+    n'écrivent pas les mêmes fichiers.
 
+    executor est le pool de processus du serveur (voir jobs.JobManager.pool),
+    partagé par toutes les requêtes pour l'extraction et l'analyse ; sans
+    lui, des pools sont créés pour l'appel.
+    """
     # Dictionnaire pour stocker les données des factures
     invoices_data = {}
 
-    # Traiter chaque PDF
-    for pdf_path in pdf_paths:
-        try:
-            logger.info(f"Processing file: {pdf_path}")
-
-            # Vérifier que le fichier existe
-            if not os.path.exists(str(pdf_path)):
-                logger.error(f"File not found: {pdf_path}")
-                continue
-
-            # Extraire le texte du PDF
-            logger.info("Extracting text...")
-            extracted_data = extract_text_from_pdf(str(pdf_path))
-            text = extracted_data.get('text', '')
-            logger.info(f"Extracted text length: {len(text)}")
-
-            # Extraire les données de la facture
-            logger.info("Extracting invoice data...")
-            data = extractor.extract_invoice_data(text)
+    # Associer un nom à chaque source et vérifier que les fichiers existent
+    named_sources = []
+    for pdf_file in pdf_files:
+        if isinstance(pdf_file, tuple):
+            named_sources.append(pdf_file)
+            continue
+        if not os.path.exists(str(pdf_file)):
+            logger.error(f"File not found: {pdf_file}")
+            continue
+        named_sources.append((Path(pdf_file).name, pdf_file))
+
+    logger.info(f"Starting PDF processing for files: {[name for name, _ in named_sources]}")
+
+    # Extraire le texte de tous les PDF en parallèle
+    logger.info("Extracting text...")
+    all_pages_text = extract_texts_from_pdfs([source for _, source in named_sources], executor=executor)
+    logger.info(f"PDF text cache: {get_text_cache().stats()}")
+
+    # Découper chaque PDF en factures : un PDF peut en contenir plusieurs
+    invoices = [
+        invoice
+        for (pdf_name, _), pages_text in zip(named_sources, all_pages_text)
+        for invoice in split_invoices(enumerate(pages_text), pdf_name)
+    ]
+    logger.info(f"{len(invoices)} invoice(s) found in {len(named_sources)} file(s)")
+
+    # Classer et analyser chaque facture (même moteur que Streamlit et create_invoice_excel),
+    # dans un pool de processus lorsqu'il y en a plusieurs (celui du serveur, ou un pool créé ici)
+    own_executor = None
+    if len(invoices) <= 1:
+        executor = None
+    elif executor is None:
+        executor = own_executor = ProcessPoolExecutor(max_workers=min(len(invoices), os.cpu_count() or 1))
+    try:
+        for invoice, classification, data in iter_parsed_invoices(invoices, executor):
+            logger.info(f"Processing invoice: {invoice.key} (pages {invoice.first_page + 1}-{invoice.last_page + 1})")
+            logger.info(f"Invoice type: {classification.type} (confidence {classification.confidence}, "
+                        f"{classification.pages_scanned} page(s) scanned)")
             logger.info(f"Extracted data: {data}")
 
-            # Calculer le nombre total d'articles
-            total_quantity = sum(article['quantite'] for article in data.get("invoice_data", {}).get("articles", []))
-
             # Stocker les données dans le format attendu par create_invoice_dataframe
-            invoices_data[pdf_path.name] = {
-                "text": text,
-                "data": {
-                    "type": data.get("invoice_data", {}).get("type", ""),
-                    "TOTAL": data.get("invoice_data", {}).get("TOTAL", {}),
-                    "articles": data.get("invoice_data", {}).get("articles", []),
-                    "nombre_articles": total_quantity,
-                    "Type_Vente": data.get("invoice_data", {}).get("Type_Vente", ""),
-                    "Réseau_Vente": data.get("invoice_data", {}).get("Réseau_Vente", ""),
-                    "commentaire": data.get("invoice_data", {}).get("commentaire", ""),
-                    "statut_paiement": data.get("invoice_data", {}).get("statut_paiement", ""),
-                    "numero_client": data.get("invoice_data", {}).get("numero_client", ""),
-                    "client_name": data.get("invoice_data", {}).get("client_name", ""),
-                    "date_facture": data.get("invoice_data", {}).get("date_facture", ""),
-                    "date_commande": data.get("invoice_data", {}).get("date_commande", ""),
-                    "numero_facture": data.get("invoice_data", {}).get("numero_facture", "")
-                }
+            invoices_data[invoice.key] = {
+                "text": invoice.text,
+                "data": data
             }
-        except Exception as e:
-            logger.error(f"Error processing {pdf_path}: {str(e)}")
-            logger.error(traceback.format_exc())
-            raise Exception(f"Error processing {pdf_path}: {str(e)}")
-
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing invoices: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise Exception(f"Error processing invoices: {str(e)}")
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown()
+
+    return write_results(invoices_data, Path(output_dir) / "factures.xlsx")
+
+def parse_pdf_file(name, pdf_path):
+    """
+    Analyse un PDF enregistré (fichier d'une tâche, voir jobs.JobManager)
+
+    Returns:
+        dict: Factures du PDF, au format de factures.json
+    """
+    pages_text = extract_text_from_pdf(str(pdf_path))
+    if not pages_text:
+        raise ValueError("No text extracted from the PDF")
+    return {
+        invoice.key: {"text": invoice.text, "data": data}
+        for invoice, _, data in iter_parsed_invoices(split_invoices(enumerate(pages_text), name))
+    }
+
+def write_results(invoices_data, excel_path):
+    """
+    Écrit factures.json, le classeur (et le rapport d'anomalies) dans le dossier
+    de excel_path, puis les tables Parquet
+    """
     try:
         # Sauvegarder les données JSON
         logger.info("Saving JSON data...")
-        json_path = TEMP_DIR / "factures.json"
+        json_path = excel_path.with_name("factures.json")
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(invoices_data, f, ensure_ascii=False, indent=2)
 
         # Générer le fichier Excel
         logger.info("Generating Excel file...")
-        excel_path = TEMP_DIR / "factures.xlsx"
 
-        # Créer le DataFrame
-        df = create_invoice_dataframe(invoices_data)
+        # Créer les DataFrame (feuille Factures et, en disposition normalisée, feuille Articles)
+        df, articles = create_invoice_tables(invoices_data)
+
+        # Rapprochement des montants (feuille Anomalies et rapport JSON)
+        anomalies = reconcile(df, articles) if RECONCILIATION_ENABLED else None
 
         # Sauvegarder avec le formatage
-        with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Factures', index=False)
-            format_excel(writer, df)
+        with excel_writer(excel_path) as writer:
+            write_invoice_sheets(writer, df, articles, anomalies)
+
+        if anomalies is not None:
+            report = write_reconciliation_report(anomalies, report_path(excel_path), len(df))
+            logger.info(f"Reconciliation: {len(anomalies)} anomaly(ies) for {len(df)} invoice(s), report {report}")
+
+        # Tables Parquet pour l'analyse (mêmes données que le classeur)
+        if PARQUET_EXPORT_ENABLED:
+            try:
+                logger.info(f"Parquet tables written to {export_parquet(df, articles)}")
+            except Exception as e:
+                logger.error(f"Error in Parquet export: {str(e)}")
 
         return excel_path
     except Exception as e:
@@ -116,11 +170,21 @@ def process_pdfs(pdf_paths):
         logger.error(traceback.format_exc())
         raise
 
+# Tâches d'analyse en arrière-plan (état conservé dans JOBS_DIR), créées au démarrage du serveur
+job_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    """Gestionnaire des tâches et du pool de processus ; 503 tant que le serveur démarre"""
+    if job_manager is None:
+        raise HTTPException(status_code=503, detail="Server is starting, try again shortly")
+    return job_manager
+
 @app.post("/analyze_pdfs/")
 async def analyze_pdfs(files: List[UploadFile] = File(...)):
+    manager = get_job_manager()
     try:
-        # Create a list to store processed PDF paths
-        pdf_paths = []
+        # Create a list to store the uploaded PDFs, kept in memory
+        pdf_files = []
 
         # Process each uploaded file
         for file in files:
@@ -128,18 +192,16 @@ async def analyze_pdfs(files: List[UploadFile] = File(...)):
             if not file.filename.endswith('.pdf'):
                 raise HTTPException(status_code=400, detail="All files must be PDFs")
 
-            # Create unique name for the file
-            pdf_name = f"input_{os.urandom(8).hex()}.pdf"
-            pdf_path = TEMP_DIR / pdf_name
-            pdf_paths.append(pdf_path)
-
-            # Save the uploaded PDF
-            with pdf_path.open("wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Read the uploaded PDF (no temporary file needed for the extraction)
+            pdf_files.append((file.filename, await file.read()))
 
+        # Dossier propre à la requête, supprimé une fois la réponse envoyée
+        output_dir = Path(tempfile.mkdtemp(dir=TEMP_DIR))
+        pool = manager.pool()
         try:
-            # Process all PDFs (maintenant appel direct à la fonction locale)
-            excel_path = process_pdfs(pdf_paths)
+            # Process all PDFs in a worker thread, without blocking the event loop,
+            # in the worker process pool shared with the background jobs
+            excel_path = await run_in_threadpool(process_pdfs, pdf_files, output_dir, pool)
 
             if not excel_path.exists():
                 raise HTTPException(status_code=500, detail="Excel file was not created")
@@ -156,35 +218,90 @@ async def analyze_pdfs(files: List[UploadFile] = File(...)):
                 path=excel_path,
                 filename=excel_filename,
                 media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                background=None,  # Prevent automatic deletion
+                background=BackgroundTask(shutil.rmtree, output_dir, ignore_errors=True),
                 headers=headers
             )
 
         except Exception as e:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            if isinstance(e, BrokenProcessPool):
+                # A worker process died: the next request gets a new pool
+                manager.discard_pool(pool)
             logger.error(f"Error processing PDFs: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error processing PDFs: {str(e)}")
 
-        finally:
-            # Clean up temporary files
-            for pdf_path in pdf_paths:
-                try:
-                    if pdf_path.exists():
-                        pdf_path.unlink()
-                except Exception as e:
-                    logger.error(f"Error cleaning up files: {str(e)}")
-
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def job_status(state):
+    """État d'une tâche renvoyé par l'API, avec son avancement et l'URL du résultat"""
+    return {
+        **state,
+        "progress": progress(state),
+        "result_url": f"/jobs/{state['id']}/result" if state["status"] == DONE else None,
+    }
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(files: List[UploadFile] = File(...)):
+    """Enregistre les PDF et renvoie aussitôt l'identifiant de la tâche, traitée en arrière-plan"""
+    pdf_files = []
+    for file in files:
+        if not file.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="All files must be PDFs")
+        pdf_files.append((file.filename, await file.read()))
+
+    state = await run_in_threadpool(get_job_manager().submit, pdf_files)
+    return job_status(state)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """État de la tâche et de chacun de ses fichiers"""
+    state = get_job_manager().store.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(state)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Classeur produit par la tâche, envoyé par blocs"""
+    store = get_job_manager().store
+    state = store.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if state["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {state['status']}, no result available")
+
+    return FileResponse(
+        path=store.result_path(job_id),
+        filename=generate_excel_filename(),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
 # Nettoyage périodique des fichiers temporaires (optionnel)
 @app.on_event("startup")
 async def startup_event():
+    global job_manager
     try:
-        for file in TEMP_DIR.glob("*"):
-            file.unlink()
+        for path in TEMP_DIR.glob("*"):
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
     except Exception as e:
         logger.error(f"Erreur lors du nettoyage initial: {str(e)}")
 
+    # Supprimer les tâches expirées, puis reprendre celles interrompues par l'arrêt du serveur
+    job_manager = JobManager(JobStore(JOBS_DIR), parse_pdf_file, write_results)
+    job_manager.purge()
+    resumed = job_manager.resume()
+    if resumed:
+        logger.info(f"{resumed} job(s) resumed")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if job_manager is not None:
+        job_manager.shutdown()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, NamedTuple, Optional, Sequence
+from invoice_model import Invoice, Money
+from sheet_schema import ARTICLE_INVOICE_INDEX, ARTICLES, INVOICE_KEY
+
+# Référence standardisée de la ligne des frais d'expédition
+TRANSPORT_REFERENCE = "TRPF-TRANSP-0000"
+
+def round_half_up(values: np.ndarray) -> np.ndarray:
+    """
+    Arrondi commercial (0,5 -> 1, en s'éloignant de zéro) de chaque valeur à l'entier.
+
+    Même résultat que invoice_model._round_half_up : la partie fractionnaire
+    d'un float est exacte, la comparaison à 0,5 l'est donc aussi.
+    """
+    magnitude = np.abs(values)
+    whole = np.floor(magnitude)
+    return (np.sign(values) * (whole + (magnitude - whole >= 0.5))).astype(np.int64)
+
+def scale(cents: np.ndarray, factor) -> np.ndarray:
+    """Money.scale sur un tableau : montants en centimes multipliés par un facteur, arrondis au centime"""
+    return round_half_up(cents * factor)
+
+def _cents(values) -> np.ndarray:
+    return np.fromiter((int(value) for value in values), dtype=np.int64)
+
+class InvoiceSummary(NamedTuple):
+    """Valeurs d'une facture calculées à partir de ses articles"""
+    total_quantity: float
+    remise_meg: Money
+    taux_tva_premier_article: Optional[float]
+
+class ArticleBatch:
+    """
+    Articles de toutes les factures d'un lot, en colonnes NumPy.
+
+    Les articles sont dépliés en une table (une ligne par article, puis une
+    ligne de frais d'expédition par facture qui en a) : prix affiché, remise,
+    montant HT et TVA de chaque ligne sont calculés en centimes par
+    opérations vectorielles, selon le type de la facture, et les sommes par
+    facture par np.bincount. Les résultats sont identiques à ceux de
+    Money.scale, article par article.
+
+    Attributes:
+        invoice, position: Facture (index dans le lot) et rang de chaque ligne dans sa facture
+        reference, quantite: Référence et quantité de chaque ligne
+        prix, remise, montant_ht, tva: Montants de chaque ligne, en centimes
+        counts: Nombre de lignes de chaque facture
+    """
+
+    def __init__(self, factures: Sequence[Invoice]):
+        nb_invoices = len(factures)
+        kinds = np.array([facture.type for facture in factures], dtype=object)
+        invoice_meg, invoice_internet = kinds == 'meg', kinds == 'internet'
+        nb_articles = np.fromiter((len(facture.articles) for facture in factures), dtype=np.int64, count=nb_invoices)
+        items = [article for facture in factures for article in facture.articles]
+
+        # Table des articles dépliée : une valeur par article
+        invoice = np.repeat(np.arange(nb_invoices), nb_articles)
+        reference = np.array([article.reference for article in items], dtype=object)
+        quantite = np.fromiter((article.quantite for article in items), dtype=np.float64, count=len(items))
+        prix_unitaire = _cents(article.prix_unitaire for article in items)
+        prix_ttc = _cents(article.prix_ttc for article in items)
+        montant_ht = _cents(article.montant_ht for article in items)
+        taux_remise = np.fromiter((article.remise for article in items), dtype=np.float64, count=len(items))
+        tva_article = np.fromiter((np.nan if article.tva is None else article.tva for article in items),
+                                  dtype=np.float64, count=len(items))
+
+        # Taux de TVA de chaque facture (comme la colonne tva), appliqué aux articles d'acompte
+        total_ht = _cents(facture.totals.total_ht for facture in factures)
+        total_ttc = _cents(facture.totals.total_ttc for facture in factures)
+        first = np.cumsum(nb_articles) - nb_articles
+        premier_taux = np.full(nb_invoices, np.nan)
+        premier_taux[nb_articles > 0] = tva_article[first[nb_articles > 0]] / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(total_ht != 0, total_ttc / np.where(total_ht != 0, total_ht, 1) - 1, 0.2)
+        taux_tva = np.where(invoice_meg & (nb_articles > 0), np.nan_to_num(premier_taux), ratio)
+
+        meg, internet = invoice_meg[invoice], invoice_internet[invoice]
+        other = ~(meg | internet)
+        prix = prix_unitaire.copy()
+        remise = np.zeros(len(items), dtype=np.int64)
+        tva = np.zeros(len(items), dtype=np.int64)
+        # Quantité nulle : facteurs 1/q calculés mais jamais retenus
+        with np.errstate(divide='ignore'):
+            inverse_quantite = np.where(quantite != 0, 1 / np.where(quantite != 0, quantite, 1), 0.0)
+
+        # MEG : prix HT, TVA au taux de l'article, remise en euros HT
+        remise_ht = scale(prix_unitaire, taux_remise * quantite)
+        tva = np.where(meg, scale(montant_ht, np.nan_to_num(tva_article) / 100), tva)
+        remise = np.where(meg & (taux_remise > 0), remise_ht, remise)
+
+        # Internet : prix TTC (prix unitaire à défaut) ramené au HT, sauf CADEAU (TVA 0 %)
+        ttc = np.where(prix_ttc != 0, prix_ttc, prix_unitaire)
+        cadeau = np.char.find(np.char.upper(reference.astype(str)), 'CADEAU') >= 0
+        gift, paid = internet & cadeau, internet & ~cadeau
+        taux_internet = np.where(np.isnan(tva_article), 20.0, tva_article) / 100
+        prix = np.where(gift, ttc, np.where(paid, scale(ttc, 1 / 1.20), prix))
+        montant_ht = np.where(gift, scale(ttc, quantite), np.where(paid, scale(ttc, quantite / 1.20), montant_ht))
+        tva = np.where(paid, scale(ttc, quantite / 1.20 * taux_internet), tva)
+
+        # Acompte : montant HT ou prix unitaire déduit de l'autre, TVA au taux de la facture
+        fill_montant = other & (montant_ht == 0) & (prix_unitaire > 0)
+        fill_prix = other & ~fill_montant & (prix_unitaire == 0) & (montant_ht > 0) & (quantite > 0)
+        montant_ht = np.where(fill_montant, scale(prix_unitaire, quantite), montant_ht)
+        prix_unitaire = np.where(fill_prix, scale(montant_ht, inverse_quantite), prix_unitaire)
+        prix = np.where(other, prix_unitaire, prix)
+        tva = np.where(other, scale(montant_ht, taux_tva[invoice]), tva)
+
+        # Prix unitaire égal au montant HT alors que la quantité est > 1 : prix recalculé
+        same = ~internet & (montant_ht == prix_unitaire) & (quantite > 1)
+        prix = np.where(same, scale(montant_ht, inverse_quantite), prix)
+
+        # Frais d'expédition : une ligne de plus (gratuite si seule la description est connue)
+        frais = _cents(facture.frais_expedition for facture in factures)
+        shipped = np.flatnonzero((frais > 0) | np.array([bool(facture.expedition_description) for facture in factures],
+                                                        dtype=bool))
+        frais = frais[shipped]
+        frais_ht = np.where(frais > 0, scale(frais, 1 / 1.20), 0)
+        frais_prix = np.where(invoice_internet[shipped], np.where(frais > 0, frais, 0), frais_ht)
+        frais_tva = np.where(frais > 0, scale(frais, 0.20 / 1.20), 0)
+
+        # Lignes regroupées par facture, frais d'expédition après les articles (tri stable)
+        order = np.argsort(np.concatenate([invoice, shipped]), kind='stable')
+        self.invoice = np.concatenate([invoice, shipped])[order]
+        self.reference = np.concatenate([reference, np.full(len(shipped), TRANSPORT_REFERENCE, dtype=object)])[order]
+        self.quantite = np.concatenate([quantite, np.ones(len(shipped))])[order]
+        self.prix = np.concatenate([prix, frais_prix])[order]
+        self.remise = np.concatenate([remise, np.zeros(len(shipped), dtype=np.int64)])[order]
+        self.montant_ht = np.concatenate([montant_ht, frais_ht])[order]
+        self.tva = np.concatenate([tva, frais_tva])[order]
+        self.counts = np.bincount(self.invoice, minlength=nb_invoices)
+        self.position = np.arange(len(self.invoice)) - np.repeat(np.cumsum(self.counts) - self.counts, self.counts)
+
+        # Sommes par facture, dans l'ordre des articles
+        self._total_quantity = np.bincount(invoice, weights=quantite, minlength=nb_invoices)
+        self._remise_meg = np.bincount(invoice, weights=remise_ht, minlength=nb_invoices).astype(np.int64)
+        self._premier_taux = premier_taux
+
+    def __len__(self):
+        return len(self.invoice)
+
+    def summary(self, index: int) -> InvoiceSummary:
+        """Valeurs calculées pour la facture index du lot"""
+        premier_taux = self._premier_taux[index]
+        return InvoiceSummary(float(self._total_quantity[index]), Money(int(self._remise_meg[index])),
+                              None if np.isnan(premier_taux) else float(premier_taux))
+
+    def fill_slots(self, columns: Dict[str, np.ndarray], rows: np.ndarray, slots: int):
+        """
+        Remplit les colonnes d'articles ref1..slots, q1.., prix.., r€.., ht.., tva€.. du builder.
+
+        Args:
+            columns (dict): Colonnes du builder (voir invoice_frame.InvoiceFrameBuilder)
+            rows (ndarray): Ligne du builder de chaque facture du lot (-1 si elle n'a pas été écrite)
+            slots (int): Nombre de colonnes d'articles ; les lignes suivantes sont ignorées
+        """
+        target = rows[self.invoice]
+        kept = (target >= 0) & (self.position < slots)
+        fields = {'ref': self.reference, 'q': self.quantite, 'prix': self.prix / 100, 'r€': self.remise / 100,
+                  'ht': self.montant_ht / 100, 'tva€': self.tva / 100}
+        for slot in range(slots):
+            selected = kept & (self.position == slot)
+            if not selected.any():
+                break
+            for field, values in fields.items():
+                columns[f'{field}{slot + 1}'][target[selected]] = values[selected]
+
+    def to_frame(self, keys: np.ndarray, numeros: np.ndarray, rows: np.ndarray) -> pd.DataFrame:
+        """
+        Feuille Articles (sheet_schema.ARTICLES) des factures écrites, une ligne par article,
+        indexée par la ligne du builder de sa facture (ARTICLE_INVOICE_INDEX).
+
+        Args:
+            keys (ndarray): Clé (INVOICE_KEY) de chaque ligne du builder
+            numeros (ndarray): N° Syst. de chaque ligne du builder
+            rows (ndarray): Ligne du builder de chaque facture du lot (-1 si elle n'a pas été écrite)
+        """
+        target = rows[self.invoice]
+        kept = target >= 0
+        values = {
+            INVOICE_KEY: keys[target[kept]],
+            'N° Syst.': numeros[target[kept]],
+            'ligne': self.position[kept] + 1,
+            'supfam': np.full(kept.sum(), '', dtype=object),
+            'fam': np.full(kept.sum(), '', dtype=object),
+            'ref': self.reference[kept],
+            'q': self.quantite[kept],
+            'prix': self.prix[kept] / 100,
+            'r€': self.remise[kept] / 100,
+            'ht': self.montant_ht[kept] / 100,
+            'tva€': self.tva[kept] / 100,
+        }
+        return pd.DataFrame({spec.name: np.asarray(values[spec.name], dtype=spec.dtype) for spec in ARTICLES},
+                            columns=ARTICLES.headers, index=pd.Index(target[kept], name=ARTICLE_INVOICE_INDEX))
@@ -0,0 +1,116 @@
+"""
+Compare les moteurs d'extraction de texte : vitesse et données de facture obtenues.
+
+Pour chaque moteur, le texte de chaque PDF est extrait sans cache, regroupé en
+factures puis analysé par invoice_engine.parse_invoice. Les données sont
+comparées à celles obtenues avec pdfplumber (moteur de référence).
+
+Usage :
+    python benchmarks/bench_backends.py data_factures/facturesv11 [--repeat 3] [--details]
+"""
+import argparse
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdf_extractor import TEXT_BACKENDS, extract_text_from_pdf
+from invoice_engine import parse_invoice
+
+REFERENCE_BACKEND = "pdfplumber"
+
+def time_backend(pdf_paths, backend, repeat):
+    """Retourne (meilleur temps total, textes par PDF)"""
+    best = None
+    texts = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = [extract_text_from_pdf(str(pdf_path), use_cache=False, backend=backend) for pdf_path in pdf_paths]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, texts
+
+def group_invoices(pages_text):
+    """Regroupe les pages par numéro de facture (mêmes règles que process_pdf_file)"""
+    invoices = []
+    current_num = None
+    for text in pages_text:
+        if not text.strip():
+            continue
+        fac_match_meg = re.search(r'N°\s*:\s*([A-Z0-9]+)', text)
+        fac_match_internet = re.search(r'N° de facture\s*:\s*([^\n]+)', text)
+        page_num = None
+        if fac_match_meg:
+            page_num = fac_match_meg.group(1).strip()
+        elif fac_match_internet:
+            page_num = fac_match_internet.group(1).strip()
+
+        if invoices and current_num and page_num and current_num == page_num:
+            invoices[-1][1].append(text)
+        else:
+            invoices.append((page_num, [text]))
+            current_num = page_num
+    return invoices
+
+def parse_invoices(pdf_paths, texts):
+    """Analyse les factures de chaque PDF, indexées par (fichier, rang, numéro)"""
+    results = {}
+    for pdf_path, pages_text in zip(pdf_paths, texts):
+        for rank, (invoice_num, pages) in enumerate(group_invoices(pages_text)):
+            # parse_invoice est bavard : on ne garde que le résultat
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    data = parse_invoice("\n\n".join(pages), use_cache=False)
+                except Exception as e:
+                    data = {'erreur': str(e)}
+            results[(pdf_path.name, rank, invoice_num)] = data
+    return results
+
+def diff_fields(reference, other):
+    """Liste des champs de premier niveau dont la valeur diffère"""
+    keys = sorted(set(reference) | set(other))
+    return [key for key in keys if reference.get(key) != other.get(key)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Dossier contenant les PDF")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (le meilleur temps est gardé)")
+    parser.add_argument("--details", action="store_true", help="Afficher les champs différents par facture")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(Path(args.folder).glob("*.pdf"))
+    if not pdf_paths:
+        print(f"Aucun PDF dans {args.folder}")
+        return
+
+    runs = {}
+    for backend in TEXT_BACKENDS:
+        elapsed, texts = time_backend(pdf_paths, backend, args.repeat)
+        runs[backend] = (elapsed, sum(len(pages) for pages in texts), parse_invoices(pdf_paths, texts))
+
+    reference = runs[REFERENCE_BACKEND][2]
+    print(f"{len(pdf_paths)} PDF, {len(reference)} factures (référence : {REFERENCE_BACKEND})")
+    print(f"{'moteur':<12}{'ms/page':>10}{'accélération':>14}{'identiques':>12}")
+    for backend, (elapsed, nb_pages, invoices) in runs.items():
+        identical = 0
+        differences = []
+        for key, ref_data in reference.items():
+            fields = diff_fields(ref_data, invoices.get(key, {}))
+            if fields:
+                differences.append((key, fields))
+            else:
+                identical += 1
+        speedup = runs[REFERENCE_BACKEND][0] / elapsed
+        print(f"{backend:<12}{elapsed / max(nb_pages, 1) * 1000:>10.2f}{'x%.2f' % speedup:>14}"
+              f"{f'{identical}/{len(reference)}':>12}")
+        if args.details:
+            for (pdf_name, rank, invoice_num), fields in differences:
+                print(f"    {pdf_name} #{rank} ({invoice_num}) : {', '.join(fields)}")
+
+if __name__ == "__main__":
+    main()
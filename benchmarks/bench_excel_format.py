@@ -0,0 +1,106 @@
+"""
+Coût de la mise en forme Excel (format_excel) selon le nombre de lignes.
+
+Les factures sont celles d'un factures.json (--json) ou, par défaut, des
+factures MEG synthétiques, répétées jusqu'au nombre de lignes demandé. Pour
+chaque taille, le DataFrame est construit par create_invoice_dataframe puis
+format_excel est mesuré sur une feuille en mémoire :
+- ancien calcul : conversion en texte et len() sur chaque cellule de chaque colonne
+- vectorisé : column_widths sur toutes les lignes
+- échantillon : column_widths limité à --sample lignes
+
+Usage :
+    python benchmarks/bench_excel_format.py [--rows 1000 10000 50000] [--sample 5000] [--json factures.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from create_invoice_excel import WIDTH_SAMPLE_ROWS, column_widths, create_invoice_dataframe, format_excel
+from invoice_engine import empty_invoice_data
+
+def synthetic_invoice(number):
+    """Facture MEG de 1 à 6 articles, aux montants variables"""
+    data = empty_invoice_data('meg')
+    for i in range(1 + number % 6):
+        quantite = 1 + (number + i) % 9
+        prix = round(2.5 + (number * 7 + i * 13) % 900, 2)
+        data['articles'].append({
+            'reference': f'LEPF-REF{i:03d}-{number % 10000:04d}',
+            'description': f'Article {i}',
+            'quantite': float(quantite),
+            'prix_unitaire': prix,
+            'remise': 0.1 if i % 3 == 0 else 0.0,
+            'montant_ht': round(prix * quantite, 2),
+            'tva': 20.0
+        })
+    total_ht = round(sum(article['montant_ht'] for article in data['articles']), 2)
+    data['TOTAL'].update({'total_ht': total_ht, 'tva': round(total_ht * 0.2, 2), 'total_ttc': round(total_ht * 1.2, 2)})
+    data.update({
+        'numero_facture': f'FAC{number:08d}',
+        'client_name': f'CLIENT {number % 500}',
+        'date_facture': f'2025-{1 + number % 12:02d}-{1 + number % 28:02d}',
+        'Type_Vente': '20.01',
+        'Réseau_Vente': '20.01.03',
+        'nombre_articles': len(data['articles'])
+    })
+    return {'text': '', 'data': data}
+
+def load_invoices(json_path, nb_rows):
+    """nb_rows factures, en répétant celles du fichier JSON ou des factures synthétiques"""
+    if json_path:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            source = list(json.load(f).values())
+        return {f'facture_{i}': source[i % len(source)] for i in range(nb_rows)}
+    return {f'facture_{i}': synthetic_invoice(i) for i in range(nb_rows)}
+
+def legacy_widths(df):
+    """Ancien calcul : une conversion et un appel à len() par cellule"""
+    return [max(df[col].map(lambda value: len(str(value))).max(), len(str(col))) + 2 for col in df.columns]
+
+def time_format(df, sample_rows):
+    """Temps de format_excel sur une feuille en mémoire (en-têtes seulement)"""
+    with pd.ExcelWriter(io.BytesIO(), engine='xlsxwriter') as writer:
+        df.head(0).to_excel(writer, sheet_name='Factures', index=False)
+        start = time.perf_counter()
+        format_excel(writer, df, sample_rows)
+        return time.perf_counter() - start
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000], help="Nombres de lignes mesurés")
+    parser.add_argument("--sample", type=int, default=WIDTH_SAMPLE_ROWS, help="Lignes lues en mode échantillon")
+    parser.add_argument("--json", help="factures.json servant de modèle (factures synthétiques sinon)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Ne pas mesurer l'ancien calcul")
+    args = parser.parse_args()
+
+    print(f"{'lignes':>8}{'DataFrame':>12}{'ancien':>12}{'vectorisé':>12}{'échantillon':>13}{'format_excel':>14}")
+    for nb_rows in args.rows:
+        invoices = load_invoices(args.json, nb_rows)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            df = create_invoice_dataframe(invoices)
+            build = time.perf_counter() - start
+
+        legacy = "" if args.skip_legacy else f"{timed(legacy_widths, df) * 1000:>10.0f}ms"
+        full = timed(column_widths, df, 0)
+        sampled = timed(column_widths, df, args.sample)
+        formatting = time_format(df, args.sample)
+        print(f"{len(df):>8}{build * 1000:>10.0f}ms{legacy:>12}{full * 1000:>10.0f}ms"
+              f"{sampled * 1000:>11.0f}ms{formatting * 1000:>12.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Mémoire et temps de l'écriture du classeur, avec ou sans export en flux.
+
+Les factures MEG synthétiques de bench_excel_format sont générées une à une
+(comme lors de l'analyse des PDF) puis écrites dans un classeur temporaire :
+- DataFrame : toutes les factures, create_invoice_dataframe, to_excel et format_excel
+- flux : StreamingExcelWriter (xlsxwriter en mode constant_memory), par lots de factures
+
+Le pic de mémoire est mesuré par tracemalloc (allocations Python et numpy),
+pour la disposition large (--layout wide) ou normalisée (--layout articles).
+
+Usage :
+    python benchmarks/bench_excel_stream.py [--rows 100 10000 50000] [--layout wide] [--skip-dataframe]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_excel_format import synthetic_invoice
+from functools import partial
+from create_invoice_excel import create_invoice_tables, excel_writer, write_invoice_sheets
+from excel_stream import StreamingExcelWriter
+from sheet_schema import ARTICLES, FACTURES_NORMALISEES
+
+def iter_invoices(nb_rows):
+    for i in range(nb_rows):
+        yield f'facture_{i}', synthetic_invoice(i)
+
+def write_dataframe(path, nb_rows, layout):
+    invoices = dict(iter_invoices(nb_rows))
+    df, articles = create_invoice_tables(invoices, layout)
+    with excel_writer(path) as writer:
+        write_invoice_sheets(writer, df, articles)
+
+def write_stream(path, nb_rows, layout):
+    build_frames = partial(create_invoice_tables, layout=layout)
+    if layout == 'articles':
+        writer = StreamingExcelWriter(path, build_frames, FACTURES_NORMALISEES, ARTICLES)
+    else:
+        writer = StreamingExcelWriter(path, build_frames)
+    with writer:
+        for key, invoice in iter_invoices(nb_rows):
+            writer.write_invoice(key, invoice)
+
+def measure(func, nb_rows, layout):
+    """(durée en secondes, pic de mémoire en Mo, taille du classeur en Mo)"""
+    # Les messages sont jetés : un tampon en mémoire fausserait la mesure
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        start = time.perf_counter()
+        path = Path(tmp) / 'factures.xlsx'
+        func(path, nb_rows, layout)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = path.stat().st_size
+    return elapsed, peak / 1e6, size / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000, 50000], help="Nombres de factures mesurés")
+    parser.add_argument("--layout", choices=["wide", "articles"], default="wide", help="Disposition du classeur")
+    parser.add_argument("--skip-dataframe", action="store_true", help="Ne pas mesurer l'écriture par DataFrame")
+    args = parser.parse_args()
+
+    print(f"{'factures':>9}{'DataFrame':>12}{'pic':>10}{'flux':>12}{'pic':>10}{'fichier':>10}")
+    for nb_rows in args.rows:
+        dataframe = "" if args.skip_dataframe else "{:>10.1f}s{:>8.1f}Mo".format(
+            *measure(write_dataframe, nb_rows, args.layout)[:2])
+        stream = "{:>10.1f}s{:>8.1f}Mo{:>8.1f}Mo".format(*measure(write_stream, nb_rows, args.layout))
+        print(f"{nb_rows:>9}{dataframe:>22}{stream}")
+
+if __name__ == "__main__":
+    main()
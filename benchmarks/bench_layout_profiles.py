@@ -0,0 +1,61 @@
+"""
+Compare le temps d'extraction par page : page entière contre régions d'un profil.
+
+Usage :
+    python benchmarks/bench_layout_profiles.py data_factures/facturesv11 [--profile auto] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pdfplumber
+from layout_profiles import extract_page_regions
+
+def time_pages(pdf_paths, extract_page, repeat):
+    """Retourne (meilleur temps total, nombre de pages, nombre de caractères extraits)"""
+    best = None
+    for _ in range(repeat):
+        nb_pages = 0
+        nb_chars = 0
+        elapsed = 0.0
+        for pdf_path in pdf_paths:
+            with pdfplumber.open(pdf_path) as pdf:
+                for page in pdf.pages:
+                    # Le parsing des caractères est commun aux deux modes : on le sort de la mesure
+                    page.chars
+                    start = time.perf_counter()
+                    text = extract_page(page)
+                    elapsed += time.perf_counter() - start
+                    nb_pages += 1
+                    nb_chars += len(text)
+                    page.close()
+        if best is None or elapsed < best[0]:
+            best = (elapsed, nb_pages, nb_chars)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Dossier contenant les PDF")
+    parser.add_argument("--profile", default="auto", help="Profil de layout_profiles (auto, meg, internet, acompte)")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions (le meilleur temps est gardé)")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(Path(args.folder).glob("*.pdf"))
+    if not pdf_paths:
+        print(f"Aucun PDF dans {args.folder}")
+        return
+
+    full = time_pages(pdf_paths, lambda page: page.extract_text() or "", args.repeat)
+    regions = time_pages(pdf_paths, lambda page: extract_page_regions(page, args.profile), args.repeat)
+
+    print(f"{len(pdf_paths)} PDF, {full[1]} pages")
+    print(f"{'mode':<12}{'ms/page':>10}{'caractères':>12}")
+    for name, (elapsed, nb_pages, nb_chars) in (("page entière", full), ("régions", regions)):
+        print(f"{name:<12}{elapsed / nb_pages * 1000:>10.2f}{nb_chars:>12}")
+    print(f"Accélération par page : x{full[0] / regions[0]:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Relecture des factures exportées : classeur Excel contre tables Parquet.
+
+Les factures MEG synthétiques de bench_excel_format sont écrites une fois
+dans un classeur (comme factures_auto_*.xlsx) et dans les tables Parquet
+(parquet_export), puis relues :
+- Excel : pandas.read_excel (openpyxl) de la feuille Factures
+- Parquet : pandas.read_parquet des dossiers factures et articles (toutes partitions)
+
+Usage :
+    python benchmarks/bench_parquet_read.py [--rows 1000 10000]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_excel_format import load_invoices
+from create_invoice_excel import create_invoice_tables, excel_writer, write_invoice_sheets
+from parquet_export import export_parquet
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Nombres de factures mesurés")
+    args = parser.parse_args()
+
+    print(f"{'factures':>9}{'Excel':>12}{'Parquet':>12}")
+    for nb_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                df, articles = create_invoice_tables(load_invoices(None, nb_rows), 'wide')
+            excel_path = Path(tmp) / 'factures.xlsx'
+            with excel_writer(excel_path) as writer:
+                write_invoice_sheets(writer, df, articles)
+            root = export_parquet(df, articles, 'bench', Path(tmp) / 'parquet')
+
+            excel = timed(pd.read_excel, excel_path, sheet_name='Factures')
+            parquet = timed(lambda: (pd.read_parquet(root / 'factures'), pd.read_parquet(root / 'articles')))
+        print(f"{nb_rows:>9}{excel * 1000:>10.0f}ms{parquet * 1000:>10.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Temps d'analyse sur des textes dégénérés ou malveillants (retour arrière des regex).
+
+Chaque texte du corpus est analysé par invoice_engine.parse_invoice avec chacun
+des parseurs (meg, internet, acompte), puis par InvoiceExtractor. Le budget de
+temps par motif (regex_registry) borne chaque appel : le rapport donne le temps
+total par texte, les motifs les plus coûteux et ceux qui ont dépassé leur
+budget (remplacés par leur motif de secours).
+
+--compare-re exécute aussi les motifs avec le module re, sans limite de temps,
+sur un corpus réduit (--re-size) : à réserver aux petites tailles.
+
+Usage :
+    python benchmarks/bench_pathological.py [--size 20000] [--budget 0.2] [--compare-re]
+"""
+import argparse
+import contextlib
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import regex_registry
+from billing_extractor import InvoiceExtractor
+from invoice_engine import PARSERS, parse_invoice
+from regex_registry import REGISTRY
+
+# Page de facture MEG typique, répétée pour simuler une page énorme
+SAMPLE_PAGE = (
+    "FACTURE\nN° : FAC00000123\nDate : 12/03/2025\nN° client : CLT00042\nSURF SHOP SARL\n"
+    "Libellé Qté P.U. HT Remise Montant HT TVA\n"
+    "LEPF-JONC00-5000 - Planche 7'2 2,00 450,00 € 10,00% 810,00 € 20,00%\n"
+    "Détail de la TVA\nTotal HT 835,00 €\nTVA 167,00 €\nTotal TTC 1 002,00 €\n"
+    "Echéance(s) Acompte de 100,00 € au 15/03/2025\nRèglement : virement\nPage 1 de 1\n"
+)
+
+def build_corpus(size):
+    """Textes dégénérés d'environ size caractères"""
+    digits = "1 " * (size // 2)
+    return {
+        'chiffres_espaces': digits,
+        'montants_sans_euro': "12 345,67 " * (size // 10),
+        'article_sans_euro': "ART1 - Planche " + digits + "\n",
+        'reference_sans_euro': "ABCD-EFGH-IJKL - Planche " + digits + ",5\n",
+        'ugs_sans_prix': ("Produit\nUGS : ABC-1\n" + "1 " * 500 + "\n") * max(1, size // 1000),
+        'total_sans_tva': "12,50 € (dont " + digits + "\nTotal\n",
+        'sans_point': "Acompte " * (size // 8),
+        'ligne_geante': "x" * size,
+        'page_enorme': SAMPLE_PAGE * max(1, size // len(SAMPLE_PAGE)),
+    }
+
+def set_budget(budget):
+    for entry in REGISTRY:
+        entry.budget = budget
+
+def run_engine(text):
+    """Temps de parse_invoice avec chaque parseur, puis d'InvoiceExtractor"""
+    timings = {}
+    extractor = InvoiceExtractor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for invoice_type in PARSERS.types():
+            start = time.perf_counter()
+            parse_invoice(text, invoice_type=invoice_type, use_cache=False)
+            timings[invoice_type] = time.perf_counter() - start
+        start = time.perf_counter()
+        extractor.extract_invoice_data(text, use_cache=False)
+        timings['billing'] = time.perf_counter() - start
+    return timings
+
+def compare_re(corpus):
+    """Temps des motifs avec le module re (sans limite), par texte"""
+    for name, text in corpus.items():
+        slowest = []
+        for entry in REGISTRY:
+            compiled = re.compile(entry.pattern, entry.flags)
+            start = time.perf_counter()
+            list(compiled.finditer(text))
+            slowest.append((time.perf_counter() - start, entry.name))
+        slowest.sort(reverse=True)
+        worst = ", ".join(f"{pattern} {elapsed * 1000:.0f} ms" for elapsed, pattern in slowest[:3])
+        print(f"  {name:<22}{len(text):>9}  re : {worst}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000, help="Taille approximative des textes (caractères)")
+    parser.add_argument("--budget", type=float, default=regex_registry.TIME_BUDGET,
+                        help="Budget de temps par appel de motif (secondes)")
+    parser.add_argument("--limit", type=int, default=5, help="Nombre de motifs affichés par texte")
+    parser.add_argument("--compare-re", action="store_true", help="Mesurer aussi les motifs avec le module re")
+    parser.add_argument("--re-size", type=int, default=800, help="Taille des textes pour --compare-re")
+    args = parser.parse_args()
+
+    set_budget(args.budget)
+    corpus = build_corpus(args.size)
+    print(f"{len(corpus)} textes, ~{args.size} caractères, budget {args.budget}s par appel")
+    print(f"{'texte':<22}{'taille':>9}" + "".join(f"{name:>10}" for name in PARSERS.types()) + f"{'billing':>10}")
+
+    for name, text in corpus.items():
+        REGISTRY.reset_stats()
+        timings = run_engine(text)
+        print(f"{name:<22}{len(text):>9}" + "".join(f"{elapsed * 1000:>8.0f}ms" for elapsed in timings.values()))
+
+        slowest = [stat for stat in REGISTRY.stats()[:args.limit] if stat['total_ms'] >= 1]
+        for stat in slowest:
+            flag = f"  {stat['timeouts']} dépassement(s)" if stat['timeouts'] else ""
+            print(f"    {stat['name']:<45}{stat['total_ms']:>10.1f} ms{flag}")
+        timed_out = REGISTRY.timed_out()
+        if timed_out:
+            print(f"    budget dépassé : {', '.join(timed_out)}")
+
+    if args.compare_re:
+        print(f"\nModule re sans limite de temps (~{args.re_size} caractères) :")
+        compare_re(build_corpus(args.re_size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Temps du rapprochement des montants sur un lot de factures.
+
+Les factures MEG synthétiques de bench_excel_format sont converties par
+create_invoice_dataframe, puis le total TTC d'une facture sur cent est
+faussé d'un euro : reconciliation.reconcile doit relever exactement ces
+factures, en un temps proportionnel aux opérations vectorielles.
+
+Usage :
+    python benchmarks/bench_reconciliation.py [--rows 10000 100000]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_excel_format import load_invoices
+from create_invoice_excel import create_invoice_dataframe
+from reconciliation import CHECK_TOTALS, reconcile
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="Nombres de factures mesurés")
+    args = parser.parse_args()
+
+    print(f"{'factures':>9}{'faussées':>10}{'anomalies':>11}{'rapprochement':>15}")
+    for nb_rows in args.rows:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            df = create_invoice_dataframe(load_invoices(None, nb_rows))
+        wrong = df.index[::100]
+        df.loc[wrong, 'Credit TTC'] += 1.0
+
+        start = time.perf_counter()
+        anomalies = reconcile(df)
+        elapsed = time.perf_counter() - start
+        found = (anomalies['contrôle'] == CHECK_TOTALS).sum()
+        print(f"{nb_rows:>9}{len(wrong):>10}{found:>11}{elapsed * 1000:>13.0f}ms")
+
+if __name__ == "__main__":
+    main()
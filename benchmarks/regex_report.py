@@ -0,0 +1,62 @@
+"""
+Coût de chaque expression régulière du registre sur un dossier de factures.
+
+Le texte des PDF est extrait (avec le cache), puis analysé sans le cache des
+factures analysées, dans le processus courant par create_invoice_excel (data_extractor), create_invoice_dataframe et
+InvoiceExtractor, pour que les compteurs du registre couvrent tous les extracteurs.
+
+Usage :
+    python benchmarks/regex_report.py data_factures/facturesv11 [--limit 30]
+"""
+import argparse
+import contextlib
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import invoice_engine
+from billing_extractor import InvoiceExtractor
+from create_invoice_excel import create_invoice_dataframe, process_pdf_file
+from pdf_extractor import extract_text_from_pdf
+from regex_registry import REGISTRY
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Dossier contenant les PDF")
+    parser.add_argument("--limit", type=int, default=None, help="Nombre de motifs affichés")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(Path(args.folder).glob("*.pdf"))
+    if not pdf_paths:
+        print(f"Aucun PDF dans {args.folder}")
+        return
+
+    # Toutes les factures doivent être analysées pour que chaque motif soit compté
+    invoice_engine.PARSE_CACHE_ENABLED = False
+
+    # Les extracteurs sont bavards : on ne garde que le rapport
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Extraction du texte hors mesure (le cache est alimenté au premier passage)
+        texts = [extract_text_from_pdf(str(pdf_path)) for pdf_path in pdf_paths]
+        REGISTRY.reset_stats()
+
+        all_invoices = {}
+        for pdf_path in pdf_paths:
+            pdf_invoices, _, _ = process_pdf_file(pdf_path)
+            all_invoices.update(pdf_invoices)
+        create_invoice_dataframe(all_invoices)
+
+        extractor = InvoiceExtractor()
+        for pages_text in texts:
+            extractor.extract_invoice_data("\n\n".join(pages_text))
+
+    print(f"{len(pdf_paths)} PDF, {len(all_invoices)} factures, {len(REGISTRY)} motifs")
+    print(REGISTRY.report(args.limit))
+    never = REGISTRY.never_matched()
+    if never:
+        print(f"\nMotifs jamais trouvés ({len(never)}) : {', '.join(never)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,112 @@
 import re
 from datetime import datetime
 from typing import Dict, List
+from anchor_index import AnchorIndex
+from data_extractor import ART_ARTICLE, GENERAL_FIELD_PATTERNS, convert_date_to_iso, convert_to_float
+import invoice_engine
+from invoice_engine import PARSER_PATTERNS, classify, get_parse_cache, parse_cache_key
+from regex_registry import REGISTRY, register
+
+# Motifs compilés une seule fois à l'import (voir regex_registry)
+
+# Montants des factures internet
+INTERNET_TOTAL = register('billing.internet.total', r'Total\s+([\d\s]+[,.]?\d*)\s*€\s*\(dont\s+([\d\s]+[,.]?\d*)\s*€\s*TVA\)', re.IGNORECASE)
+INTERNET_EXPEDITION = register('billing.internet.expedition', r'Expédition\s+(?:([^€\n]*?)(?:(\d+[,.]?\d*)\s*€)?)?\s*(?:\(TTC\))?\s*(?:via\s*)?([^\n]*?)(?=\s*(?:Total|$))', re.IGNORECASE)
+
+# Montants des factures MEG
+MEG_TOTAL_HT = register('billing.meg.total_ht', r'Total\s+HT\s+([\d\s]+[,.]?\d*)\s*€')
+MEG_TVA = register('billing.meg.tva', r'TVA\s+([\d\s]+[,.]?\d*)\s*€')
+MEG_TOTAL_TTC = register('billing.meg.total_ttc', r'Total\s+TTC\s+([\d\s]+[,.]?\d*)\s*€')
+# Motifs alternatifs qui fonctionnent même avec des sauts de page/ligne
+MEG_ALT_TOTAL_HT = register('billing.meg.alt_total_ht', r'(?:Total|Montant)\s+(?:HT|H\.T\.)\D*([\d\s]+[,.]?\d*)\s*€', re.IGNORECASE)
+MEG_ALT_TVA = register('billing.meg.alt_tva', r'(?:TVA|T\.V\.A\.)\D*([\d\s]+[,.]?\d*)\s*€', re.IGNORECASE)
+MEG_ALT_TOTAL_TTC = register('billing.meg.alt_total_ttc', r'(?:Total|Montant)\s+(?:TTC|T\.T\.C\.)\D*([\d\s]+[,.]?\d*)\s*€', re.IGNORECASE)
+
+REMISE_PATTERNS = [
+    register('billing.remise_totale', r'Remise\s+(?:totale|globale)?\s*:?\s*(-?\d+[.,]?\d*)\s*[€%]', re.IGNORECASE),
+    register('billing.remise', r'Remise\s+(-?\d+[.,]?\d*)\s*[€%]', re.IGNORECASE),
+    register('billing.total_remise', r'Total\s+remise\s*:?\s*(-?\d+[.,]?\d*)\s*[€%]', re.IGNORECASE),
+]
+
+# Articles
+INTERNET_UGS = register('billing.internet.ugs', r'UGS\s*:\s*([^\n]+)')
+INTERNET_QUANTITE_PRIX = register('billing.internet.quantite_prix', r'\s(\d+)\s+(\d+[,.]?\d*)\s*€')
+# Format ARTxxx, partagé avec data_extractor
+MEG_ARTICLE = ART_ARTICLE
+
+# Informations générales, adaptées selon le type de facture
+_COMMON_FIELD_PATTERNS = {
+    'numero_client': GENERAL_FIELD_PATTERNS['numero_client'],
+    'Réseau_Vente': register('billing.reseau_vente', r'20\.(?:0[1-9]|10)\.\d{2}', re.IGNORECASE),  # 20.XX.XX complet
+    'Type_Vente': register('billing.type_vente', r'20\.(?:0[1-9]|10)', re.IGNORECASE),  # 20.XX uniquement
+    'commentaire': GENERAL_FIELD_PATTERNS['commentaire'],
+    'statut_paiement': GENERAL_FIELD_PATTERNS['statut_paiement'],
+}
+FIELD_PATTERNS = {
+    'internet': {
+        'numero_facture': register('billing.internet.numero_facture', r'N° de facture\s*:\s*([^\n]+)', re.IGNORECASE),
+        'date_facture': register('billing.internet.date_facture', r'Date de facture\s*:\s*(\d{1,2}\s+\w+\s+\d{4})', re.IGNORECASE),
+        'date_commande': register('billing.internet.date_commande', r'Date de commande\s*:\s*(\d{1,2}\s+\w+\s+\d{4})', re.IGNORECASE),
+        'numero_client': _COMMON_FIELD_PATTERNS['numero_client'],
+        'client_name': register(
+            'billing.internet.client_name',
+            r'FACTURE\s*\n(?!.*?NOMADS)([^\n]+?)(?:\s*N°\s*(?:de\s*facture|de\s*commande)|Résidence|Date|$)',
+            re.IGNORECASE
+        ),
+        'Réseau_Vente': _COMMON_FIELD_PATTERNS['Réseau_Vente'],
+        'Type_Vente': _COMMON_FIELD_PATTERNS['Type_Vente'],
+        'commentaire': _COMMON_FIELD_PATTERNS['commentaire'],
+        'statut_paiement': _COMMON_FIELD_PATTERNS['statut_paiement'],
+    },
+    'meg': {
+        'numero_facture': register('billing.meg.numero_facture', r'N°\s*:\s*([A-Z0-9-]+)', re.IGNORECASE),
+        'date_facture': register('billing.meg.date_facture', r'Date[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})', re.IGNORECASE),
+        'numero_client': _COMMON_FIELD_PATTERNS['numero_client'],
+        'client_name': register(
+            'billing.meg.client_name',
+            r'N°\s*client\s*:\s*(?:CLT\d+)\s*\n(?!.*?NOMADS)([^\n]+?)(?:\s*NOMADS|\s*$)',
+            re.IGNORECASE
+        ),
+        'Réseau_Vente': _COMMON_FIELD_PATTERNS['Réseau_Vente'],
+        'Type_Vente': _COMMON_FIELD_PATTERNS['Type_Vente'],
+        'commentaire': _COMMON_FIELD_PATTERNS['commentaire'],
+        'statut_paiement': _COMMON_FIELD_PATTERNS['statut_paiement'],
+        'reglement': register('billing.meg.reglement', r'Règlement\s*:?\s*([^\n]+)', re.IGNORECASE),
+    },
+}
+
+# Champs cherchés dans la seule section d'en-tête (voir anchor_index) ; les autres
+# (nom du client, réseau de vente, commentaire, règlement...) sur tout le texte
+ENTETE_FIELDS = {'numero_facture', 'date_facture', 'date_commande', 'numero_client'}
+
+NUMERO_COMMANDE = register('billing.numero_commande', r'N° de commande\s*:\s*(\d+)')
 
 class InvoiceExtractor:
+    """
+    Extracteur historique de l'API (format {"invoice_data": ..., "extraction_date": ...}).
+
+    Les applications passent par invoice_engine.parse_invoice ; cette classe
+    partage avec lui la détection de type, les conversions, le motif ARTxxx et
+    le cache des factures analysées.
+    """
+
+    # Version de l'extraction : à incrémenter dès que les données produites
+    # changent, pour invalider les entrées du cache calculées avec l'ancienne version
+    version: int = 1
+
     def __init__(self):
         """
         Initialise l'extracteur
         """
         pass  # Plus besoin des credentials Google Cloud
 
-    def extract_amounts(self, text: str, invoice_type: str) -> Dict:
+    def extract_amounts(self, text: str, invoice_type: str, index: AnchorIndex = None) -> Dict:
         """
         Extrait les montants selon le type de facture
+
+        index : AnchorIndex du texte (pages, "Détail de la TVA", totaux), recalculé si absent
         """
+        index = index or AnchorIndex(text)
         amounts = {
             'total_ttc': 0.0,
             'total_ht': 0.0,
@@ -23,19 +117,16 @@ class InvoiceExtractor:
         }
 
         if invoice_type == 'internet':
-            # Patterns plus précis pour factures internet
-            total_pattern = r'Total\s+([\d\s]+[,.]?\d*)\s*€\s*\(dont\s+([\d\s]+[,.]?\d*)\s*€\s*TVA\)'
-            expedition_pattern = r'Expédition\s+(?:([^€\n]*?)(?:(\d+[,.]?\d*)\s*€)?)?\s*(?:\(TTC\))?\s*(?:via\s*)?([^\n]*?)(?=\s*(?:Total|$))'
-
             # Extraction total TTC et TVA
-            total_match = re.search(total_pattern, text, re.IGNORECASE)
+            totaux = index.section('totaux')
+            total_match = INTERNET_TOTAL.search(text, *totaux)
             if total_match:
                 amounts['total_ttc'] = self.convert_to_float(total_match.group(1))
                 amounts['tva'] = self.convert_to_float(total_match.group(2))
                 amounts['total_ht'] = amounts['total_ttc'] - amounts['tva']
 
             # Extraction frais et type d'expédition
-            expedition_match = re.search(expedition_pattern, text, re.IGNORECASE)
+            expedition_match = INTERNET_EXPEDITION.search(text, *totaux)
             if expedition_match:
                 if expedition_match.group(2):  # Si on a un montant
                     amounts['frais_expedition'] = self.convert_to_float(expedition_match.group(2))
@@ -48,159 +139,111 @@ class InvoiceExtractor:
                     amounts['type_expedition'] = type_expedition
 
         elif invoice_type == 'meg':
-            # Patterns spécifiques pour les totaux dans les factures MEG
-            total_ht_pattern = r'Total\s+HT\s+([\d\s]+[,.]?\d*)\s*€'
-            tva_pattern = r'TVA\s+([\d\s]+[,.]?\d*)\s*€'
-            total_ttc_pattern = r'Total\s+TTC\s+([\d\s]+[,.]?\d*)\s*€'
-
             # Vérifier si c'est une facture multi-pages
-            page_indicators = re.findall(r'Page\s+(\d+)\s+de\s+(\d+)', text)
+            page_indicators = index.all('page')
             is_multipage = len(page_indicators) > 0
 
             # Si c'est une facture multi-pages, essayer une approche de page par page
             if is_multipage:
                 print(f"Facture multi-pages détectée: {len(page_indicators)} indicateurs de page trouvés")
 
-                # Diviser par les indicateurs "Page X de Y"
-                pages = []
-                last_pos = 0
-
-                # Trouver chaque début de page en utilisant le motif "Page X de Y"
-                page_positions = [(m.start(), m.group()) for m in re.finditer(r'Page\s+\d+\s+de\s+\d+', text)]
-
-                if page_positions:
-                    # Ajouter tout ce qui précède la première occurrence comme page 1
-                    if page_positions[0][0] > 0:
-                        pages.append(text[:page_positions[0][0]])
+                # Pages délimitées par les indicateurs "Page X de Y" ; les montants sont cherchés
+                # d'abord dans la dernière page ou l'avant-dernière (car les totaux sont souvent là)
+                for page_start, page_end in reversed(index.pages()):
+                    # Chercher la section "Détail de la TVA" dans cette page
+                    details = index.between('detail_tva', page_start, page_end)
+                    if details:
+                        # Section jusqu'à l'occurrence suivante de "Détail de la TVA" ou la fin de la page
+                        section = (details[0][1], details[1][0] if len(details) > 1 else page_end)
+
+                        # Extraction total HT
+                        total_ht_match = MEG_TOTAL_HT.search(text, *section)
+                        if total_ht_match:
+                            amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
 
-                    # Diviser le reste du texte par les indicateurs de page
-                    for i in range(len(page_positions)):
-                        start = page_positions[i][0] + len(page_positions[i][1])
-                        end = page_positions[i+1][0] if i+1 < len(page_positions) else len(text)
-                        pages.append(text[start:end])
+                        # Extraction TVA
+                        tva_match = MEG_TVA.search(text, *section)
+                        if tva_match:
+                            amounts['tva'] = self.convert_to_float(tva_match.group(1))
 
-                    # Chercher d'abord les montants dans la dernière page ou l'avant-dernière
-                    # (car les totaux sont souvent là)
-                    for page_index in range(len(pages)-1, -1, -1):
-                        page_content = pages[page_index]
+                        # Extraction total TTC
+                        total_ttc_match = MEG_TOTAL_TTC.search(text, *section)
+                        if total_ttc_match:
+                            amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
 
-                        # Chercher la section "Détail de la TVA" dans cette page
-                        if 'Détail de la TVA' in page_content:
-                            section = page_content.split('Détail de la TVA')[1]
+                        # Si on a trouvé tous les montants, on peut sortir
+                        if amounts['total_ht'] > 0 and amounts['tva'] > 0 and amounts['total_ttc'] > 0:
+                            print("Tous les montants trouvés, arrêt de la recherche page par page")
+                            break
 
-                            # Extraction total HT
-                            total_ht_match = re.search(total_ht_pattern, section)
+                    # Si on n'a pas trouvé la section "Détail de la TVA", chercher directement les montants
+                    else:
+                        # Extraction total HT
+                        if amounts['total_ht'] == 0:
+                            total_ht_match = MEG_TOTAL_HT.search(text, page_start, page_end)
                             if total_ht_match:
                                 amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
 
-                            # Extraction TVA
-                            tva_match = re.search(tva_pattern, section)
+                        # Extraction TVA
+                        if amounts['tva'] == 0:
+                            tva_match = MEG_TVA.search(text, page_start, page_end)
                             if tva_match:
                                 amounts['tva'] = self.convert_to_float(tva_match.group(1))
 
-                            # Extraction total TTC
-                            total_ttc_match = re.search(total_ttc_pattern, section)
+                        # Extraction total TTC
+                        if amounts['total_ttc'] == 0:
+                            total_ttc_match = MEG_TOTAL_TTC.search(text, page_start, page_end)
                             if total_ttc_match:
                                 amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
 
-                            # Si on a trouvé tous les montants, on peut sortir
-                            if amounts['total_ht'] > 0 and amounts['tva'] > 0 and amounts['total_ttc'] > 0:
-                                print("Tous les montants trouvés, arrêt de la recherche page par page")
-                                break
-
-                        # Si on n'a pas trouvé la section "Détail de la TVA", chercher directement les montants
-                        else:
-                            # Extraction total HT
-                            if amounts['total_ht'] == 0:
-                                total_ht_match = re.search(total_ht_pattern, page_content)
-                                if total_ht_match:
-                                    amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
-
-                            # Extraction TVA
-                            if amounts['tva'] == 0:
-                                tva_match = re.search(tva_pattern, page_content)
-                                if tva_match:
-                                    amounts['tva'] = self.convert_to_float(tva_match.group(1))
-
-                            # Extraction total TTC
-                            if amounts['total_ttc'] == 0:
-                                total_ttc_match = re.search(total_ttc_pattern, page_content)
-                                if total_ttc_match:
-                                    amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
-
             # Si ce n'est pas une facture multi-pages ou si l'approche par page n'a pas fonctionné,
             # essayer avec l'approche originale améliorée (texte entier)
             if amounts['total_ht'] == 0 or amounts['tva'] == 0 or amounts['total_ttc'] == 0:
-                # Pour les factures multi-pages, s'assurer que les recherches sont indépendantes des sauts de ligne
-                processed_text = text.replace('\n\n', ' ')
-
-                # Chercher d'abord dans la section "Détail de la TVA"
+                # Chercher d'abord dans la section "Détail de la TVA" (jusqu'à l'occurrence suivante)
                 detail_tva_section = None
-                if 'Détail de la TVA' in processed_text:
-                    # Diviser le texte à "Détail de la TVA" et prendre tout ce qui suit
-                    sections = processed_text.split('Détail de la TVA')
-                    if len(sections) > 1:
-                        detail_tva_section = sections[1]
-
-                # Si on a trouvé la section, chercher les montants dedans
-                if detail_tva_section:
-                    # Extraction total HT si pas encore trouvé
-                    if amounts['total_ht'] == 0:
-                        total_ht_match = re.search(total_ht_pattern, detail_tva_section)
-                        if total_ht_match:
-                            amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
+                details = index.all('detail_tva')
+                if details:
+                    section_end = details[1][0] if len(details) > 1 else len(text)
+                    # Pour les factures multi-pages, s'assurer que les recherches sont indépendantes
+                    # des sauts de ligne (seule la section est copiée)
+                    detail_tva_section = text[details[0][1]:section_end].replace('\n\n', ' ')
 
-                    # Extraction TVA si pas encore trouvé
-                    if amounts['tva'] == 0:
-                        tva_match = re.search(tva_pattern, detail_tva_section)
-                        if tva_match:
-                            amounts['tva'] = self.convert_to_float(tva_match.group(1))
-
-                    # Extraction total TTC si pas encore trouvé
-                    if amounts['total_ttc'] == 0:
-                        total_ttc_match = re.search(total_ttc_pattern, detail_tva_section)
-                        if total_ttc_match:
-                            amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
-                else:
-                    # Si on n'a pas trouvé la section, chercher dans tout le texte
+                # Si on a trouvé la section, chercher les montants dedans ; sinon dans tout le texte
+                search_text = detail_tva_section if detail_tva_section else text.replace('\n\n', ' ')
 
-                    # Extraction total HT si pas encore trouvé
-                    if amounts['total_ht'] == 0:
-                        total_ht_match = re.search(total_ht_pattern, processed_text)
-                        if total_ht_match:
-                            amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
+                # Extraction total HT si pas encore trouvé
+                if amounts['total_ht'] == 0:
+                    total_ht_match = MEG_TOTAL_HT.search(search_text)
+                    if total_ht_match:
+                        amounts['total_ht'] = self.convert_to_float(total_ht_match.group(1))
 
-                    # Extraction TVA si pas encore trouvé
-                    if amounts['tva'] == 0:
-                        tva_match = re.search(tva_pattern, processed_text)
-                        if tva_match:
-                            amounts['tva'] = self.convert_to_float(tva_match.group(1))
+                # Extraction TVA si pas encore trouvé
+                if amounts['tva'] == 0:
+                    tva_match = MEG_TVA.search(search_text)
+                    if tva_match:
+                        amounts['tva'] = self.convert_to_float(tva_match.group(1))
 
-                    # Extraction total TTC si pas encore trouvé
-                    if amounts['total_ttc'] == 0:
-                        total_ttc_match = re.search(total_ttc_pattern, processed_text)
-                        if total_ttc_match:
-                            amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
+                # Extraction total TTC si pas encore trouvé
+                if amounts['total_ttc'] == 0:
+                    total_ttc_match = MEG_TOTAL_TTC.search(search_text)
+                    if total_ttc_match:
+                        amounts['total_ttc'] = self.convert_to_float(total_ttc_match.group(1))
 
             # Si on n'a pas trouvé les totaux, essayer avec d'autres patterns plus flexibles
             if amounts['total_ht'] == 0 or amounts['tva'] == 0 or amounts['total_ttc'] == 0:
                 # Patterns alternatifs qui fonctionnent même avec des sauts de page/ligne
-                alt_total_ht_pattern = r'(?:Total|Montant)\s+(?:HT|H\.T\.)\D*([\d\s]+[,.]?\d*)\s*€'
-                alt_tva_pattern = r'(?:TVA|T\.V\.A\.)\D*([\d\s]+[,.]?\d*)\s*€'
-                alt_total_ttc_pattern = r'(?:Total|Montant)\s+(?:TTC|T\.T\.C\.)\D*([\d\s]+[,.]?\d*)\s*€'
-
                 if amounts['total_ht'] == 0:
-                    alt_match = re.search(alt_total_ht_pattern, text, re.IGNORECASE)
+                    alt_match = MEG_ALT_TOTAL_HT.search(text)
                     if alt_match:
                         amounts['total_ht'] = self.convert_to_float(alt_match.group(1))
 
                 if amounts['tva'] == 0:
-                    alt_match = re.search(alt_tva_pattern, text, re.IGNORECASE)
+                    alt_match = MEG_ALT_TVA.search(text)
                     if alt_match:
                         amounts['tva'] = self.convert_to_float(alt_match.group(1))
 
                 if amounts['total_ttc'] == 0:
-                    alt_match = re.search(alt_total_ttc_pattern, text, re.IGNORECASE)
+                    alt_match = MEG_ALT_TOTAL_TTC.search(text)
                     if alt_match:
                         amounts['total_ttc'] = self.convert_to_float(alt_match.group(1))
 
@@ -215,16 +258,9 @@ class InvoiceExtractor:
                 amounts['tva'] = amounts['total_ttc'] - amounts['total_ht']
                 print(f"TVA calculée: {amounts['tva']} €")
 
-        # Recherche d'une remise totale
-        remise_patterns = [
-            r'Remise\s+(?:totale|globale)?\s*:?\s*(-?\d+[.,]?\d*)\s*[€%]',
-            r'Remise\s+(-?\d+[.,]?\d*)\s*[€%]',
-            r'Total\s+remise\s*:?\s*(-?\d+[.,]?\d*)\s*[€%]'
-        ]
-
-        # Pour les remises, chercher dans tout le texte
-        for pattern in remise_patterns:
-            remise_match = re.search(pattern, text, re.IGNORECASE)
+        # Recherche d'une remise totale, dans tout le texte
+        for pattern in REMISE_PATTERNS:
+            remise_match = pattern.search(text)
             if remise_match:
                 # Convertir la valeur de remise en float
                 remise_value = self.convert_to_float(remise_match.group(1))
@@ -237,56 +273,49 @@ class InvoiceExtractor:
 
     def convert_to_float(self, amount_str: str) -> float:
         """
-        Convertit une chaîne de montant en float
+        Convertit une chaîne de montant en float (voir data_extractor.convert_to_float)
         """
-        return float(amount_str.replace(',', '.').replace(' ', ''))
+        return convert_to_float(amount_str)
 
     def detect_invoice_type(self, text: str) -> str:
         """
-        Détecte le type de facture basé sur son contenu
-        UGS en majuscule indique une facture internet
-        Sinon c'est une facture MEG
+        Détecte le type de facture (voir invoice_engine.classify)
+
+        Les factures d'acompte sont traitées comme des factures MEG
         """
-        # Recherche plus précise pour les factures internet
-        internet_indicators = [
-            "UGS",
-            "N° de commande",
-            "Date de commande",
-            "Livraison gratuite"
-        ]
-
-        if any(indicator in text for indicator in internet_indicators):
-            return "internet"
-        return "meg"
-
-    def extract_articles(self, text: str, invoice_type: str) -> List[Dict]:
+        return "internet" if classify(text) == "internet" else "meg"
+
+    def extract_articles(self, text: str, invoice_type: str, index: AnchorIndex = None) -> List[Dict]:
         """
         Extrait les articles selon le type de facture
+
+        index : AnchorIndex du texte (section des articles), recalculé si absent
         """
+        index = index or AnchorIndex(text)
+        articles_start, articles_end = index.section('articles')
         articles = []
 
         if invoice_type == 'internet':
-            # Pattern simplifié pour articles internet
-            code_pattern = r'UGS\s*:\s*([^\n]+)'
             current_code = ""
 
             # Ignore les lignes qui commencent par ces mots
             ignore_starts = ['UGS', 'Poids', 'Taille', 'Colori', 'Total', 'Sous-total', 'Expédition', 'En cas']
 
-            for line in text.split('\n'):
+            # Les lignes des totaux (et au-delà) ne contiennent pas d'articles
+            for line in text[:articles_end].split('\n'):
                 line = line.strip()
 
                 # Ignore les lignes vides ou commençant par des mots à ignorer
                 if not line or any(line.startswith(word) for word in ignore_starts):
                     if 'UGS' in line:
                         # Extraction du code UGS
-                        match = re.search(code_pattern, line)
+                        match = INTERNET_UGS.search(line)
                         if match:
                             current_code = match.group(1).strip()
                     continue
 
                 # Cherche un nombre (quantité) et un prix dans la ligne
-                quantite_match = re.search(r'\s(\d+)\s+(\d+[,.]?\d*)\s*€', line)
+                quantite_match = INTERNET_QUANTITE_PRIX.search(line)
 
                 if quantite_match:
                     try:
@@ -310,16 +339,7 @@ class InvoiceExtractor:
 
         elif invoice_type == 'meg':
             # Pattern pour les articles MEG (code existant)
-            article_pattern = (
-                r'ART(\d+)\s*-\s*([^\n]+?)\s*'  # Référence et description
-                r'(\d+,\d+)\s*'                 # Quantité
-                r'(\d+[\s\d]*,\d+)\s*€\s*'      # Prix unitaire
-                r'(\d+,\d+)%\s*'                # Remise
-                r'(\d+[\s\d]*,\d+)\s*€\s*'      # Montant HT
-                r'(\d+,\d+)%'                   # TVA
-            )
-
-            for match in re.finditer(article_pattern, text, re.MULTILINE | re.DOTALL):
+            for match in MEG_ARTICLE.finditer(text, articles_start, articles_end):
                 try:
                     prix_unitaire = match.group(4).replace(' ', '')
                     montant_ht = match.group(6).replace(' ', '')
@@ -339,13 +359,36 @@ class InvoiceExtractor:
 
         return articles
 
-    def extract_invoice_data(self, text: str) -> Dict:
+    def extract_invoice_data(self, text: str, use_cache: bool = True) -> Dict:
         """
         Extrait les données structurées du texte de la facture
+
+        Le résultat est réutilisé depuis le cache des factures analysées
+        (invoice_engine.get_parse_cache) si le même texte a déjà été analysé
+        par le même code (version de l'extracteur et motifs, voir
+        invoice_engine.parse_cache_key).
         """
         # Détection du type de facture
         invoice_type = self.detect_invoice_type(text)
 
+        cache = get_parse_cache() if use_cache and invoice_engine.PARSE_CACHE_ENABLED else None
+        cache_key = parse_cache_key(text, f"billing-{invoice_type}", self.version,
+                                    patterns=PARSER_PATTERNS + ('billing.',))
+        data = cache.get(cache_key) if cache is not None else None
+        if data is None:
+            degraded_before = REGISTRY.degraded_count()
+            data = self._extract_invoice_data(text, invoice_type)
+            # Un résultat obtenu avec un motif interrompu ou désactivé n'est pas mis en cache
+            if cache is not None and REGISTRY.degraded_count() == degraded_before:
+                cache.set(cache_key, data)
+
+        return {
+            "invoice_data": data,
+            "extraction_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _extract_invoice_data(self, text: str, invoice_type: str) -> Dict:
+        """Extrait les données d'une facture dont le type est connu"""
         # Structure de base des données
         data = {
             'type': invoice_type,
@@ -368,44 +411,20 @@ class InvoiceExtractor:
             'date_commande': ""
         }
 
-        # Patterns adaptés selon le type de facture
-        patterns = {
-            'numero_facture': (
-                r'N° de facture\s*:\s*([^\n]+)' if invoice_type == 'internet'
-                else r'N°\s*:\s*([A-Z0-9-]+)'
-            ),
-            'date_facture': (
-                r'Date de facture\s*:\s*(\d{1,2}\s+\w+\s+\d{4})' if invoice_type == 'internet'
-                else r'Date[:\s]+(\d{2}[/-]\d{2}[/-]\d{4})'
-            ),
-            'date_commande': (
-                r'Date de commande\s*:\s*(\d{1,2}\s+\w+\s+\d{4})' if invoice_type == 'internet'
-                else None
-            ),
-            'numero_client': r'N°\s*client\s*:\s*(CLT\d+)',
-            'client_name': (
-                # Pour les factures internet
-                r'FACTURE\s*\n(?!.*?NOMADS)([^\n]+?)(?:\s*N°\s*(?:de\s*facture|de\s*commande)|Résidence|Date|$)' if invoice_type == 'internet'
-                # Pour les factures MEG
-                else r'N°\s*client\s*:\s*(?:CLT\d+)\s*\n(?!.*?NOMADS)([^\n]+?)(?:\s*NOMADS|\s*$)'
-            ),
-            'Réseau_Vente': r'20\.(?:0[1-9]|10)\.\d{2}',  # Pattern pour 20.XX.XX complet
-            'Type_Vente': r'20\.(?:0[1-9]|10)',  # Pattern pour 20.XX uniquement
-            'commentaire': r'Commentaire\s*:\s*([^\n]+)',
-            'statut_paiement': r'Statut paiement\s*:\s*([^\n]+)',
-            'reglement': r'Règlement\s*:?\s*([^\n]+)' if invoice_type == 'meg' else None
-        }
+        # Index des ancrages et sections, partagé par toutes les extractions
+        index = AnchorIndex(text)
+        entete = index.section('entete')
 
-        # Extraction des informations de base
-        for key, pattern in patterns.items():
+        # Extraction des informations de base (motifs adaptés selon le type de facture)
+        for key, pattern in FIELD_PATTERNS[invoice_type].items():
             if pattern:
                 if key in ['Réseau_Vente', 'Type_Vente']:
                     # Recherche dans tout le texte
-                    match = re.search(pattern, text, re.IGNORECASE)
+                    match = pattern.search(text)
                     if match:
                         data[key] = match.group(0)
                 else:
-                    match = re.search(pattern, text, re.IGNORECASE)
+                    match = pattern.search(text, *entete) if key in ENTETE_FIELDS else pattern.search(text)
                     if match:
                         value = match.group(1).strip()
                         # Vérification supplémentaire pour client_name
@@ -418,37 +437,25 @@ class InvoiceExtractor:
                             data[key] = value
                     elif key == 'numero_facture' and invoice_type == 'internet':
                         # Si pas de numéro de facture, essayer le numéro de commande
-                        commande_match = re.search(r'N° de commande\s*:\s*(\d+)', text)
+                        commande_match = NUMERO_COMMANDE.search(text, *entete)
                         if commande_match:
                             data[key] = commande_match.group(1).strip()
 
         # Extraction des articles
-        articles = self.extract_articles(text, invoice_type)
+        articles = self.extract_articles(text, invoice_type, index)
         data['articles'] = articles
         data['nombre_articles'] = len(articles)
 
         # Extraction des montants
-        amounts = self.extract_amounts(text, invoice_type)
+        amounts = self.extract_amounts(text, invoice_type, index)
         data['TOTAL'].update(amounts)
 
         # Conversion des dates
         for date_key in ['date_facture', 'date_commande']:
             if data.get(date_key):
                 try:
-                    date_fr = data[date_key]
-                    mois_fr = {
-                        'janvier': '01', 'février': '02', 'mars': '03', 'avril': '04',
-                        'mai': '05', 'juin': '06', 'juillet': '07', 'août': '08',
-                        'septembre': '09', 'octobre': '10', 'novembre': '11', 'décembre': '12'
-                    }
-                    for mois, num in mois_fr.items():
-                        date_fr = date_fr.replace(mois, num)
-                    jour, mois, annee = re.match(r'(\d{1,2})\s*(\d{2})\s*(\d{4})', date_fr).groups()
-                    data[date_key] = f"{annee}-{mois}-{jour.zfill(2)}"
-                except (ValueError, AttributeError):
+                    data[date_key] = convert_date_to_iso(data[date_key])
+                except ValueError:
                     pass
 
-        return {
-            "invoice_data": data,
-            "extraction_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        return data
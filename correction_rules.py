@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sheet_schema import ARTICLE_COLUMNS, MAX_ARTICLES
+
+# Colonne comparée pour chaque type de clé
+KEY_COLUMNS = {
+    'numero': 'N° Syst.',
+    'client': 'Client',
+    'reference': 'ref',
+}
+
+# Champs d'article (colonnes ref1..20, q1..20... en disposition large, feuille Articles sinon)
+ARTICLE_FIELDS = frozenset(name for name, _ in ARTICLE_COLUMNS)
+
+@dataclass(frozen=True)
+class Copy:
+    """Valeur d'une autre colonne de la même ligne, appliquée seulement si elle est positive"""
+    column: str
+
+@dataclass(frozen=True)
+class CorrectionRule:
+    """
+    Correction déclarative : colonnes remplacées pour les factures dont la clé
+    (numéro, client ou référence d'article) vaut l'une des valeurs données.
+
+    Les remplacements portent sur des colonnes de la facture ou sur des champs
+    d'article (q, prix, ht...) ; ces derniers ne s'appliquent qu'aux articles
+    de la référence reference (ou de la référence recherchée pour une clé
+    'reference'), à tous les articles de la facture sinon.
+    """
+    name: str
+    key: str
+    values: Tuple[str, ...]
+    overrides: Mapping[str, Any] = field(default_factory=dict)
+    reference: Optional[str] = None
+
+    def __post_init__(self):
+        if self.key not in KEY_COLUMNS:
+            raise ValueError(f"Clé de correction inconnue: {self.key} (attendu: {', '.join(KEY_COLUMNS)})")
+
+def _normalize(values) -> np.ndarray:
+    """Valeurs comparées sans tenir compte de la casse ni des espaces autour"""
+    return pd.Series(values, dtype=object).fillna('').astype(str).str.strip().str.casefold().to_numpy(dtype=object)
+
+class CorrectionRules:
+    """
+    Table des corrections appliquées aux feuilles après leur création.
+
+    Les valeurs des clés sont indexées par hachage : chaque colonne comparée
+    est recherchée en une seule passe vectorisée (pandas.Index.get_indexer),
+    quel que soit le nombre de règles, puis les remplacements sont appliqués
+    par masque aux seules lignes trouvées.
+    """
+
+    def __init__(self, rules: Iterable[CorrectionRule] = ()):
+        self.rules: List[CorrectionRule] = []
+        # Par type de clé : valeur normalisée -> positions des règles
+        self._index: Dict[str, Dict[str, List[int]]] = {key: {} for key in KEY_COLUMNS}
+        self._lookup: Dict[str, pd.Index] = {}
+        for rule in rules:
+            self.register(rule)
+
+    def register(self, rule: CorrectionRule) -> CorrectionRule:
+        position = len(self.rules)
+        self.rules.append(rule)
+        for value in _normalize(rule.values):
+            self._index[rule.key].setdefault(value, []).append(position)
+        self._lookup.pop(rule.key, None)
+        return rule
+
+    def __len__(self):
+        return len(self.rules)
+
+    def matches(self, numero: str, client: str, references: Iterable[str]) -> bool:
+        """Vrai si une règle concerne la facture (test rapide avant apply, pour une facture seule)"""
+        keys = (('numero', [numero]), ('client', [client]), ('reference', list(references)))
+        return any(value in self._index[key] for key, values in keys if values for value in _normalize(values))
+
+    def _hits(self, key: str, values) -> np.ndarray:
+        """Position de la valeur de chaque cellule dans l'index de la clé (-1 si absente)"""
+        if key not in self._lookup:
+            # Index de hachage construit une fois pour toutes les valeurs de la clé
+            self._lookup[key] = pd.Index(list(self._index[key]))
+        return self._lookup[key].get_indexer(_normalize(values))
+
+    def apply(self, df: pd.DataFrame, articles: Optional[pd.DataFrame] = None) -> List[Tuple[str, int]]:
+        """
+        Applique les corrections à la feuille Factures (et à la feuille Articles
+        en disposition normalisée), en place.
+
+        Les articles sont rattachés à leur facture par l'index de leur table
+        (position de la facture dans df, voir sheet_schema.ARTICLE_INVOICE_INDEX),
+        et non par le N° Syst., qui peut être vide ou partagé par deux factures.
+
+        Returns:
+            list: Corrections appliquées, (nom de la règle, position de la facture dans df)
+        """
+        applied = []
+        if df.empty:
+            return applied
+
+        # Références des articles : matrice (facture x emplacement) en disposition large
+        if articles is None:
+            references = df[[f'ref{slot}' for slot in range(1, MAX_ARTICLES + 1)]].to_numpy(dtype=object)
+        else:
+            references = articles['ref'].to_numpy(dtype=object)
+
+        for key, values in self._index.items():
+            if not values:
+                continue
+            if key == 'reference':
+                hits = self._hits(key, references.ravel()).reshape(references.shape)
+            else:
+                hits = self._hits(key, df[KEY_COLUMNS[key]])
+
+            positions = list(values.values())
+            for hit in np.unique(hits[hits >= 0]):
+                matched = hits == hit
+                for position in positions[hit]:
+                    rule = self.rules[position]
+                    if key == 'reference':
+                        touched = self._apply_rule(rule, df, articles, self._article_invoices(df, articles, matched),
+                                                   matched)
+                    else:
+                        touched = self._apply_rule(rule, df, articles, matched, None)
+                    applied.extend((rule.name, int(row)) for row in np.flatnonzero(touched))
+        return applied
+
+    @staticmethod
+    def _article_invoices(df, articles, article_mask) -> np.ndarray:
+        """Factures ayant au moins un des articles du masque"""
+        if articles is None:
+            return article_mask.any(axis=1)
+        return _invoice_mask(len(df), articles, article_mask)
+
+    def _apply_rule(self, rule, df, articles, invoice_mask, article_mask) -> np.ndarray:
+        """Applique les remplacements d'une règle ; renvoie le masque des factures modifiées"""
+        touched = np.zeros(len(df), dtype=bool)
+        invoice_overrides = {column: value for column, value in rule.overrides.items() if column not in ARTICLE_FIELDS}
+        article_overrides = {column: value for column, value in rule.overrides.items() if column in ARTICLE_FIELDS}
+
+        for column, value in invoice_overrides.items():
+            touched |= _set(df, invoice_mask, column, value)
+
+        if article_overrides:
+            if article_mask is None:
+                article_mask = self._articles_of(df, articles, invoice_mask, rule.reference)
+            if articles is None:
+                # Disposition large : un emplacement d'article à la fois
+                for slot in range(MAX_ARTICLES):
+                    if article_mask[:, slot].any():
+                        for column, value in article_overrides.items():
+                            touched |= _set(df, article_mask[:, slot], f'{column}{slot + 1}', value, f'{slot + 1}')
+            else:
+                for column, value in article_overrides.items():
+                    changed = _set(articles, article_mask, column, value)
+                    touched |= _invoice_mask(len(df), articles, changed)
+        return touched
+
+    @staticmethod
+    def _articles_of(df, articles, invoice_mask, reference) -> np.ndarray:
+        """Articles des factures du masque, limités à la référence donnée"""
+        if articles is None:
+            references = df[[f'ref{slot}' for slot in range(1, MAX_ARTICLES + 1)]].to_numpy(dtype=object)
+            # Emplacements occupés seulement : une colonne d'article vide n'est pas un article
+            occupied = _normalize(references.ravel()).reshape(references.shape) != ''
+            mask = np.repeat(invoice_mask[:, None], MAX_ARTICLES, axis=1) & occupied
+        else:
+            references = articles['ref'].to_numpy(dtype=object)
+            mask = np.asarray(invoice_mask)[articles.index.to_numpy(dtype=np.int64)]
+        if reference is not None:
+            mask = mask & (_normalize(references.ravel()).reshape(references.shape) == _normalize([reference])[0])
+        return mask
+
+def _invoice_mask(size: int, articles: pd.DataFrame, article_mask: np.ndarray) -> np.ndarray:
+    """Masque des factures (size lignes) ayant au moins un des articles du masque"""
+    mask = np.zeros(size, dtype=bool)
+    mask[articles.index.to_numpy(dtype=np.int64)[article_mask]] = True
+    return mask
+
+def _set(frame: pd.DataFrame, mask: np.ndarray, column: str, value, suffix: str = '') -> np.ndarray:
+    """Remplace la colonne sur les lignes du masque ; renvoie le masque des lignes modifiées"""
+    if isinstance(value, Copy):
+        source = frame[f'{value.column}{suffix}' if value.column in ARTICLE_FIELDS else value.column].to_numpy()
+        mask = mask & (source > 0)
+        if mask.any():
+            frame.loc[mask, column] = source[mask]
+    elif mask.any():
+        frame.loc[mask, column] = value
+    return mask
+
+# Corrections connues, appliquées à chaque génération du classeur
+CORRECTIONS = CorrectionRules([
+    # Factures 990 et 994 : le solde est le total TTC
+    CorrectionRule('solde 990/994', 'numero', ('FAC00000990', 'FAC00000994'), {'solde': Copy('Credit TTC')}),
+])
@@ -1,13 +1,33 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from functools import partial
 import json
-import re
 import pytz  # Pour gérer les fuseaux horaires
 from pathlib import Path
 from openpyxl import Workbook
 import os
-from pdf_extractor import extract_text_from_pdf
-from data_extractor import extract_data
+from concurrent.futures import ProcessPoolExecutor
+from parquet_export import PARQUET_EXPORT_ENABLED, export_parquet
+from pdf_extractor import get_text_cache, imap_pdfs, iter_pages, map_pdfs
+from correction_rules import CORRECTIONS
+from reconciliation import COMPUTED_AMOUNTS, RECONCILIATION_ENABLED, reconcile, report_path, write_reconciliation_report
+from excel_stream import StreamingExcelWriter
+from invoice_engine import empty_invoice_data
+from article_batch import ArticleBatch
+from invoice_frame import InvoiceFrameBuilder
+from invoice_model import ZERO, Invoice
+from sheet_schema import (ANOMALIES, ARTICLES, DATE_FORMAT, FACTURES, FACTURES_NORMALISEES, HEADER_FORMAT, INVOICE_KEY,
+                          MAX_ARTICLES, to_excel_date)
+from invoice_splitter import InvoiceSplitter, iter_parsed_invoices
+from table_parser import TABLE_PARSER_ENABLED
+
+# Export en flux (EXCEL_STREAMING=1) : chaque facture est écrite dans le classeur dès son analyse
+EXCEL_STREAMING = os.environ.get("EXCEL_STREAMING") == "1"
+
+# Disposition du classeur : 'wide' (une ligne par facture, MAX_ARTICLES articles au plus)
+# ou 'articles' (feuille Factures sans colonnes d'article et feuille Articles)
+EXCEL_LAYOUT = os.environ.get("EXCEL_LAYOUT", "wide")
 
 def process_pdf_files():
     """Traite tous les PDF dans le folder et génère factures.json"""
@@ -21,151 +41,157 @@ def process_pdf_files():
 
     # Dictionnaire pour stocker toutes les factures
     all_invoices = {}
+    cache_hits = 0
+    cache_misses = 0
+
+    pdf_paths = list(pdf_folder.glob("*.pdf"))
+    if len(pdf_paths) == 1:
+        # Un seul PDF (export de plusieurs factures) : les pages sont lues ici et
+        # chaque facture est analysée dans un pool dès que sa dernière page est lue
+        with ProcessPoolExecutor() as executor:
+            results = [process_pdf_file(pdf_paths[0], executor)]
+    else:
+        # Chaque PDF est lu page par page et découpé en factures dans un worker
+        # (résultats dans l'ordre des fichiers)
+        results = map_pdfs(process_pdf_file, pdf_paths)
 
-    # Traiter chaque PDF
-    for pdf_path in pdf_folder.glob("*.pdf"):
-        try:
-            # Extraire le texte de chaque page
-            pages_text = extract_text_from_pdf(str(pdf_path))
-            if not pages_text:
-                raise ValueError("Pas de texte extrait")
-
-            # Nous allons regrouper les pages en factures
-            current_invoice_pages = []
-            current_invoice_num = None
-
-            # Parcourir chaque page
-            for page_idx, text in enumerate(pages_text):
-                if not text.strip():
-                    continue
-
-                # Vérifier s'il s'agit d'une nouvelle facture ou d'une page supplémentaire
-                is_new_invoice = True
-
-                # Chercher le numéro de facture sur cette page
-                fac_match_meg = re.search(r'N°\s*:\s*([A-Z0-9]+)', text)
-                fac_match_internet = re.search(r'N° de facture\s*:\s*([^\n]+)', text)
-
-                page_invoice_num = None
-                if fac_match_meg:
-                    page_invoice_num = fac_match_meg.group(1).strip()
-                elif fac_match_internet:
-                    page_invoice_num = fac_match_internet.group(1).strip()
-
-                # Si on a un numéro de facture et qu'il est identique au numéro courant,
-                # alors c'est une page supplémentaire de la facture courante
-                if current_invoice_num and page_invoice_num and current_invoice_num == page_invoice_num:
-                    is_new_invoice = False
-                    current_invoice_pages.append(text)
-                else:
-                    # Si on a des pages accumulées, traiter la facture précédente
-                    if current_invoice_pages:
-                        process_invoice_pages(pdf_path.name, current_invoice_num, current_invoice_pages, all_invoices)
-
-                    # Commencer une nouvelle facture
-                    current_invoice_pages = [text]
-                    current_invoice_num = page_invoice_num
-
-            # Traiter la dernière facture si nécessaire
-            if current_invoice_pages:
-                process_invoice_pages(pdf_path.name, current_invoice_num, current_invoice_pages, all_invoices)
-
-        except Exception as e:
-            print(f"✗ Erreur sur {pdf_path.name}: {str(e)}")
-            # Ajouter une entrée avec une structure minimale même en cas d'erreur
-            all_invoices[pdf_path.name] = {
-                'text': '',
-                'data': {
-                    'type': 'unknown',
-                    'articles': [],
-                    'TOTAL': {
-                        'total_ht': 0,
-                        'total_ttc': 0,
-                        'tva': 0,
-                        'remise': 0
-                    },
-                    'frais_expedition': {
-                        'montant': 0,
-                        'description': ''
-                    },
-                    'client_name': '',
-                    'numero_facture': '',
-                    'date_facture': '',
-                    'date_commande': '',
-                    'commentaire': '',
-                    'Type_Vente': '',
-                    'Réseau_Vente': '',
-                    'nombre_articles': 0
-                },
-                'error': str(e)
-            }
+    for pdf_invoices, hits, misses in results:
+        all_invoices.update(pdf_invoices)
+        cache_hits += hits
+        cache_misses += misses
 
     # Sauvegarder toutes les factures dans un seul fichier JSON
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_invoices, f, ensure_ascii=False, indent=2)
 
     print(f"\nToutes les factures ont été sauvegardées dans {output_file} ({len(all_invoices)} factures au total)")
+    print(f"Cache du texte PDF: {cache_hits} hits, {cache_misses} misses")
     return all_invoices
 
-def process_invoice_pages(pdf_name, invoice_num, pages_text, all_invoices):
-    """Traite un ensemble de pages appartenant à une même facture"""
-    # Fusionner le texte de toutes les pages
-    combined_text = "\n\n".join(pages_text)
+def process_pdf_files_streaming(excel_path):
+    """
+    Traite tous les PDF du folder en écrivant le classeur et factures.json au fil de l'analyse.
 
-    # Déterminer le type de facture
-    is_internet = "UGS" in combined_text
-    is_acompte = "Facture d'acompte" in combined_text
+    Les factures sont écrites par lots dès qu'elles sont analysées (voir
+    excel_stream.StreamingExcelWriter) : seul le lot en cours est gardé en
+    mémoire, ni toutes les factures, ni le DataFrame complet, ni les cellules
+    du classeur, quel que soit le nombre de factures exportées.
 
-    if is_internet:
-        facture_type = "internet"
-    elif is_acompte:
-        facture_type = "acompte"
-    else:
-        facture_type = "meg"
-
-    # Structure de base pour les données
-    data = {
-        'type': facture_type,
-        'articles': [],
-        'TOTAL': {
-            'total_ht': 0,
-            'total_ttc': 0,
-            'tva': 0,
-            'remise': 0
-        },
-        'frais_expedition': {
-            'montant': 0,
-            'description': ''
-        },
-        'client_name': '',
-        'numero_facture': '',
-        'date_facture': '',
-        'date_commande': '',
-        'commentaire': '',
-        'Type_Vente': '',
-        'Réseau_Vente': '',
-        'nombre_articles': 0
-    }
+    Args:
+        excel_path (str): Chemin du classeur à créer
 
-    # Essayer d'extraire plus de données si possible
+    Returns:
+        int: Nombre de lignes écrites dans le classeur
+    """
+    pdf_folder = Path("data_factures/facturesv11")
+    output_file = Path("factures.json")
+
+    # Vérifier si le dossier existe
+    if not pdf_folder.exists():
+        print(f"Le dossier {pdf_folder} n'existe pas.")
+        return 0
+
+    # Rapprochement des montants lot par lot (feuille Anomalies et rapport JSON)
+    check = reconcile if RECONCILIATION_ENABLED else None
+    if EXCEL_LAYOUT == 'articles':
+        excel = StreamingExcelWriter(excel_path, partial(create_invoice_tables, layout='articles'),
+                                     FACTURES_NORMALISEES, ARTICLES, reconcile=check)
+    else:
+        excel = StreamingExcelWriter(excel_path, partial(create_invoice_tables, layout='wide'), reconcile=check)
+
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f, excel as writer:
+        # Même contenu que json.dump(all_invoices, f, ensure_ascii=False, indent=2), entrée par entrée
+        f.write('{')
+        for invoice_key, invoice in iter_folder_invoices(list(pdf_folder.glob("*.pdf"))):
+            entry = json.dumps(invoice, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            f.write(f"{',' if count else ''}\n  {json.dumps(invoice_key, ensure_ascii=False)}: {entry}")
+            count += 1
+            writer.write_invoice(invoice_key, invoice)
+        f.write('\n}' if count else '}')
+
+    print(f"\nToutes les factures ont été sauvegardées dans {output_file} ({count} factures au total)")
+    if writer.anomalies is not None and writer.rows:
+        save_reconciliation_report(writer.anomalies, excel_path, writer.rows)
+    return writer.rows
+
+def process_pdf_file(pdf_path, executor=None):
+    """
+    Lit un PDF page par page et traite chaque facture dès que sa dernière page est lue.
+
+    Seules les pages de la facture en cours sont gardées en mémoire, quel que
+    soit le nombre de pages du PDF (voir invoice_splitter.InvoiceSplitter).
+
+    Args:
+        pdf_path (Path): Chemin du PDF
+        executor: Pool analysant les factures pendant la lecture des pages suivantes (optionnel)
+
+    Returns:
+        tuple: (factures du PDF, hits du cache de texte, misses du cache de texte)
+    """
+    cache = get_text_cache()
+    hits_before, misses_before = cache.hits, cache.misses
+    pdf_invoices = dict(iter_pdf_invoices(pdf_path, executor))
+    return pdf_invoices, cache.hits - hits_before, cache.misses - misses_before
+
+def iter_pdf_invoices(pdf_path, executor=None):
+    """
+    Génère les factures d'un PDF, chacune dès que sa dernière page est lue.
+
+    Args:
+        pdf_path (Path): Chemin du PDF
+        executor: Pool analysant les factures pendant la lecture des pages suivantes (optionnel)
+
+    Yields:
+        tuple: (clé de la facture, entrée de factures.json)
+    """
     try:
-        extracted_data = extract_data(combined_text, facture_type)
-        # Fusionner les données extraites avec la structure de base
-        for key, value in extracted_data.items():
-            data[key] = value
-    except Exception as e:
-        print(f"Erreur lors de l'extraction des données détaillées: {str(e)}")
+        # Parcourir chaque page (avec la position des mots pour le parseur de tableau)
+        # et regrouper les pages en factures
+        splitter = InvoiceSplitter(pdf_path.name)
+        pages = iter_pages(str(pdf_path), with_words=TABLE_PARSER_ENABLED)
+        for invoice, classification, data in iter_parsed_invoices(splitter.split(pages), executor):
+            yield invoice.key, invoice_entry(invoice, classification, data)
 
-    # Créer une clé unique pour cette facture
-    invoice_key = f"{pdf_name}_{invoice_num}" if invoice_num else f"{pdf_name}"
+        if splitter.pages_seen == 0:
+            raise ValueError("Pas de texte extrait")
 
-    # Ajouter au dictionnaire principal
-    all_invoices[invoice_key] = {
-        'text': combined_text,
+    except Exception as e:
+        print(f"✗ Erreur sur {pdf_path.name}: {str(e)}")
+        # Ajouter une entrée avec une structure minimale même en cas d'erreur
+        yield pdf_path.name, {
+            'text': '',
+            'data': empty_invoice_data(),
+            'error': str(e)
+        }
+
+def invoice_entry(invoice, classification, data):
+    """Entrée de factures.json d'une facture analysée (voir invoice_splitter.SplitInvoice)"""
+    print(f"Type {classification.type} (confiance {classification.confidence}, "
+          f"{classification.pages_scanned}/{len(invoice.pages_text)} page(s) lue(s))")
+    print(f"✓ {invoice.key} traité avec succès")
+    return {
+        'text': invoice.text,
         'data': data
     }
 
-    print(f"✓ {invoice_key} traité avec succès")
+def iter_folder_invoices(pdf_paths):
+    """
+    Génère les factures de plusieurs PDF, dans l'ordre des fichiers.
+
+    Comme process_pdf_files, un PDF unique est lu ici avec un pool d'analyse
+    et plusieurs PDF sont répartis entre des workers ; chaque facture est
+    générée dès que possible, sans attendre la fin du dossier.
+
+    Yields:
+        tuple: (clé de la facture, entrée de factures.json)
+    """
+    if len(pdf_paths) == 1:
+        with ProcessPoolExecutor() as executor:
+            yield from iter_pdf_invoices(pdf_paths[0], executor)
+    else:
+        for pdf_invoices, _, _ in imap_pdfs(process_pdf_file, pdf_paths):
+            yield from pdf_invoices.items()
 
 def load_invoice_data():
     """Charge les données des factures depuis le fichier JSON ou régénère le fichier si nécessaire"""
@@ -190,28 +216,7 @@ def load_invoice_data():
             for filename, invoice in invoices_data.items():
                 if 'data' not in invoice:
                     print(f"Clé 'data' manquante pour {filename}, ajout d'une structure par défaut")
-                    invoices_data[filename]['data'] = {
-                        'type': 'unknown',
-                        'articles': [],
-                        'TOTAL': {
-                            'total_ht': 0,
-                            'total_ttc': 0,
-                            'tva': 0,
-                            'remise': 0
-                        },
-                        'frais_expedition': {
-                            'montant': 0,
-                            'description': ''
-                        },
-                        'client_name': '',
-                        'numero_facture': '',
-                        'date_facture': '',
-                        'date_commande': '',
-                        'commentaire': '',
-                        'Type_Vente': '',
-                        'Réseau_Vente': '',
-                        'nombre_articles': 0
-                    }
+                    invoices_data[filename]['data'] = empty_invoice_data()
 
             # Calculer le nombre total d'articles pour chaque facture
             for invoice in invoices_data.values():
@@ -240,464 +245,387 @@ def save_invoice_data(invoices_data):
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des factures: {str(e)}")
 
-def format_date(date_str: str) -> str:
-    """Convertit une date YYYY-MM-DD en DD/MM/YYYY"""
-    if not date_str:
-        return ''
-    try:
-        year, month, day = date_str.split('-')
-        return f"{day}/{month}/{year}"
-    except ValueError:
-        return date_str
+def fill_invoice_row(row, filename, facture, summary):
+    """
+    Remplit les colonnes de facture (hors articles) d'une ligne de la feuille Factures.
+
+    Les articles sont calculés pour tout le lot par article_batch.ArticleBatch ;
+    seules leurs sommes par facture (summary) sont utilisées ici.
+
+    Args:
+        row (RowWriter): Ligne à remplir, toutes les colonnes vides au départ
+        filename (str): Clé de la facture (nom du PDF et numéro de facture)
+        facture (Invoice): Facture convertie (montants en centimes)
+        summary (InvoiceSummary): Valeurs de la facture calculées à partir de ses articles
+
+    Returns:
+        list: Colonnes Credit TTC, Credit HT ou TVA Collectee dont le montant a été
+            calculé faute d'avoir été extrait de la facture
+    """
+    totals = facture.totals
+    computed = []
+
+    # Calculer la quantité totale - somme des quantités de tous les articles
+    total_quantity = summary.total_quantity
+    row['quantité'] = total_quantity  # Mettre à jour la colonne 'quantité'
+    print(f"Quantité totale pour {filename}: {total_quantity}")
+
+    # Informations d'acompte (échéance extraite par le parseur)
+    montant_acompte = facture.acompte_montant.euros if facture.acompte_montant is not None else ''
+    date_acompte_iso = facture.acompte_date
+
+    # Calculer le taux de TVA et le total HT avec remise
+    total_ht = totals.total_ht
+    remise = totals.remise
+
+    # Pour les factures MEG, la remise totale est la somme des remises HT des articles
+    if facture.type == 'meg':
+        remise = summary.remise_meg
+        print(f"  MEG: Remise totale calculée: {remise.euros} €")
+
+    # Appliquer la remise si elle existe
+    if remise:
+        # Pour MEG, la remise est déjà en HT, pas besoin de la convertir
+        if facture.type == 'meg':
+            remise_ht = remise
+        else:
+            # Pour les autres types, convertir la remise TTC en HT et s'assurer qu'elle est positive
+            remise_ht = abs(remise).scale(1 / 1.2)
+
+        total_ht_avec_remise = total_ht - remise_ht
+        row['remise'] = remise_ht.euros
+        print(f"  Remise HT appliquée: {remise_ht.euros} €")
+    else:
+        total_ht_avec_remise = total_ht
+        row['remise'] = 0.0  # Utiliser 0.0 au lieu de 0
 
-def create_invoice_dataframe(invoices_data):
-    """Crée un DataFrame à partir des données des factures"""
-    headers = [
-        'Type-facture', 'n°ordre', 'saisie', 'Syst', 'N° Syst.', 'comptable', 'Type_facture',
-        'Type_Vente', 'Réseau_Vente', 'Client', 'Typologie', 'Banque créditée',
-        'Date commande', 'Date facture', 'Date expédition', 'Commentaire',
-        'date1', 'acompte1', 'date2', 'acompte2', 'Date solde', 'solde',
-        'contrôle paiement', 'reste dû', 'AVO', 'tva', 'ttc', 'Credit TTC',
-        'Credit HT', 'remise', 'TVA Collectee', 'quantité'
-    ]
-
-    # Ajouter les headers pour les articles
-    for i in range(1, 21):
-        headers.extend([f'supfam{i}', f'fam{i}', f'ref{i}', f'q{i}', f'prix{i}',
-                      f'r€{i}', f'ht{i}', f'tva€{i}'])
+    total_ttc = totals.total_ttc
+    tva_value = totals.tva
 
-    rows = []
+    # S'assurer que total_ttc est correctement calculé pour les factures MEG
+    if facture.type == 'meg' and total_ttc == 0 and total_ht > 0 and tva_value > 0:
+        total_ttc = total_ht_avec_remise + tva_value
+        computed.append('Credit TTC')
+        print(f"  Total TTC calculé pour {filename}: {total_ttc.euros}")
+
+    # Taux de TVA du premier article (en décimal), s'il est connu
+    taux_tva_premier_article = summary.taux_tva_premier_article
+
+    taux_tva_decimal = 0.0
+    if facture.type == 'meg' and facture.articles:
+        taux_tva_decimal = taux_tva_premier_article or 0.0
+    else:
+        if total_ht != 0:
+            taux_tva_decimal = (total_ttc / total_ht) - 1
+        else:
+            taux_tva_decimal = 0.2  # 20% par défaut
+
+    # Remplir les données dans l'ordre exact des colonnes
+    row['Type-facture'] = " "
+    row['n°ordre'] = " "
+    row['saisie'] = ''
+    if facture.type == 'meg':
+        row['Syst'] = 'MEG'
+    elif facture.type == 'internet':
+        row['Syst'] = 'Internet'
+    elif facture.type == 'acompte':
+        row['Syst'] = 'Acompte'
+    else:
+        row['Syst'] = facture.type
+
+    # Utiliser numéro de commande si numéro de facture n'est pas disponible
+    row['N° Syst.'] = facture.numero_facture or facture.numero_commande
 
-    # Vérifier si invoices_data est vide
-    if not invoices_data:
-        # Retourner un DataFrame vide avec les bonnes colonnes
-        return pd.DataFrame(columns=headers)
+    row['comptable'] = ''
 
+    # S'assurer que Type_facture, Type_Vente et Réseau_Vente sont correctement remplis
+    if facture.type == 'meg':
+        row['Type_facture'] = 'Facture'
+    elif facture.type == 'acompte':
+        row['Type_facture'] = 'Acompte'
+    elif facture.type == 'internet':
+        row['Type_facture'] = 'Internet'
+    else:
+        row['Type_facture'] = facture.type
+
+    # Pour Type_Vente et Réseau_Vente, utiliser les valeurs directement depuis les données
+    row['Type_Vente'] = facture.type_vente
+    row['Réseau_Vente'] = facture.reseau_vente
+    row['Client'] = facture.client_name
+    row['Typologie'] = ''
+    row['Banque créditée'] = ''
+    row['Date commande'] = to_excel_date(facture.date_commande)
+    row['Date facture'] = to_excel_date(facture.date_facture)
+    row['Commentaire'] = facture.commentaire
+    row['date1'] = to_excel_date(date_acompte_iso)
+    if montant_acompte != '':
+        row['acompte1'] = montant_acompte
+
+    # S'assurer que le solde est correctement rempli
+    if total_ttc > 0:
+        row['solde'] = total_ttc.euros
+        print(f"Solde pour {filename}: {total_ttc.euros}")
+    else:
+        # Si pas de total_ttc, essayer de le calculer à partir de total_ht et tva
+        if total_ht_avec_remise > 0 and tva_value > 0:
+            calculated_ttc = total_ht_avec_remise + tva_value
+            row['solde'] = calculated_ttc.euros
+            print(f"Solde calculé pour {filename}: {calculated_ttc.euros} (HT: {total_ht_avec_remise.euros}, TVA: {tva_value.euros})")
+        else:
+            row['solde'] = 0.0
+            print(f"Attention: Pas de solde trouvé pour {filename}")
+
+    row['contrôle paiement'] = facture.statut_paiement
+    # Le montant payé n'est pas extrait : le reste dû est nul
+    row['reste dû'] = (totals.total_ttc - totals.total_ttc).euros
+    row['AVO'] = ''
+    # Taux arrondi au centième de pourcentage (format Excel 0.00%)
+    row['tva'] = round(taux_tva_decimal, 4)
+
+    # === NOUVELLE LOGIQUE POUR LES MONTANTS ===
+    # 1. D'abord essayer d'obtenir un total TTC valide
+    total_ttc_value = ZERO
+    total_ht_value = ZERO
+
+    if total_ttc > 0:
+        total_ttc_value = total_ttc
+    # Si pas de total_ttc mais qu'on a la TVA, on peut calculer le TTC à partir de la TVA (cas des factures multi-pages)
+    elif tva_value > 0:
+        # Calculer le Total HT basé sur la TVA (20%)
+        total_ht_value = tva_value.scale(5)  # TVA est 20% du HT donc HT = TVA * 5
+        total_ttc_value = total_ht_value + tva_value
+        computed.append('Credit TTC')
+        print(f"Calcul TTC à partir de la TVA pour {filename}: TVA={tva_value.euros}, TTC calculé={total_ttc_value.euros}")
+
+    # 2. Ensuite essayer d'obtenir un total_ht valide
+    if total_ht > 0:
+        total_ht_value = total_ht
+    # Si on a un TTC mais pas de HT, on peut calculer le HT à partir du TTC
+    elif total_ttc_value > 0 and total_ht_value == 0:
+        # Taux de TVA du premier article s'il existe, 20% par défaut
+        taux_tva_article = taux_tva_premier_article if taux_tva_premier_article is not None else 0.20
+        # Calculer le HT (TTC / (1 + Taux TVA))
+        total_ht_value = total_ttc_value.scale(1 / (1 + taux_tva_article))
+        computed.append('Credit HT')
+        print(f"Calcul HT pour {filename}: {total_ht_value.euros}")
+
+    # 3. Enfin, si on a HT mais pas de TVA, on peut calculer la TVA à partir du HT
+    if not tva_value and total_ht_value > 0:
+        taux_tva_article = taux_tva_premier_article if taux_tva_premier_article is not None else 0.20
+        tva_value = total_ht_value.scale(taux_tva_article)
+        computed.append('TVA Collectee')
+        print(f"Calcul TVA pour {filename}: {tva_value.euros}")
+
+    # 4. Assigner les valeurs finales
+    row['Credit TTC'] = total_ttc_value.euros
+    row['Credit HT'] = total_ht_value.euros
+    row['TVA Collectee'] = tva_value.euros
+
+    # 5. Mettre à jour le solde si nécessaire avec les valeurs calculées
+    if row['solde'] == 0.0 and total_ttc_value > 0:
+        row['solde'] = total_ttc_value.euros
+        print(f"Solde mis à jour pour {filename} avec Credit TTC: {total_ttc_value.euros}")
+
+    return computed
+
+def build_invoice_frames(invoices_data, article_slots=MAX_ARTICLES):
+    """
+    Crée les DataFrame des factures et de leurs articles, sans corrections.
+
+    Les factures sont converties une seule fois (invoice_model.Invoice), puis
+    les articles de tout le lot sont calculés ensemble par
+    article_batch.ArticleBatch. Chaque ligne de facture est remplie par
+    fill_invoice_row, et les colonnes d'articles sont remplies en bloc.
+
+    La colonne INVOICE_KEY de df contient la clé de chaque facture dans
+    invoices_data, dans les deux dispositions (la feuille Factures de la
+    disposition large ne l'écrit pas). Les lignes dont un montant a été
+    calculé plutôt qu'extrait sont conservées dans df.attrs[COMPUTED_AMOUNTS]
+    (colonne -> lignes), pour le rapprochement (voir reconciliation.reconcile).
+
+    Args:
+        invoices_data (dict): Factures (format de factures.json)
+        article_slots (int): Colonnes d'articles par facture (MAX_ARTICLES) ; 0 en
+            disposition normalisée, les articles formant alors la feuille Articles
+
+    Returns:
+        tuple: (DataFrame des factures, DataFrame des articles ou None en disposition large)
+    """
+    schema = FACTURES if article_slots else FACTURES_NORMALISEES
+    builder = InvoiceFrameBuilder(len(invoices_data), schema)
+
+    # Conversion unique en enregistrements compacts (montants en centimes)
+    filenames, factures = [], []
     for filename, invoice in invoices_data.items():
         try:
             # Vérifier si 'data' existe dans invoice
             if 'data' not in invoice:
                 print(f"Clé 'data' manquante pour {filename}")
                 continue
+            factures.append(Invoice.from_dict(invoice['data']))
+            filenames.append(filename)
+        except Exception as e:
+            print(f"Erreur lors du traitement de {filename}: {str(e)}")
 
-            data = invoice['data']
-            row = {col: '' for col in headers}  # Initialiser toutes les colonnes avec des valeurs vides
-
-            # Calculer la quantité totale - somme des quantités de tous les articles
-            articles = data.get('articles', [])
-            total_quantity = sum(float(article.get('quantite', 0)) for article in articles)
-            row['quantité'] = total_quantity  # Mettre à jour la colonne 'quantité'
-            print(f"Quantité totale pour {filename}: {total_quantity}")
-
-            # Extraire la date
-            date = data.get('date', '')
-            if data.get('type') == 'internet' and 'text' in invoice:
-                date_match = re.search(r'Date de commande\s*:\s*(\d{1,2}\s*\w+\s*\d{4})', invoice.get('text', ''))
-                if date_match:
-                    date_fr = date_match.group(1).strip()
-                    mois_fr = {
-                        'janvier': '01', 'février': '02', 'mars': '03', 'avril': '04',
-                        'mai': '05', 'juin': '06', 'juillet': '07', 'août': '08',
-                        'septembre': '09', 'octobre': '10', 'novembre': '11', 'décembre': '12'
-                    }
-                    for mois, num in mois_fr.items():
-                        date_fr = date_fr.replace(mois, num)
-                    try:
-                        jour, mois, annee = re.match(r'(\d{1,2})\s*(\d{2})\s*(\d{4})', date_fr).groups()
-                        date = f"{annee}-{mois}-{jour.zfill(2)}"
-                    except (AttributeError, ValueError):
-                        date = ''
-
-            # Extraire les informations d'acompte
-            acompte_match = None
-            if 'text' in invoice:
-                acompte_match = re.search(r'Echéance\(s\)\s*Acompte\s*de\s*(\d+[\s\d]*,\d+)\s*€\s*au\s*(\d{2}/\d{2}/\d{4})', invoice.get('text', ''))
-
-            montant_acompte = ''
-            date_acompte_iso = ''
-            if acompte_match:
-                montant_acompte = float(acompte_match.group(1).replace(' ', '').replace(',', '.'))
-                date_acompte = acompte_match.group(2)
-                jour, mois, annee = date_acompte.split('/')
-                date_acompte_iso = f"{annee}-{mois}-{jour}"
-
-            # Calculer le taux de TVA et le total HT avec remise
-            total_ht = data.get('TOTAL', {}).get('total_ht', 0)
-            remise = data.get('TOTAL', {}).get('remise', 0)
-
-            # Pour les factures MEG, calculer la remise totale en additionnant les remises de chaque article
-            if data.get('type') == 'meg':
-                remise_totale = 0
-                for article in articles:
-                    quantite = float(article.get('quantite', 0))
-                    prix_unitaire = article.get('prix_unitaire', 0)
-                    remise_pourcentage = article.get('remise', 0)  # Déjà en décimal (exemple: 0.10 pour 10%)
-                    remise_article = prix_unitaire * remise_pourcentage * quantite  # Remise en euros sur le montant HT
-                    remise_totale += remise_article
-                    print(f"  MEG: Remise de {remise_pourcentage*100}% sur article {article.get('reference', '')}: {remise_article} € (calculée sur le prix HT {prix_unitaire} €)")
-
-                remise = remise_totale
-                print(f"  MEG: Remise totale calculée: {remise} €")
-
-            # Appliquer la remise si elle existe
-            if remise:
-                # Pour MEG, la remise est déjà en HT, pas besoin de la convertir
-                if data.get('type') == 'meg':
-                    remise_ht = remise
-                else:
-                    # Pour les autres types, convertir la remise TTC en HT et s'assurer qu'elle est positive
-                    remise_ht = round(abs(float(remise)) / 1.2, 2)
-
-                total_ht_avec_remise = total_ht - remise_ht
-                row['remise'] = float(remise_ht)  # Convertir en float explicitement
-                print(f"  Remise HT appliquée: {remise_ht} €")
-            else:
-                total_ht_avec_remise = total_ht
-                row['remise'] = 0.0  # Utiliser 0.0 au lieu de 0
-
-            total_ttc = data.get('TOTAL', {}).get('total_ttc', 0)
-            tva_value = data.get('TOTAL', {}).get('tva', 0)
-
-            # S'assurer que total_ttc est correctement calculé pour les factures MEG
-            if data.get('type') == 'meg' and total_ttc == 0 and total_ht > 0 and tva_value > 0:
-                total_ttc = total_ht_avec_remise + tva_value
-                print(f"  Total TTC calculé pour {filename}: {total_ttc}")
-
-            taux_tva = ''
-            taux_tva_decimal = 0.0
-            if data.get('type') == 'meg' and articles:
-                taux_tva_decimal = articles[0].get('tva', 0) / 100
-                taux_tva = f"{articles[0].get('tva', 0):.2f}%".replace('.', ',')
-            else:
-                if total_ht and total_ht != 0:
-                    taux_tva_decimal = (total_ttc / total_ht) - 1
-                    taux_tva = f"{taux_tva_decimal * 100:.2f}%".replace('.', ',')
-                else:
-                    taux_tva_decimal = 0.2  # 20% par défaut
-                    taux_tva = "20,00%"
-
-            # Remplir les données dans l'ordre exact des colonnes
-            row['Type-facture'] = " "
-            row['n°ordre'] = " "
-            row['saisie'] = ''
-            if data.get('type') == 'meg':
-                row['Syst'] = 'MEG'
-            elif data.get('type') == 'internet':
-                row['Syst'] = 'Internet'
-            elif data.get('type') == 'acompte':
-                row['Syst'] = 'Acompte'
-            else:
-                row['Syst'] = data.get('type', '')
-
-            # Utiliser numéro de commande si numéro de facture n'est pas disponible
-            if data.get('numero_facture'):
-                row['N° Syst.'] = data.get('numero_facture', '')
-            elif data.get('numero_commande'):
-                row['N° Syst.'] = data.get('numero_commande', '')
-            else:
-                row['N° Syst.'] = ''
-
-            row['comptable'] = ''
-
-            # S'assurer que Type_facture, Type_Vente et Réseau_Vente sont correctement remplis
-            if data.get('type') == 'meg':
-                row['Type_facture'] = 'Facture'
-            elif data.get('type') == 'acompte':
-                row['Type_facture'] = 'Acompte'
-            elif data.get('type') == 'internet':
-                row['Type_facture'] = 'Internet'
-            else:
-                row['Type_facture'] = data.get('type', '')
-
-            # Pour Type_Vente et Réseau_Vente, utiliser les valeurs directement depuis les données
-            row['Type_Vente'] = data.get('Type_Vente', '')
-            row['Réseau_Vente'] = data.get('Réseau_Vente', '')
-            row['Client'] = data.get('client_name', '')
-            row['Typologie'] = ''
-            row['Banque créditée'] = ''
-            row['Date commande'] = format_date(data.get('date_commande', ''))
-            row['Date facture'] = format_date(data.get('date_facture', ''))
-            row['Date expédition'] = ''
-            row['Commentaire'] = data.get('commentaire', '')
-            row['date1'] = format_date(date_acompte_iso)
-            row['acompte1'] = montant_acompte
-            row['date2'] = ''
-            row['acompte2'] = ''
-            row['Date solde'] = ''
-
-            # S'assurer que le solde est correctement rempli
-            if isinstance(total_ttc, (int, float)) and total_ttc > 0:
-                row['solde'] = float(total_ttc)
-                print(f"Solde pour {filename}: {total_ttc}")
-            else:
-                # Si pas de total_ttc, essayer de le calculer à partir de total_ht et tva
-                if total_ht_avec_remise > 0 and tva_value > 0:
-                    calculated_ttc = total_ht_avec_remise + tva_value
-                    row['solde'] = float(calculated_ttc)
-                    print(f"Solde calculé pour {filename}: {calculated_ttc} (HT: {total_ht_avec_remise}, TVA: {tva_value})")
-                else:
-                    # Essayer d'autres sources de données pour obtenir un solde valide
-                    if data.get('TOTAL', {}).get('total_ttc', 0) > 0:
-                        row['solde'] = float(data.get('TOTAL', {}).get('total_ttc', 0))
-                        print(f"Solde obtenu depuis data.TOTAL.total_ttc pour {filename}: {row['solde']}")
-                    else:
-                        row['solde'] = 0.0
-                    print(f"Attention: Pas de solde trouvé pour {filename}")
-
-            row['contrôle paiement'] = data.get('statut_paiement', '')
-            # Assurez-vous que reste dû est un float
-            reste_du = data.get('TOTAL', {}).get('total_ttc', 0) - data.get('TOTAL', {}).get('total_ttc', 0)
-            row['reste dû'] = float(reste_du)
-            row['AVO'] = ''
-            row['tva'] = taux_tva
-            row['ttc'] = ''
-
-            # === NOUVELLE LOGIQUE POUR LES MONTANTS ===
-            # 1. D'abord essayer d'obtenir un total TTC valide
-            total_ttc_value = 0.0
-            total_ht_value = 0.0
-
-            # Essayer d'abord total_ttc direct
-            if isinstance(total_ttc, (int, float)) and total_ttc > 0:
-                total_ttc_value = total_ttc
-            # Sinon, essayer de récupérer depuis data['TOTAL']
-            elif isinstance(data.get('TOTAL', {}).get('total_ttc'), (int, float)) and data.get('TOTAL', {}).get('total_ttc') > 0:
-                total_ttc_value = data.get('TOTAL', {}).get('total_ttc')
-            # Si pas de total_ttc mais qu'on a la TVA, on peut calculer le TTC à partir de la TVA (cas des factures multi-pages)
-            elif isinstance(data.get('TOTAL', {}).get('tva'), (int, float)) and data.get('TOTAL', {}).get('tva') > 0:
-                tva_value = data.get('TOTAL', {}).get('tva')
-                # Calculer le Total HT basé sur la TVA (20%)
-                total_ht_value = tva_value * 5  # TVA est 20% du HT donc HT = TVA * 5
-                total_ttc_value = total_ht_value + tva_value
-                print(f"Calcul TTC à partir de la TVA pour {filename}: TVA={tva_value}, TTC calculé={total_ttc_value}")
-
-            # 2. Ensuite essayer d'obtenir un total_ht valide
-            if isinstance(total_ht, (int, float)) and total_ht > 0:
-                total_ht_value = total_ht
-            # Sinon, essayer de récupérer depuis data['TOTAL']
-            elif isinstance(data.get('TOTAL', {}).get('total_ht'), (int, float)) and data.get('TOTAL', {}).get('total_ht') > 0:
-                total_ht_value = data.get('TOTAL', {}).get('total_ht')
-            # Si on a un TTC mais pas de HT, on peut calculer le HT à partir du TTC
-            elif total_ttc_value > 0 and total_ht_value == 0:
-                # Calculer le HT à partir du TTC
-                taux_tva_article = 0.20  # Par défaut 20%
-                # Essayer de récupérer le taux TVA du premier article s'il existe
-                if articles and isinstance(articles[0].get('tva'), (int, float)):
-                    taux_tva_article = articles[0].get('tva') / 100
-                # Calculer le HT (TTC / (1 + Taux TVA))
-                total_ht_value = total_ttc_value / (1 + taux_tva_article)
-                print(f"Calcul HT pour {filename}: {total_ht_value}")
-
-            # 3. Enfin, essayer d'obtenir la TVA
-            if isinstance(tva_value, (int, float)) and tva_value > 0:
-                tva_value = tva_value
-            # Sinon, essayer de récupérer depuis data['TOTAL']
-            elif isinstance(data.get('TOTAL', {}).get('tva'), (int, float)) and data.get('TOTAL', {}).get('tva') > 0:
-                tva_value = data.get('TOTAL', {}).get('tva')
-            # Si on a HT mais pas de TVA, on peut calculer la TVA à partir du HT
-            elif total_ht_value > 0 and not tva_value:
-                taux_tva_article = 0.20  # Par défaut 20%
-                # Essayer de récupérer le taux TVA du premier article s'il existe
-                if articles and isinstance(articles[0].get('tva'), (int, float)):
-                    taux_tva_article = articles[0].get('tva') / 100
-                tva_value = total_ht_value * taux_tva_article
-                print(f"Calcul TVA pour {filename}: {tva_value}")
-
-            # 4. Nettoyer les valeurs pour éviter les caractères problématiques
-            clean_ttc = float(str(total_ttc_value).replace('°', '').replace(',', '.'))
-            clean_ht = float(str(total_ht_value).replace('°', '').replace(',', '.'))
-            clean_tva = float(str(tva_value).replace('°', '').replace(',', '.'))
-
-            # 5. Assigner les valeurs finales
-            row['Credit TTC'] = clean_ttc
-            row['Credit HT'] = clean_ht
-            row['TVA Collectee'] = clean_tva
-
-            # 6. Mettre à jour le solde si nécessaire avec les valeurs calculées
-            if row['solde'] == 0.0 and clean_ttc > 0:
-                row['solde'] = clean_ttc
-                print(f"Solde mis à jour pour {filename} avec Credit TTC: {clean_ttc}")
-
-            # Cas spécifique pour les factures 990 et 994 - CORRECTION PRIORITAIRE
-            # Appliquer cette correction en priorité pour ces factures spécifiques
-            if "FAC00000990" in filename or "FAC00000994" in filename:
-                if clean_ttc > 0:
-                    row['solde'] = clean_ttc
-                    print(f"Solde spécifique pour {filename}: {clean_ttc}")
-                elif row['Credit TTC'] > 0:
-                    row['solde'] = row['Credit TTC']
-                    print(f"Solde spécifique pour {filename} via Credit TTC: {row['Credit TTC']}")
-                elif total_ttc_value > 0:
-                    row['solde'] = total_ttc_value
-                    print(f"Solde spécifique pour {filename} via total_ttc_value: {total_ttc_value}")
-                elif data.get('TOTAL', {}).get('total_ttc', 0) > 0:
-                    row['solde'] = data.get('TOTAL', {}).get('total_ttc', 0)
-                    print(f"Solde spécifique pour {filename} via data.TOTAL.total_ttc: {data.get('TOTAL', {}).get('total_ttc', 0)}")
-
-            # Remplir les articles
-            article_index = 1
-            for article in articles:
-                if article_index > 20:
-                    break
-
-                # Récupérer les données de l'article
-                quantite = float(article.get('quantite', 0))
-                prix_unitaire = article.get('prix_unitaire', 0)
-                montant_ht = article.get('montant_ht', 0)
-                # Les remises individuelles d'articles ne sont plus utilisées
-                # pour la colonne "r€N" car la remise est appliquée au total
-                article_remise = 0  # Mettre à 0 pour les colonnes r€N
-
-                # Traitement spécifique selon le type de facture
-                if data.get('type') == 'meg':
-                    # Pour MEG, calcul basé sur le taux de TVA de l'article
-                    taux_tva_decimal_article = article.get('tva', 0) / 100
-                    # Pour MEG, le prix_unitaire est déjà HT, donc on l'utilise directement
-                    prix_pour_excel = prix_unitaire
-                    tva_euros = montant_ht * taux_tva_decimal_article
-
-                    # Pour les factures MEG, si une remise est détectée, calculer la valeur en euros basée sur le prix HT
-                    if article.get('remise', 0) > 0:
-                        remise_pourcentage = article.get('remise', 0)  # Déjà en décimal (exemple: 0.10 pour 10%)
-                        article_remise = prix_unitaire * remise_pourcentage * quantite  # Remise en euros sur le montant HT
-
-                else:  # internet ou acompte
-                    # Pour Internet, le prix_unitaire stocké est TTC
-                    # Pour les factures internet, le prix affiché est TTC et on doit calculer le HT en divisant par 1.20
-                    if data.get('type') == 'internet':
-                        # Utiliser le prix TTC extrait directement
-                        prix_articles_ttc = article.get('prix_ttc', 0)
-                        if prix_articles_ttc == 0:
-                            # Si pas de prix TTC, utiliser le prix unitaire (qui est TTC pour les factures internet)
-                            prix_articles_ttc = prix_unitaire
-
-                        # Pour les factures internet, le prix_ttc est déjà le prix unitaire TTC
-                        # Pas besoin de diviser par la quantité car c'est déjà le prix unitaire
-                        prix_unitaire_ttc = prix_articles_ttc
-                        
-                        # Vérifier si c'est un article CADEAU (TVA 0%)
-                        if "CADEAU" in article.get('reference', '').upper():
-                            # Pour les articles CADEAU, le prix TTC = prix HT (pas de TVA)
-                            prix_unitaire_ht = prix_unitaire_ttc
-                            montant_ht = prix_unitaire_ht * quantite
-                            tva_euros = 0  # Pas de TVA pour les articles CADEAU
-                            print(f"  Article CADEAU détecté dans Excel: {article.get('reference')} - TVA: 0 €")
-                        else:
-                            # Calculer le prix unitaire HT en divisant par 1.20
-                            prix_unitaire_ht = prix_unitaire_ttc / 1.20
-                            montant_ht = prix_unitaire_ht * quantite
-                            # Utiliser le taux de TVA de l'article ou 20% par défaut
-                            taux_tva_article = article.get('tva', 20.0) / 100
-                            tva_euros = montant_ht * taux_tva_article
-                        
-                        prix_pour_excel = prix_unitaire_ht
-                    else:  # acompte
-                        # Pour les factures d'acompte, le calcul reste standard
-                        # Calculer montant HT si non disponible
-                        if montant_ht == 0 and prix_unitaire > 0:
-                            montant_ht = prix_unitaire * quantite
-                        elif prix_unitaire == 0 and montant_ht > 0 and quantite > 0:
-                            prix_unitaire = montant_ht / quantite
-
-                        prix_unitaire_ttc = prix_unitaire * (1 + taux_tva_decimal)
-                        montant_ttc = montant_ht * (1 + taux_tva_decimal)
-                        tva_euros = montant_ht * taux_tva_decimal
-                        prix_pour_excel = prix_unitaire
-
-                # S'assurer que prix unitaire et montant HT sont cohérents mais distincts
-                if montant_ht == prix_unitaire and quantite > 1:
-                    # Si les valeurs sont identiques alors que la quantité est > 1, c'est une erreur
-                    prix_unitaire = montant_ht / quantite
-                    prix_unitaire_ttc = prix_unitaire * (1 + taux_tva_decimal)
-                    prix_pour_excel = prix_unitaire_ht if data.get('type') == 'internet' else prix_unitaire
-
-                row[f'supfam{article_index}'] = ''
-                row[f'fam{article_index}'] = ''
-                row[f'ref{article_index}'] = article.get('reference', '')
-                row[f'q{article_index}'] = float(quantite)
-                row[f'prix{article_index}'] = float(round(prix_pour_excel, 2))
-                row[f'r€{article_index}'] = float(article_remise)  # S'assurer que c'est un float
-                row[f'ht{article_index}'] = float(round(montant_ht, 2))
-                row[f'tva€{article_index}'] = float(round(tva_euros, 2))
-
-                article_index += 1
-
-            # Ajouter les frais d'expédition comme un article supplémentaire
-            frais_expedition = data.get('frais_expedition', {})
-            if frais_expedition and (frais_expedition.get('montant', 0) > 0 or frais_expedition.get('description', '')):
-                if article_index <= 20:  # S'assurer qu'on n'a pas dépassé le nombre maximum d'articles
-                    # Créer un nouvel article pour les frais d'expédition
-                    if frais_expedition.get('montant', 0) > 0:
-                        # Frais d'expédition payants
-                        montant_ht = frais_expedition.get('montant', 0) / 1.20
-                        prix_unitaire = montant_ht  # Prix HT
-                        prix_unitaire_ttc = frais_expedition.get('montant', 0)  # Prix TTC
-                        tva_euros = montant_ht * 0.20
-                    else:
-                        # Transport gratuit
-                        montant_ht = 0
-                        prix_unitaire = 0
-                        prix_unitaire_ttc = 0
-                        tva_euros = 0
-
-                    # Référence standardisée pour le transport
-                    reference_transport = "TRPF-TRANSP-0000"
-
-                    # Choisir le prix pour l'affichage selon le type de facture
-                    prix_pour_excel = prix_unitaire_ttc if data.get('type') == 'internet' else prix_unitaire
-
-                    # Remplir les données de l'article d'expédition dans le DataFrame
-                    row[f'supfam{article_index}'] = ''  # Plus de description dans supfam
-                    row[f'fam{article_index}'] = ''
-                    row[f'ref{article_index}'] = reference_transport
-                    row[f'q{article_index}'] = 1
-                    row[f'prix{article_index}'] = round(prix_pour_excel, 2)
-                    row[f'r€{article_index}'] = 0  # Pas de remise sur le transport
-                    row[f'ht{article_index}'] = round(montant_ht, 2)
-                    row[f'tva€{article_index}'] = round(tva_euros, 2)
-
-            rows.append(row)
+    # Articles de toutes les factures, calculés en une fois
+    batch = ArticleBatch(factures)
 
+    # Ligne de chaque facture dans le builder (-1 si elle n'a pas pu être remplie)
+    rows = np.full(len(factures), -1)
+    keys = np.full(len(factures), '', dtype=object)
+    computed_amounts = {}
+    for index, (filename, facture) in enumerate(zip(filenames, factures)):
+        try:
+            computed = fill_invoice_row(builder.new_row(), filename, facture, batch.summary(index))
+            builder.commit()
+            rows[index] = builder.size - 1
+            keys[builder.size - 1] = filename
+            for column in computed:
+                computed_amounts.setdefault(column, []).append(builder.size - 1)
         except Exception as e:
             print(f"Erreur lors du traitement de {filename}: {str(e)}")
             continue
 
-    # Si aucune ligne n'a été ajoutée, retourner un DataFrame vide avec les bonnes colonnes
-    if not rows:
-        return pd.DataFrame(columns=headers)
-
-    # Créer le DataFrame en respectant l'ordre exact des colonnes
-    df = pd.DataFrame(rows)
-
-    # S'assurer que toutes les colonnes sont présentes, même si vides
-    for col in headers:
-        if col not in df.columns:
-            df[col] = ''
+    if article_slots:
+        # Colonnes d'articles de la feuille (disposition large) : les articles au-delà sont ignorés
+        for index in np.flatnonzero((batch.counts > article_slots) & (rows >= 0)):
+            print(f"Attention: {batch.counts[index]} articles pour {filenames[index]}, seuls les {article_slots} "
+                  f"premiers sont exportés (disposition normalisée : EXCEL_LAYOUT=articles)")
+        batch.fill_slots(builder.columns, rows, article_slots)
+        articles = None
+    else:
+        articles = batch.to_frame(keys, builder.columns['N° Syst.'], rows)
 
-    return df[headers]  # Forcer l'ordre exact des colonnes
+    # DataFrame créé une seule fois, dans l'ordre exact des colonnes
+    df = builder.to_frame()
+    # Clé de chaque facture, aussi en disposition large, où elle n'est pas écrite dans la feuille
+    if INVOICE_KEY in df.columns:
+        df[INVOICE_KEY] = keys[:len(df)]
+    else:
+        df.insert(0, INVOICE_KEY, keys[:len(df)])
+    df.attrs[COMPUTED_AMOUNTS] = computed_amounts
+    return df, articles
 
-def format_excel(writer, df):
-    """Applique le formatage au fichier Excel"""
+def create_invoice_dataframe(invoices_data):
+    """
+    Crée un DataFrame à partir des données des factures
+
+    Les colonnes sont préallouées pour toutes les factures et remplies ligne à
+    ligne (voir invoice_frame.InvoiceFrameBuilder) ; les cellules vides sont ''
+    pour les colonnes texte et NaN pour les colonnes numériques.
+
+    Args:
+        invoices_data (dict): Factures (format de factures.json)
+    """
+    df, _ = build_invoice_frames(invoices_data)
+    apply_corrections(df)
+    return df
+
+def apply_corrections(df, articles=None):
+    """
+    Applique les corrections déclarées dans correction_rules à la feuille Factures
+    (et à la feuille Articles en disposition normalisée), en place.
+
+    Les corrections appliquées sont conservées dans df.attrs['corrections'],
+    (nom de la règle, position de la facture dans df).
+    """
+    applied = CORRECTIONS.apply(df, articles)
+    keys = df[INVOICE_KEY].to_numpy(dtype=object)
+    for rule_name, row in applied:
+        print(f"Correction '{rule_name}' appliquée à {keys[row]}")
+    df.attrs['corrections'] = applied
+    return applied
+
+def create_invoice_tables(invoices_data, layout=None):
+    """
+    Crée les DataFrame des feuilles du classeur, selon la disposition choisie.
+
+    Args:
+        invoices_data (dict): Factures (format de factures.json)
+        layout (str): 'wide' (une ligne par facture, 20 articles au plus) ou
+            'articles' (feuilles Factures et Articles) ; EXCEL_LAYOUT par défaut
+
+    Returns:
+        tuple: (DataFrame des factures, DataFrame des articles ou None en disposition large)
+    """
+    if (layout or EXCEL_LAYOUT) != 'articles':
+        return create_invoice_dataframe(invoices_data), None
+
+    df, articles = build_invoice_frames(invoices_data, article_slots=0)
+    apply_corrections(df, articles)
+    return df, articles
+
+def write_invoice_sheets(writer, df, articles=None, anomalies=None):
+    """
+    Écrit et met en forme la feuille Factures et, en disposition normalisée, la
+    feuille Articles, puis la feuille Anomalies si le rapprochement a été fait
+    """
+    schema = FACTURES if articles is None else FACTURES_NORMALISEES
+    # La feuille de la disposition large garde les colonnes du modèle Nomads, sans la clé
+    df = df[schema.headers] if INVOICE_KEY not in schema else df
+    df.to_excel(writer, sheet_name=schema.name, index=False)
+    format_excel(writer, df, schema=schema)
+    if articles is not None:
+        articles.to_excel(writer, sheet_name=ARTICLES.name, index=False)
+        format_excel(writer, articles, schema=ARTICLES)
+    if anomalies is not None:
+        anomalies.to_excel(writer, sheet_name=ANOMALIES.name, index=False)
+        format_excel(writer, anomalies, schema=ANOMALIES)
+
+def save_reconciliation_report(anomalies, excel_path, nb_invoices):
+    """Écrit le rapport JSON des anomalies à côté du classeur et affiche leur nombre par contrôle"""
+    for check, count in anomalies['contrôle'].value_counts(sort=False).items():
+        print(f"Rapprochement '{check}': {count} anomalie(s)")
+    path = write_reconciliation_report(anomalies, report_path(excel_path), nb_invoices)
+    print(f"Rapprochement : {len(anomalies)} anomalie(s) pour {nb_invoices} factures, rapport {path}")
+    return path
+
+# Nombre maximal de lignes lues pour calculer la largeur des colonnes (0 : toutes les lignes)
+WIDTH_SAMPLE_ROWS = int(os.environ.get("EXCEL_WIDTH_SAMPLE_ROWS", "5000"))
+
+def _values_width(values: np.ndarray) -> int:
+    """Longueur du plus long texte parmi les valeurs (calcul vectorisé), 0 si toutes sont vides"""
+    if values.dtype.kind == 'M':
+        # Dates affichées au format dd/mm/yyyy
+        return len('dd/mm/yyyy')
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    if not values.size:
+        return 0
+    # Les montants et libellés se répètent : chaque valeur distincte n'est convertie qu'une fois
+    return int(np.char.str_len(pd.unique(values).astype(str)).max())
+
+def column_widths(df, sample_rows=WIDTH_SAMPLE_ROWS):
+    """
+    Largeur de chaque colonne : plus longue valeur ou en-tête, plus une marge.
+
+    Au-delà de sample_rows lignes, la largeur est calculée sur sample_rows
+    lignes réparties régulièrement dans la feuille (la première et la
+    dernière comprises), pour un coût borné sur les très grandes feuilles.
+    """
+    if sample_rows and len(df) > sample_rows:
+        df = df.iloc[np.linspace(0, len(df) - 1, sample_rows).astype(int)]
+    return [max(_values_width(df[col].to_numpy()), len(str(col))) + 2 for col in df.columns]
+
+def excel_writer(path):
+    """ExcelWriter xlsxwriter écrivant les dates au format du schéma (dd/mm/yyyy)"""
+    return pd.ExcelWriter(path, engine='xlsxwriter', date_format=DATE_FORMAT, datetime_format=DATE_FORMAT)
+
+def format_excel(writer, df, sample_rows=WIDTH_SAMPLE_ROWS, schema=FACTURES):
+    """Applique le formatage à la feuille du schéma (largeurs et formats des colonnes)"""
     try:
         workbook = writer.book
-        worksheet = writer.sheets['Factures']
+        worksheet = writer.sheets[schema.name]
+
+        # Formats natifs (montant, pourcentage, date) déclarés par sheet_schema
+        column_formats = schema.excel_formats(workbook, df.columns)
 
-        # Définir la largeur des colonnes
-        for idx, col in enumerate(df.columns):
-            max_length = max(
-                df[col].astype(str).apply(len).max(),
-                len(str(col))
-            ) + 2
-            worksheet.set_column(idx, idx, max_length)
+        # Définir la largeur et le format des colonnes
+        for idx, width in enumerate(column_widths(df, sample_rows)):
+            worksheet.set_column(idx, idx, width, column_formats.get(idx))
 
         # Créer des formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'bg_color': '#D9E1F2',
-            'border': 1
-        })
+        header_format = workbook.add_format(HEADER_FORMAT)
 
         # Appliquer le format aux en-têtes
         for col_num, value in enumerate(df.columns.values):
@@ -754,6 +682,21 @@ def create_excel_from_data(invoices_data):
 
 def main():
     try:
+        # Générer le nom du fichier avec la date et l'heure au format YYMMDDHHMMSS en GMT+1
+        paris_tz = pytz.timezone('Europe/Paris')
+        current_time = datetime.now(paris_tz)
+        timestamp = current_time.strftime('%y%m%d%H%M%S')
+        filename = f'factures_auto_{timestamp}.xlsx'
+
+        if EXCEL_STREAMING:
+            # Écriture au fil de l'analyse, en mémoire constante
+            if not process_pdf_files_streaming(filename):
+                print("Aucune donnée valide à exporter")
+                Path(filename).unlink(missing_ok=True)
+                return
+            print(f"Fichier Excel créé : {filename}")
+            return
+
         # Charger les données
         invoices_data = load_invoice_data()
         if not invoices_data:
@@ -761,51 +704,36 @@ def main():
             return
 
         # Vérifier la structure des données
-        for filename, invoice in invoices_data.items():
+        for invoice_key, invoice in invoices_data.items():
             if 'data' not in invoice:
-                print(f"Clé 'data' manquante pour {filename}")
+                print(f"Clé 'data' manquante pour {invoice_key}")
                 # Ajouter une structure minimale
-                invoices_data[filename]['data'] = {
-                    'type': 'unknown',
-                    'articles': [],
-                    'TOTAL': {
-                        'total_ht': 0,
-                        'total_ttc': 0,
-                        'tva': 0,
-                        'remise': 0
-                    },
-                    'frais_expedition': {
-                        'montant': 0,
-                        'description': ''
-                    },
-                    'client_name': '',
-                    'numero_facture': '',
-                    'date_facture': '',
-                    'date_commande': '',
-                    'commentaire': '',
-                    'Type_Vente': '',
-                    'Réseau_Vente': '',
-                    'nombre_articles': 0
-                }
-
-        # Créer le DataFrame
-        df = create_invoice_dataframe(invoices_data)
+                invoices_data[invoice_key]['data'] = empty_invoice_data()
+
+        # Créer les DataFrame (feuille Factures et, en disposition normalisée, feuille Articles)
+        df, articles = create_invoice_tables(invoices_data)
         if df.empty:
             print("Aucune donnée valide à exporter")
             return
 
-        # Générer le nom du fichier avec la date et l'heure au format YYMMDDHHMMSS en GMT+1
-        paris_tz = pytz.timezone('Europe/Paris')
-        current_time = datetime.now(paris_tz)
-        timestamp = current_time.strftime('%y%m%d%H%M%S')
-        filename = f'factures_auto_{timestamp}.xlsx'
+        # Rapprochement des montants (feuille Anomalies et rapport JSON)
+        anomalies = reconcile(df, articles) if RECONCILIATION_ENABLED else None
 
         # Créer le fichier Excel avec formatage
-        with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Factures', index=False)
-            format_excel(writer, df)
+        with excel_writer(filename) as writer:
+            write_invoice_sheets(writer, df, articles, anomalies)
 
         print(f"Fichier Excel créé : {filename}")
+        if anomalies is not None:
+            save_reconciliation_report(anomalies, filename, len(df))
+
+        # Tables Parquet pour l'analyse (mêmes données que le classeur)
+        if PARQUET_EXPORT_ENABLED:
+            try:
+                root = export_parquet(df, articles, run_id=Path(filename).stem)
+                print(f"Tables Parquet écrites dans {root}")
+            except Exception as e:
+                print(f"Erreur lors de l'export Parquet: {str(e)}")
 
     except Exception as e:
         import traceback
@@ -1,15 +1,205 @@
 import re
 from typing import Dict, List
 from datetime import datetime
+from anchor_index import AnchorIndex
+from invoice_model import parse_decimal
+from regex_registry import register
+from table_parser import extract_table_articles
+
+# Erreurs d'extraction signalées depuis le démarrage du processus : une
+# facture analysée avec une erreur n'est pas mise en cache (voir invoice_engine)
+_error_count = 0
+
+def report_error(message: str):
+    """Affiche une erreur d'extraction et la compte"""
+    global _error_count
+    _error_count += 1
+    print(message)
+
+def error_count() -> int:
+    """Nombre d'erreurs d'extraction signalées depuis le démarrage du processus"""
+    return _error_count
+
+# Motifs compilés une seule fois à l'import (voir regex_registry)
+
+# Articles au format ARTxxx (ancien format MEG)
+ART_ARTICLE = register('data.art.article', (
+    r'ART(\d+)\s*-\s*([^\n]+?)\s*'  # Référence et description
+    r'(\d+,\d+)\s*'                 # Quantité
+    r'(\d+[\s\d]*,\d+)\s*€\s*'      # Prix unitaire
+    r'(\d+,\d+)%\s*'                # Remise
+    r'(\d+[\s\d]*,\d+)\s*€\s*'      # Montant HT
+    r'(\d+,\d+)%'                   # TVA
+), re.MULTILINE | re.DOTALL)
+ART_TOTAL_HT = register('data.art.total_ht', r'Total HT\s*([\d\s,]+)\s*€', re.MULTILINE)
+ART_TABLE_ARTICLE = register('data.art.table_article', (
+    r'ART(\d+)\s*-\s*([^€]+?)\s+'    # Référence et description (accepte tout sauf €)
+    r'(\d+,\d+)\s+'                  # Quantité
+    r'(\d+[\s\d]*,\d+)\s*€\s+'       # Prix unitaire
+    r'(\d+,\d+)%\s+'                 # Remise
+    r'(\d+[\s\d]*,\d+)\s*€\s+'       # Montant HT
+    r'(\d+,\d+)%'                    # TVA
+), re.MULTILINE | re.DOTALL)
+
+# Factures internet
+INTERNET_NUMERO_FACTURE = register('internet.numero_facture', r'N° de facture\s*:\s*([^\n]+)')
+INTERNET_DATE_FACTURE = register('data.internet.date_facture', r'Date de facture\s*:\s*(\d{1,2}\s+\w+\s+\d{4})')
+INTERNET_DATE_COMMANDE = register('data.internet.date_commande', r'Date de commande\s*:\s*(\d{1,2}\s+\w+\s+\d{4})')
+INTERNET_CLIENT = register('data.internet.client', r'FACTURE\s*\n([^\n]+)')
+INTERNET_CLIENT_NUMERO_SUFFIX = register('data.internet.client_numero_suffix', r'N°\s*(?:de)?\s*(?:facture|commande)\s*:.*$')
+INTERNET_CLIENT_DATE_SUFFIX = register('data.internet.client_date_suffix', r'\s*Date\s.*$')
+INTERNET_NUMERO_COMMANDE = register('data.internet.numero_commande', r'N°\s*(?:de)?\s*commande\s*:\s*(\d+)')
+INTERNET_TOTAL = register('data.internet.total', r'Total\s+([\d\s]+[.,]\d{2})\s*€\s*\(dont\s+([\d\s]+[.,]\d{2})\s*€\s*TVA\)')
+# Les variantes de secours (fallback, voir regex_registry) ne démarrent qu'en début de
+# suite de chiffres et la consomment sans retour arrière : temps linéaire sur les
+# longues suites de chiffres sans montant
+INTERNET_TOTAL_ALT = register(
+    'data.internet.total_alt',
+    r'([\d\s]+[.,]\d{2})\s*€\s*\(dont\s+([\d\s]+[.,]\d{2})\s*€\s*\nTotal\s*\nTVA\)',
+    fallback=r'(?<![\d\s])([\d\s]++[.,]\d{2})\s*€\s*\(dont\s+([\d\s]++[.,]\d{2})\s*€\s*\nTotal\s*\nTVA\)'
+)
+INTERNET_REMISE_PATTERNS = [
+    register('data.internet.remise_euros', r'Remise\s+(-?[\d\s]+[.,]\d{2})\s*€', re.IGNORECASE),
+    register('data.internet.remise_pourcentage', r'Remise\s+(-?\d+)\s*%', re.IGNORECASE),
+    register('data.internet.remise_entier', r'Remise\s+(-?\d+)', re.IGNORECASE),
+    register('data.internet.remise_totale', r'Remise\s+totale\s*:?\s*(-?[\d\s]+[.,]\d{2})\s*€', re.IGNORECASE),
+]
+INTERNET_EXPEDITION_PATTERNS = [
+    register(
+        'data.internet.expedition_ttc_via',
+        r'([\d\s]+[.,]\d{2})\s*€\s*\(TTC\)\s*via\s+([^\n]+)\s*\nExpédition',
+        re.IGNORECASE,
+        fallback=r'(?<![\d\s])([\d\s]++[.,]\d{2})\s*€\s*\(TTC\)\s*via\s+([^\n]+)\s*\nExpédition'
+    ),
+    register('data.internet.expedition_via', r'Expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)', re.IGNORECASE),
+    register('data.internet.livraison_via', r'Livraison\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)', re.IGNORECASE),
+    register('data.internet.frais_expedition_via', r'Frais\s+d[e\']expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)', re.IGNORECASE),
+    register('data.internet.expedition', r'Expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?', re.IGNORECASE),
+    register('data.internet.livraison', r'Livraison\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?', re.IGNORECASE),
+]
+INTERNET_EXPEDITION_GRATUITE_PATTERNS = [
+    register('data.internet.livraison_gratuite', r'Livraison\s+gratuite', re.IGNORECASE),
+    register('data.internet.retrait_magasin', r'Retrait\s+en\s+magasin', re.IGNORECASE),
+]
+
+# Factures MEG et d'acompte
+MEG_NUMERO_FACTURE = register('data.meg.numero_facture', r'N°\s*:\s*([A-Za-z0-9]+)')
+MEG_DATE = register('data.meg.date', r'Date\s*:\s*(\d{2}/\d{2}/\d{4})')
+MEG_CLIENT = register('data.meg.client', r'N° client\s*:\s*([A-Za-z0-9]+)\s*\n([^\n]+)')
+MEG_TOTAL_HT = register('data.meg.total_ht', r'Total HT\s+([\d\s]+[.,]\d{2})\s*€')
+MEG_TVA = register('data.meg.tva', r'TVA\s+([\d\s]+[.,]\d{2})\s*€')
+MEG_TOTAL_TTC = register('data.meg.total_ttc', r'Total TTC\s+([\d\s]+[.,]\d{2})\s*€')
+ACOMPTE_TTC_PATTERNS = [
+    register('data.acompte.total_acompte_ttc', r'TOTAL\s+(?:ACOMPTE|TTC)\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.total_ttc', r'Total\s+TTC\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.montant_a_payer', r'MONTANT\s+(?:A\s+PAYER|ACOMPTE)\s+(?:TTC)?\s*(?::\s*)?(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+]
+ACOMPTE_TVA_PATTERNS = [
+    register('data.acompte.dont_tva', r'dont\s+TVA\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.tva', r'T\.?V\.?A\.?\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.tva_taux', r'TVA\s+\d+[,.]\d+%\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.montant_tva', r'Montant\s+TVA\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+]
+ACOMPTE_HT_PATTERNS = [
+    register('data.acompte.total_ht_acompte', r'Total\s+HT\s+(?:ACOMPTE)?\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.total_ht', r'TOTAL\s+HT\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+    register('data.acompte.montant_ht', r'Montant\s+HT\s+(\d+[\s\d]*[,.]\d{2})\s*€', re.IGNORECASE),
+]
+
+# Codes de vente 20.XX et 20.XX.YY
+CODE_VENTE = register('data.code_vente', r'20\.(?:0[1-9]|10)(?:\.\d{2})?')
+
+# Champs communs à tous les types (mêmes motifs que billing_extractor)
+GENERAL_FIELD_PATTERNS = {
+    'numero_client': register('data.numero_client', r'N°\s*client\s*:\s*(CLT\d+)', re.IGNORECASE),
+    'commentaire': register('data.commentaire', r'Commentaire\s*:\s*([^\n]+)', re.IGNORECASE),
+    'statut_paiement': register('data.statut_paiement', r'Statut paiement\s*:\s*([^\n]+)', re.IGNORECASE),
+}
+
+# Articles MEG et internet
+MEG_ARTICLE = register('data.meg.article', (
+    r'([A-Z0-9]+-[A-Z0-9]+-[A-Z0-9]+)\s*-([^\n]+?)\s+'  # Référence au format XXXX-XXXXXX-XXXX et description
+    r'(\d+,\d+)\s+'                  # Quantité
+    r'(\d+[\s\d]*,\d+)\s*€\s+'       # Prix unitaire
+    r'(\d+,\d+)%\s+'                 # Remise
+    r'(\d+[\s\d]*,\d+)\s*€\s+'       # Montant HT
+    r'(\d+,\d+)%'                    # TVA
+), re.MULTILINE | re.DOTALL)
+INTERNET_ARTICLE_REMISE_PATTERNS = [
+    register('data.internet.article_remise_euros', r'Remise\s+(?:globale|totale)?\s*:?\s*(-?\d+[\s\d]*[,.]\d+)\s*€', re.IGNORECASE),
+    register('data.internet.article_remise_pourcentage', r'Remise\s+(-?\d+[\s\d]*[,.]\d+)\s*%', re.IGNORECASE),
+    register('data.internet.article_remise', r'Remise\s+(?:totale)?\s*:?\s*(-?\d+[\s\d]*[,.]\d+)', re.IGNORECASE),
+]
+# Deux formats : quantité et prix sur la ligne UGS, ou sur la ligne suivante
+INTERNET_ARTICLE = register(
+    'data.internet.article',
+    r'([^\n]+)\nUGS\s*:\s*([A-Z0-9-]+)(?:\s+(\d+)\s+([\d\s]+[,.]\d+)\s*€|\s*\n(?:[^\n]*\s+)?(\d+)\s+([\d\s]+[,.]\d+)\s*€)',
+    re.MULTILINE,
+    # Secours : description prise en début de ligne, prix sans retour arrière
+    fallback=r'^([^\n]+)\nUGS\s*:\s*([A-Z0-9-]+)(?:\s+(\d+)\s+([\d\s]++[,.]\d+)\s*€|\s*\n(?:[^\n]*\s)?(\d+)\s+([\d\s]++[,.]\d+)\s*€)'
+)
+INTERNET_GLOBAL_QUANTITY_PATTERNS = [
+    register('data.internet.quantite_articles', r'(\d+)\s*articles?\s', re.IGNORECASE),  # 2 articles commandés
+    register('data.internet.quantite_total', r'Total\s*:\s*(\d+)\s*article', re.IGNORECASE),  # Total: 2 articles
+    register('data.internet.quantite_nombre', r'Nombre d\'articles\s*:\s*(\d+)', re.IGNORECASE),  # Nombre d'articles: 2
+    register('data.internet.quantite_libelle', r'Articles\s*:\s*(\d+)', re.IGNORECASE),  # Articles: 2
+]
+INTERNET_DIRECT_PRICE = register(
+    'data.internet.direct_price',
+    r'(?:Produits|Article)[^\n]*?(?:Quantité|Qté)[^\n]*?Prix[^\n]*\n([^\n]+)\s+(\d+)\s+([\d\s]+[,.]\d+)\s*€',
+    re.MULTILINE
+)
+
+# Factures d'acompte : description, référence et montant
+ACOMPTE_ARTICLE_PATTERNS = [
+    register('data.acompte.prestation', r'Prestation\s*:\s*([^\n]+)', re.IGNORECASE),
+    register('data.acompte.designation', r'Désignation\s*:\s*([^\n]+)', re.IGNORECASE),
+    register('data.acompte.libelle', r'Libellé\s*:\s*([^\n]+)', re.IGNORECASE),
+    register('data.acompte.descriptif', r'Descriptif\s*:\s*([^\n]+)', re.IGNORECASE),
+    register('data.acompte.description', r'Description\s*:\s*([^\n]+)', re.IGNORECASE),
+    register('data.acompte.materiel', r'Matériel\s*:\s*([^\n]+)', re.IGNORECASE),
+    register(
+        'data.acompte.avant_reglement',
+        r'([^\.]+)(?=\s*Règlement\s*:)',  # Texte avant "Règlement :"
+        re.IGNORECASE,
+        # Secours : la phrase ne commence qu'en début de texte ou après un point
+        fallback=r'(?:^|(?<=\.))([^\.]+)(?=\s*Règlement\s*:)'
+    ),
+    register('data.acompte.acompte_sur', r'ACOMPTE\s*(sur\s*[^\n]+)', re.IGNORECASE),  # Acompte sur quelque chose
+]
+ACOMPTE_CLIENT_LINE = register('data.acompte.client_line', r'N° client\s*:[^\n]+\n([^\n]+)')
+ACOMPTE_TOTAL = register('data.acompte.total', r'TOTAL')
+ACOMPTE_REFERENCE = register('data.acompte.reference', r'R[ée]f[ée]rence\s*:\s*([^\n]+)', re.IGNORECASE)
+ACOMPTE_ARTICLE_HT = register('data.acompte.article_ht', r'TOTAL\s+HT\s+(?:ACOMPTE\s+)?(\d+[\s\d]*[.,]\d{2})\s*€', re.IGNORECASE)
+
+# Échéance d'acompte (montant et date), sous "Echéance(s)"
+ECHEANCE_ACOMPTE = register('data.echeance_acompte', r'Echéance\(s\)\s*Acompte\s*de\s*(\d+[\s\d]*,\d+)\s*€\s*au\s*(\d{2}/\d{2}/\d{4})')
+
+MOIS_FR = {
+    'janvier': '01', 'février': '02', 'mars': '03', 'avril': '04',
+    'mai': '05', 'juin': '06', 'juillet': '07', 'août': '08',
+    'septembre': '09', 'octobre': '10', 'novembre': '11', 'décembre': '12'
+}
 
 def convert_to_float(value: str) -> float:
-    """Convertit une chaîne en float en gérant les formats français"""
-    try:
-        clean_value = value.replace('€', '').replace(' ', '').strip()
-        clean_value = clean_value.replace(',', '.')
-        return float(clean_value)
-    except (ValueError, AttributeError):
-        return 0.0
+    """Convertit une chaîne en float en gérant les formats français (voir invoice_model.parse_decimal)"""
+    return parse_decimal(value)
+
+def convert_date_to_iso(date_val: str) -> str:
+    """
+    Convertit une date française (DD/MM/YYYY ou "19 février 2025") en YYYY-MM-DD
+
+    Lève ValueError si la date n'a pas l'un de ces formats ; un mois inconnu
+    laisse la date inchangée.
+    """
+    if '/' in date_val:  # Format DD/MM/YYYY
+        day, month, year = date_val.split('/')
+        return f"{year}-{month}-{day}"
+    if ' ' in date_val:  # Format comme "19 février 2025"
+        day, month_fr, year = date_val.split(' ')
+        if month_fr.lower() in MOIS_FR:
+            return f"{year}-{MOIS_FR[month_fr.lower()]}-{day.zfill(2)}"
+    return date_val
 
 def extract_articles_and_totals(text: str) -> Dict:
     """Extrait les articles et les totaux du texte"""
@@ -17,16 +207,7 @@ def extract_articles_and_totals(text: str) -> Dict:
     totals = {}
 
     # Pattern pour les articles sous "Libellé"
-    article_pattern = (
-        r'ART(\d+)\s*-\s*([^\n]+?)\s*'  # Référence et description
-        r'(\d+,\d+)\s*'                 # Quantité
-        r'(\d+[\s\d]*,\d+)\s*€\s*'      # Prix unitaire
-        r'(\d+,\d+)%\s*'                # Remise
-        r'(\d+[\s\d]*,\d+)\s*€\s*'      # Montant HT
-        r'(\d+,\d+)%'                   # TVA
-    )
-
-    for match in re.finditer(article_pattern, text, re.MULTILINE | re.DOTALL):
+    for match in ART_ARTICLE.finditer(text):
         try:
             prix_unitaire = match.group(4).replace(' ', '')
             montant_ht = match.group(6).replace(' ', '')
@@ -41,17 +222,16 @@ def extract_articles_and_totals(text: str) -> Dict:
                 'tva': float(match.group(7).replace(',', '.'))  # Déjà en pourcentage
             })
         except (IndexError, ValueError) as e:
-            print(f"Erreur lors de l'extraction d'un article: {e}")
+            report_error(f"Erreur lors de l'extraction d'un article: {e}")
             continue
 
     # Pattern pour les totaux
-    total_pattern = r'Total HT\s*([\d\s,]+)\s*€'
-    for match in re.finditer(total_pattern, text, re.MULTILINE):
+    for match in ART_TOTAL_HT.finditer(text):
         try:
             total_ht = match.group(1).replace(' ', '')
             totals['total_ht'] = float(total_ht.replace(',', '.'))
         except (IndexError, ValueError) as e:
-            print(f"Erreur lors de l'extraction du total HT: {e}")
+            report_error(f"Erreur lors de l'extraction du total HT: {e}")
             continue
 
     return {'articles': articles, 'totals': totals}
@@ -61,16 +241,7 @@ def extract_articles_from_text(text: str) -> List[Dict]:
     articles = []
 
     # Pattern modifié pour accepter les chiffres dans la description
-    article_pattern = (
-        r'ART(\d+)\s*-\s*([^€]+?)\s+'    # Référence et description (accepte tout sauf €)
-        r'(\d+,\d+)\s+'                  # Quantité
-        r'(\d+[\s\d]*,\d+)\s*€\s+'       # Prix unitaire
-        r'(\d+,\d+)%\s+'                 # Remise
-        r'(\d+[\s\d]*,\d+)\s*€\s+'       # Montant HT
-        r'(\d+,\d+)%'                    # TVA
-    )
-
-    for match in re.finditer(article_pattern, text, re.MULTILINE | re.DOTALL):
+    for match in ART_TABLE_ARTICLE.finditer(text):
         try:
             # Nettoyage des espaces dans les nombres
             prix_unitaire = match.group(4).replace(' ', '')
@@ -86,13 +257,20 @@ def extract_articles_from_text(text: str) -> List[Dict]:
                 'tva': float(match.group(7).replace(',', '.'))  # Déjà en pourcentage
             })
         except (IndexError, ValueError) as e:
-            print(f"Erreur lors de l'extraction d'un article: {e}")
+            report_error(f"Erreur lors de l'extraction d'un article: {e}")
             continue
 
     return articles
 
-def extract_data(text: str, type: str = 'meg') -> dict:
-    """Extrait les données structurées du texte selon le type de facture"""
+def extract_data(text: str, type: str = 'meg', pages_words: List[List[Dict]] = None,
+                 index: AnchorIndex = None) -> dict:
+    """
+    Extrait les données structurées du texte selon le type de facture
+
+    pages_words (positions des mots de chaque page) active le parseur de
+    tableau par coordonnées pour les articles MEG. index est l'AnchorIndex
+    du texte s'il a déjà été calculé (voir invoice_engine).
+    """
     print(f"Extraction de données pour une facture de type: {type}")
 
     data = {
@@ -107,52 +285,58 @@ def extract_data(text: str, type: str = 'meg') -> dict:
     }
 
     try:
+        # Un seul parcours du texte pour situer l'en-tête, les articles et les totaux :
+        # chaque champ n'est cherché que dans sa section
+        index = index or AnchorIndex(text)
+        entete = index.section('entete')
+        totaux = index.section('totaux')
+
         # Extraction des numéros de facture et dates selon le type
         if type == 'internet':
             # Extraction du numéro de facture
-            facture_match = re.search(r'N° de facture\s*:\s*([^\n]+)', text)
+            facture_match = INTERNET_NUMERO_FACTURE.search(text, *entete)
             if facture_match:
                 data['numero_facture'] = facture_match.group(1).strip()
                 print(f"  Numéro de facture internet: {data['numero_facture']}")
 
             # Extraction de la date de facture
-            date_facture_match = re.search(r'Date de facture\s*:\s*(\d{1,2}\s+\w+\s+\d{4})', text)
+            date_facture_match = INTERNET_DATE_FACTURE.search(text, *entete)
             if date_facture_match:
                 date_fr = date_facture_match.group(1).strip()
                 data['date_facture'] = date_fr
                 print(f"  Date de facture internet: {date_fr}")
 
             # Extraction de la date de commande
-            date_cmd_match = re.search(r'Date de commande\s*:\s*(\d{1,2}\s+\w+\s+\d{4})', text)
+            date_cmd_match = INTERNET_DATE_COMMANDE.search(text, *entete)
             if date_cmd_match:
                 date_cmd_fr = date_cmd_match.group(1).strip()
                 data['date_commande'] = date_cmd_fr
                 print(f"  Date de commande internet: {date_cmd_fr}")
 
             # Extraction du client
-            client_match = re.search(r'FACTURE\s*\n([^\n]+)', text)
+            client_match = INTERNET_CLIENT.search(text, *entete)
             if client_match:
                 # Extraire le nom du client et nettoyer pour enlever N° de facture/commande
                 client_full = client_match.group(1).strip()
 
                 # Supprimer la partie contenant "N° de facture" ou "N° de commande"
-                client_cleaned = re.sub(r'N°\s*(?:de)?\s*(?:facture|commande)\s*:.*$', '', client_full).strip()
+                client_cleaned = INTERNET_CLIENT_NUMERO_SUFFIX.sub('', client_full).strip()
 
                 # Supprimer toute partie après "Date" si présente
-                client_cleaned = re.sub(r'\s*Date\s.*$', '', client_cleaned).strip()
+                client_cleaned = INTERNET_CLIENT_DATE_SUFFIX.sub('', client_cleaned).strip()
 
                 data['client_name'] = client_cleaned
                 print(f"  Client internet: {data['client_name']}")
 
                 # Extraire le numéro de commande si présent et que le numéro de facture est absent
                 if not data.get('numero_facture'):
-                    command_match = re.search(r'N°\s*(?:de)?\s*commande\s*:\s*(\d+)', client_full)
+                    command_match = INTERNET_NUMERO_COMMANDE.search(client_full)
                     if command_match:
                         data['numero_commande'] = command_match.group(1).strip()
                         print(f"  Numéro de commande: {data['numero_commande']}")
 
             # Extraction du total
-            total_match = re.search(r'Total\s+([\d\s]+[.,]\d{2})\s*€\s*\(dont\s+([\d\s]+[.,]\d{2})\s*€\s*TVA\)', text)
+            total_match = INTERNET_TOTAL.search(text, *totaux)
             if total_match:
                 data['TOTAL']['total_ttc'] = convert_to_float(total_match.group(1))
                 data['TOTAL']['tva'] = convert_to_float(total_match.group(2))
@@ -160,7 +344,7 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                 print(f"  Totaux internet: TTC={data['TOTAL']['total_ttc']}, TVA={data['TOTAL']['tva']}, HT={data['TOTAL']['total_ht']}")
             else:
                 # Pattern alternatif pour le cas où "Total" est sur une ligne séparée
-                total_alt_match = re.search(r'([\d\s]+[.,]\d{2})\s*€\s*\(dont\s+([\d\s]+[.,]\d{2})\s*€\s*\nTotal\s*\nTVA\)', text)
+                total_alt_match = INTERNET_TOTAL_ALT.search(text, *totaux)
                 if total_alt_match:
                     data['TOTAL']['total_ttc'] = convert_to_float(total_alt_match.group(1))
                     data['TOTAL']['tva'] = convert_to_float(total_alt_match.group(2))
@@ -185,18 +369,11 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                         print(f"  Totaux internet calculés depuis les articles: TTC={data['TOTAL']['total_ttc']}, TVA={data['TOTAL']['tva']}, HT={data['TOTAL']['total_ht']}")
 
             # Extraction des remises
-            remise_patterns = [
-                r'Remise\s+(-?[\d\s]+[.,]\d{2})\s*€',
-                r'Remise\s+(-?\d+)\s*%',
-                r'Remise\s+(-?\d+)',
-                r'Remise\s+totale\s*:?\s*(-?[\d\s]+[.,]\d{2})\s*€'
-            ]
-
-            for pattern in remise_patterns:
-                remise_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in INTERNET_REMISE_PATTERNS:
+                remise_match = pattern.search(text, *totaux)
                 if remise_match:
                     remise_value = remise_match.group(1).replace(' ', '').replace(',', '.')
-                    if '%' in pattern:
+                    if '%' in pattern.pattern:
                         # Si c'est un pourcentage, on le stocke tel quel pour le moment
                         # Le calcul sera fait plus tard avec le total HT
                         data['TOTAL']['remise_pourcentage'] = float(remise_value)
@@ -208,23 +385,9 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                     break
 
             # Extraction des frais d'expédition
-            expedition_patterns = [
-                r'([\d\s]+[.,]\d{2})\s*€\s*\(TTC\)\s*via\s+([^\n]+)\s*\nExpédition',
-                r'Expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)',
-                r'Livraison\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)',
-                r'Frais\s+d[e\']expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?\s*via\s+([^\n]+)',
-                r'Expédition\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?',
-                r'Livraison\s+([\d\s]+[.,]\d{2})\s*€\s*(?:\(TTC\))?'
-            ]
-
-            expedition_gratuite_patterns = [
-                r'Livraison\s+gratuite',
-                r'Retrait\s+en\s+magasin'
-            ]
-
             # Chercher d'abord les expéditions avec frais
-            for pattern in expedition_patterns:
-                expedition_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in INTERNET_EXPEDITION_PATTERNS:
+                expedition_match = pattern.search(text, *totaux)
                 if expedition_match:
                     data['frais_expedition']['montant'] = convert_to_float(expedition_match.group(1))
                     if len(expedition_match.groups()) > 1 and expedition_match.group(2):
@@ -236,8 +399,8 @@ def extract_data(text: str, type: str = 'meg') -> dict:
 
             # Si pas de frais d'expédition trouvés, chercher les mentions de livraison gratuite ou retrait
             if data['frais_expedition']['montant'] == 0:
-                for pattern in expedition_gratuite_patterns:
-                    gratuit_match = re.search(pattern, text, re.IGNORECASE)
+                for pattern in INTERNET_EXPEDITION_GRATUITE_PATTERNS:
+                    gratuit_match = pattern.search(text, *totaux)
                     if gratuit_match:
                         data['frais_expedition']['montant'] = 0
                         data['frais_expedition']['description'] = gratuit_match.group(0).strip()
@@ -246,100 +409,81 @@ def extract_data(text: str, type: str = 'meg') -> dict:
 
         elif type == 'meg':
             # Extraction du numéro de facture
-            facture_match = re.search(r'N°\s*:\s*([A-Za-z0-9]+)', text)
+            facture_match = MEG_NUMERO_FACTURE.search(text, *entete)
             if facture_match:
                 data['numero_facture'] = facture_match.group(1).strip()
                 print(f"  Numéro de facture meg: {data['numero_facture']}")
 
             # Extraction de la date
-            date_match = re.search(r'Date\s*:\s*(\d{2}/\d{2}/\d{4})', text)
+            date_match = MEG_DATE.search(text, *entete)
             if date_match:
                 data['date_facture'] = date_match.group(1).strip()
                 print(f"  Date de facture meg: {data['date_facture']}")
 
             # Extraction du client
-            client_match = re.search(r'N° client\s*:\s*([A-Za-z0-9]+)\s*\n([^\n]+)', text)
+            client_match = MEG_CLIENT.search(text, *entete)
             if client_match:
                 data['client_name'] = client_match.group(2).strip()
                 print(f"  Client meg: {data['client_name']}")
 
             # Extraction des totaux
-            total_ht_match = re.search(r'Total HT\s+([\d\s]+[.,]\d{2})\s*€', text)
+            total_ht_match = MEG_TOTAL_HT.search(text, *totaux)
             if total_ht_match:
                 data['TOTAL']['total_ht'] = convert_to_float(total_ht_match.group(1))
                 print(f"  Total HT meg: {data['TOTAL']['total_ht']}")
 
-            tva_match = re.search(r'TVA\s+([\d\s]+[.,]\d{2})\s*€', text)
+            tva_match = MEG_TVA.search(text, *totaux)
             if tva_match:
                 data['TOTAL']['tva'] = convert_to_float(tva_match.group(1))
                 print(f"  TVA meg: {data['TOTAL']['tva']}")
 
-            total_ttc_match = re.search(r'Total TTC\s+([\d\s]+[.,]\d{2})\s*€', text)
+            total_ttc_match = MEG_TOTAL_TTC.search(text, *totaux)
             if total_ttc_match:
                 data['TOTAL']['total_ttc'] = convert_to_float(total_ttc_match.group(1))
                 print(f"  Total TTC meg: {data['TOTAL']['total_ttc']}")
 
         elif type == 'acompte':
             # Extraction du numéro de facture d'acompte
-            facture_match = re.search(r'N°\s*:\s*([A-Za-z0-9]+)', text)
+            facture_match = MEG_NUMERO_FACTURE.search(text, *entete)
             if facture_match:
                 data['numero_facture'] = facture_match.group(1).strip()
                 print(f"  Numéro de facture acompte: {data['numero_facture']}")
 
             # Extraction de la date
-            date_match = re.search(r'Date\s*:\s*(\d{2}/\d{2}/\d{4})', text)
+            date_match = MEG_DATE.search(text, *entete)
             if date_match:
                 data['date_facture'] = date_match.group(1).strip()
                 print(f"  Date de facture acompte: {data['date_facture']}")
 
             # Extraction du client
-            client_match = re.search(r'N° client\s*:\s*([A-Za-z0-9]+)\s*\n([^\n]+)', text)
+            client_match = MEG_CLIENT.search(text, *entete)
             if client_match:
                 data['client_name'] = client_match.group(2).strip()
                 print(f"  Client acompte: {data['client_name']}")
 
             # Différents patterns pour extraire les montants des factures d'acompte
             # 1. Extraction du total TTC
-            ttc_patterns = [
-                r'TOTAL\s+(?:ACOMPTE|TTC)\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'Total\s+TTC\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'MONTANT\s+(?:A\s+PAYER|ACOMPTE)\s+(?:TTC)?\s*(?::\s*)?(\d+[\s\d]*[,.]\d{2})\s*€'
-            ]
-
-            for pattern in ttc_patterns:
-                ttc_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in ACOMPTE_TTC_PATTERNS:
+                ttc_match = pattern.search(text, *totaux)
                 if ttc_match:
                     data['TOTAL']['total_ttc'] = convert_to_float(ttc_match.group(1))
-                    print(f"  Total TTC acompte: {data['TOTAL']['total_ttc']} (pattern: {pattern})")
+                    print(f"  Total TTC acompte: {data['TOTAL']['total_ttc']} (pattern: {pattern.name})")
                     break
 
             # 2. Extraction de la TVA
-            tva_patterns = [
-                r'dont\s+TVA\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'T\.?V\.?A\.?\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'TVA\s+\d+[,.]\d+%\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'Montant\s+TVA\s+(\d+[\s\d]*[,.]\d{2})\s*€'
-            ]
-
-            for pattern in tva_patterns:
-                tva_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in ACOMPTE_TVA_PATTERNS:
+                tva_match = pattern.search(text, *totaux)
                 if tva_match:
                     data['TOTAL']['tva'] = convert_to_float(tva_match.group(1))
-                    print(f"  TVA acompte: {data['TOTAL']['tva']} (pattern: {pattern})")
+                    print(f"  TVA acompte: {data['TOTAL']['tva']} (pattern: {pattern.name})")
                     break
 
             # 3. Extraction du total HT
-            ht_patterns = [
-                r'Total\s+HT\s+(?:ACOMPTE)?\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'TOTAL\s+HT\s+(\d+[\s\d]*[,.]\d{2})\s*€',
-                r'Montant\s+HT\s+(\d+[\s\d]*[,.]\d{2})\s*€'
-            ]
-
-            for pattern in ht_patterns:
-                ht_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in ACOMPTE_HT_PATTERNS:
+                ht_match = pattern.search(text, *totaux)
                 if ht_match:
                     data['TOTAL']['total_ht'] = convert_to_float(ht_match.group(1))
-                    print(f"  Total HT acompte: {data['TOTAL']['total_ht']} (pattern: {pattern})")
+                    print(f"  Total HT acompte: {data['TOTAL']['total_ht']} (pattern: {pattern.name})")
                     break
 
             # Si on a le TTC et la TVA mais pas le HT, on le calcule
@@ -352,11 +496,20 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                 data['TOTAL']['tva'] = data['TOTAL']['total_ttc'] - data['TOTAL']['total_ht']
                 print(f"  TVA acompte calculée: {data['TOTAL']['tva']}")
 
+        # Numéro client, commentaire et statut de paiement (les factures internet sont payées en ligne)
+        if type == 'internet':
+            data['statut_paiement'] = "Payé"
+        for key, pattern in GENERAL_FIELD_PATTERNS.items():
+            match = pattern.search(text, *entete) if key == 'numero_client' else pattern.search(text)
+            if match:
+                data[key] = match.group(1).strip()
+                print(f"  {key}: {data[key]}")
+
         # Extraction des informations générales de Type_Vente et Réseau_Vente
         # Ces valeurs peuvent être des codes comme 20.01.01, 20.02, etc.
 
         # Pour Type_Vente (format 20.XX où XX est entre 01 et 10)
-        type_vente_match = re.search(r'20\.(?:0[1-9]|10)(?:\.\d{2})?', text)
+        type_vente_match = CODE_VENTE.search(text)
         if type_vente_match:
             full_code = type_vente_match.group(0)
             # Extraire uniquement les deux premiers niveaux (20.XX)
@@ -370,40 +523,41 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                 data['Réseau_Vente'] = full_code
                 print(f"  Réseau_Vente: {data['Réseau_Vente']}")
 
+        # Échéance d'acompte, cherchée à partir de l'en-tête "Echéance(s)"
+        echeance = index.first('echeance')
+        if echeance:
+            echeance_match = ECHEANCE_ACOMPTE.search(text, echeance[0])
+            if echeance_match:
+                day, month, year = echeance_match.group(2).split('/')
+                data['acomptes'] = {
+                    'montant': convert_to_float(echeance_match.group(1)),
+                    'date': f"{year}-{month}-{day}"
+                }
+                print(f"  Échéance d'acompte: {data['acomptes']['montant']} € au {data['acomptes']['date']}")
+
         # Extraction des articles pour tous les types
         print("  Extraction des articles...")
         if type == 'meg':
-            data['articles'] = extract_articles(text, True)
+            # Parseur par coordonnées si les mots sont fournis et que le tableau est reconnu
+            table_articles = extract_table_articles(pages_words) if pages_words else None
+            if table_articles is not None:
+                data['articles'] = table_articles
+            else:
+                data['articles'] = extract_articles(text, True, index)
         elif type == 'internet':
-            data['articles'] = extract_articles(text, False)
+            data['articles'] = extract_articles(text, False, index)
         elif type == 'acompte':
-            data['articles'] = extract_articles_from_acompte(text)
+            data['articles'] = extract_articles_from_acompte(text, index)
 
         print(f"  Nombre d'articles extraits: {len(data['articles'])}")
 
         # Pour les factures avec des dates au format français, convertir en ISO
         for date_key in ['date_facture', 'date_commande']:
             if date_key in data and data[date_key]:
-                date_val = data[date_key]
-                if '/' in date_val:  # Format DD/MM/YYYY
-                    try:
-                        day, month, year = date_val.split('/')
-                        data[date_key] = f"{year}-{month}-{day}"
-                    except Exception as e:
-                        print(f"  Erreur lors de la conversion de la date {date_key}: {str(e)}")
-                elif ' ' in date_val:  # Format comme "19 février 2025"
-                    try:
-                        day, month_fr, year = date_val.split(' ')
-                        mois_fr = {
-                            'janvier': '01', 'février': '02', 'mars': '03', 'avril': '04',
-                            'mai': '05', 'juin': '06', 'juillet': '07', 'août': '08',
-                            'septembre': '09', 'octobre': '10', 'novembre': '11', 'décembre': '12'
-                        }
-                        if month_fr.lower() in mois_fr:
-                            month_num = mois_fr[month_fr.lower()]
-                            data[date_key] = f"{year}-{month_num}-{day.zfill(2)}"
-                    except Exception as e:
-                        print(f"  Erreur lors de la conversion de la date {date_key}: {str(e)}")
+                try:
+                    data[date_key] = convert_date_to_iso(data[date_key])
+                except Exception as e:
+                    report_error(f"  Erreur lors de la conversion de la date {date_key}: {str(e)}")
 
         # Si une remise en pourcentage a été trouvée et qu'on a un total HT, calculer la valeur en euros
         if 'remise_pourcentage' in data['TOTAL'] and 'total_ht' in data['TOTAL']:
@@ -430,27 +584,21 @@ def extract_data(text: str, type: str = 'meg') -> dict:
                     article['remise'] = 0
 
     except Exception as e:
-        print(f"ERREUR lors de l'extraction des données: {str(e)}")
+        report_error(f"ERREUR lors de l'extraction des données: {str(e)}")
         import traceback
         traceback.print_exc()
 
     return data
 
-def extract_articles(text: str, is_meg: bool) -> List[Dict]:
-    """Extrait les articles du texte"""
+def extract_articles(text: str, is_meg: bool, index: AnchorIndex = None) -> List[Dict]:
+    """Extrait les articles du texte (index : AnchorIndex du texte, recalculé si absent)"""
+    index = index or AnchorIndex(text)
+    section_articles = index.section('articles')
+    section_totaux = index.section('totaux')
     articles = []
     if is_meg:
         # Pattern modifié pour accepter le format XXXX-XXXXXX-XXXX
-        article_pattern = (
-            r'([A-Z0-9]+-[A-Z0-9]+-[A-Z0-9]+)\s*-([^\n]+?)\s+'  # Référence au format XXXX-XXXXXX-XXXX et description
-            r'(\d+,\d+)\s+'                  # Quantité
-            r'(\d+[\s\d]*,\d+)\s*€\s+'       # Prix unitaire
-            r'(\d+,\d+)%\s+'                 # Remise
-            r'(\d+[\s\d]*,\d+)\s*€\s+'       # Montant HT
-            r'(\d+,\d+)%'                    # TVA
-        )
-
-        for match in re.finditer(article_pattern, text, re.MULTILINE | re.DOTALL):
+        for match in MEG_ARTICLE.finditer(text, *section_articles):
             try:
                 # Nettoyage des espaces dans les nombres
                 prix_unitaire = match.group(4).replace(' ', '')
@@ -474,23 +622,17 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                 })
                 print(f"  Article MEG extrait: {articles[-1]}")
             except (IndexError, ValueError) as e:
-                print(f"Erreur lors de l'extraction d'un article MEG: {e}")
+                report_error(f"Erreur lors de l'extraction d'un article MEG: {e}")
                 continue
     else:
         # Rechercher des remises éventuelles pour la facture entière
         remise_globale = 0
-        remise_patterns = [
-            r'Remise\s+(?:globale|totale)?\s*:?\s*(-?\d+[\s\d]*[,.]\d+)\s*€',
-            r'Remise\s+(-?\d+[\s\d]*[,.]\d+)\s*%',
-            r'Remise\s+(?:totale)?\s*:?\s*(-?\d+[\s\d]*[,.]\d+)',
-        ]
-
-        for pattern in remise_patterns:
-            remise_match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in INTERNET_ARTICLE_REMISE_PATTERNS:
+            remise_match = pattern.search(text, *section_totaux)
             if remise_match:
                 remise_value = remise_match.group(1).replace(' ', '').replace(',', '.')
                 try:
-                    if '%' in pattern:
+                    if '%' in pattern.pattern:
                         # Si c'est un pourcentage, on le stocke pour l'appliquer plus tard
                         remise_percent = float(remise_value)
                         # On ne peut pas calculer la valeur exacte ici car on n'a pas encore traité tous les articles
@@ -503,30 +645,10 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                 except (ValueError, IndexError):
                     pass
 
-        # Pattern amélioré pour les articles internet - gère les deux formats
-        article_pattern = r'([^\n]+)\nUGS\s*:\s*([A-Z0-9-]+)(?:\s+(\d+)\s+([\d\s]+[,.]\d+)\s*€|\s*\n(?:[^\n]*\s+)?(\d+)\s+([\d\s]+[,.]\d+)\s*€)'
-        # Patterns améliorés pour trouver la quantité
-        quantity_patterns = [
-            r'Quantité\s*:\s*(\d+)',
-            r'Quantité\s*×\s*(\d+)',
-            r'Quantité\s*x\s*(\d+)',
-            r'(\d+)\s*article\(s\)',
-            r'(\d+)\s*×',  # Symbole de multiplication suivi d'un nombre
-            r'Qté\s*:\s*(\d+)',
-            r'Qté\s+(\d+)'
-        ]
-
         # Rechercher une quantité globale pour toute la facture
         global_quantity = None
-        global_quantity_patterns = [
-            r'(\d+)\s*articles?\s',  # 2 articles commandés
-            r'Total\s*:\s*(\d+)\s*article',  # Total: 2 articles
-            r'Nombre d\'articles\s*:\s*(\d+)',  # Nombre d'articles: 2
-            r'Articles\s*:\s*(\d+)'  # Articles: 2
-        ]
-
-        for g_pattern in global_quantity_patterns:
-            g_match = re.search(g_pattern, text, re.IGNORECASE)
+        for g_pattern in INTERNET_GLOBAL_QUANTITY_PATTERNS:
+            g_match = g_pattern.search(text)
             if g_match:
                 try:
                     global_quantity = int(g_match.group(1))
@@ -535,26 +657,11 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                 except (ValueError, IndexError):
                     pass
 
-        # Attention particulière pour la facture 2025-02160
-        if "2025-02160" in text or "Timon Mathieu" in text:
-            special_match = re.search(r'LEPF-JONC00-5000', text)
-            if special_match:
-                print("  Facture spéciale 2025-02160 détectée, quantité définie à 2")
-                global_quantity = 2
-
-        # Extraire les prix TTC qui peuvent être directement indiqués dans la facture
-        # Patterns pour trouver le prix TTC directement
-        price_patterns = [
-            r'Prix\s*:\s*([\d\s]+[,.]\d{2})\s*€',
-            r'Prix\s*unitaire\s*:\s*([\d\s]+[,.]\d{2})\s*€',
-            r'Prix\s*TTC\s*:\s*([\d\s]+[,.]\d{2})\s*€'
-        ]
-
         # Extraire les totaux pour calculer la répartition si nécessaire
         total_ttc = 0
         total_ht = 0
 
-        total_match = re.search(r'Total\s+([\d\s]+[.,]\d{2})\s*€\s*\(dont\s+([\d\s]+[.,]\d{2})\s*€\s*TVA\)', text)
+        total_match = INTERNET_TOTAL.search(text, *section_totaux)
         if total_match:
             total_ttc = convert_to_float(total_match.group(1))
             total_tva = convert_to_float(total_match.group(2))
@@ -562,11 +669,10 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
             print(f"  Total HT internet: {total_ht}")
 
         # Compter le nombre d'articles pour la répartition
-        total_articles = len(list(re.finditer(article_pattern, text, re.MULTILINE)))
+        total_articles = len(list(INTERNET_ARTICLE.finditer(text, *section_articles)))
 
         # Version simplifiée du pattern pour trouver prix et quantité dans la même ligne
-        direct_price_pattern = r'(?:Produits|Article)[^\n]*?(?:Quantité|Qté)[^\n]*?Prix[^\n]*\n([^\n]+)\s+(\d+)\s+([\d\s]+[,.]\d+)\s*€'
-        direct_matches = re.finditer(direct_price_pattern, text, re.MULTILINE)
+        direct_matches = INTERNET_DIRECT_PRICE.finditer(text, 0, section_articles[1])
         direct_prices = {}
 
         # Pré-extraire les prix directs s'ils sont indiqués clairement
@@ -581,7 +687,7 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                 print(f"  Erreur extraction prix direct: {e}")
 
         # Traiter chaque article
-        for match in re.finditer(article_pattern, text, re.MULTILINE):
+        for match in INTERNET_ARTICLE.finditer(text, *section_articles):
             try:
                 description = match.group(1).strip()
                 reference = match.group(2).strip()
@@ -594,7 +700,7 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                     quantite = int(match.group(5))
                     prix_ttc = convert_to_float(match.group(6))
                 else:
-                    print(f"  Erreur: Impossible d'extraire quantité et prix pour {reference}")
+                    report_error(f"  Erreur: Impossible d'extraire quantité et prix pour {reference}")
                     continue
 
                 print(f"  Article extrait: Description='{description}', Référence='{reference}', Quantité={quantite}, Prix TTC={prix_ttc} €")
@@ -624,7 +730,7 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
                     'tva': taux_tva  # Taux de TVA en pourcentage
                 })
             except (IndexError, ValueError) as e:
-                print(f"Erreur lors de l'extraction d'un article Internet: {e}")
+                report_error(f"Erreur lors de l'extraction d'un article Internet: {e}")
                 continue
 
         # Répartir la remise globale sur les articles si nécessaire
@@ -642,35 +748,26 @@ def extract_articles(text: str, is_meg: bool) -> List[Dict]:
 
     return articles
 
-def extract_articles_from_acompte(text: str) -> List[Dict]:
-    """Extrait les articles d'une facture d'acompte"""
+def extract_articles_from_acompte(text: str, index: AnchorIndex = None) -> List[Dict]:
+    """Extrait les articles d'une facture d'acompte (index : AnchorIndex du texte, recalculé si absent)"""
+    index = index or AnchorIndex(text)
+    section_totaux = index.section('totaux')
     articles = []
     try:
         # Essayer plusieurs patterns pour trouver les informations de prestation/article
-        article_patterns = [
-            r'Prestation\s*:\s*([^\n]+)',
-            r'Désignation\s*:\s*([^\n]+)',
-            r'Libellé\s*:\s*([^\n]+)',
-            r'Descriptif\s*:\s*([^\n]+)',
-            r'Description\s*:\s*([^\n]+)',
-            r'Matériel\s*:\s*([^\n]+)',
-            r'([^\.]+)(?=\s*Règlement\s*:)',  # Texte avant "Règlement :"
-            r'ACOMPTE\s*(sur\s*[^\n]+)'  # Acompte sur quelque chose
-        ]
-
         description = None
-        for pattern in article_patterns:
-            article_match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in ACOMPTE_ARTICLE_PATTERNS:
+            article_match = pattern.search(text)
             if article_match:
                 description = article_match.group(1).strip()
-                print(f"  Description trouvée avec pattern '{pattern}': {description}")
+                print(f"  Description trouvée avec pattern '{pattern.name}': {description}")
                 break
 
         if not description:
             # Si aucun pattern ne correspond, essayer d'extraire un texte descriptif général
             # Chercher entre le numéro de client et les totaux
-            client_match = re.search(r'N° client\s*:[^\n]+\n([^\n]+)', text)
-            total_match = re.search(r'TOTAL', text)
+            client_match = ACOMPTE_CLIENT_LINE.search(text)
+            total_match = ACOMPTE_TOTAL.search(text)
 
             if client_match and total_match:
                 text_between = text[client_match.end():total_match.start()]
@@ -684,12 +781,12 @@ def extract_articles_from_acompte(text: str) -> List[Dict]:
             print(f"  Utilisation de la description par défaut: {description}")
 
         # Tenter d'extraire la référence si disponible
-        ref_match = re.search(r'R[ée]f[ée]rence\s*:\s*([^\n]+)', text, re.IGNORECASE)
+        ref_match = ACOMPTE_REFERENCE.search(text)
         reference = ref_match.group(1).strip() if ref_match else "ACOMPTE"
 
         # Tenter d'extraire le montant HT si disponible
         montant_ht = 0
-        ht_match = re.search(r'TOTAL\s+HT\s+(?:ACOMPTE\s+)?(\d+[\s\d]*[.,]\d{2})\s*€', text, re.IGNORECASE)
+        ht_match = ACOMPTE_ARTICLE_HT.search(text, *section_totaux)
         if ht_match:
             montant_ht = convert_to_float(ht_match.group(1))
             print(f"  Montant HT trouvé: {montant_ht}")
@@ -705,6 +802,6 @@ def extract_articles_from_acompte(text: str) -> List[Dict]:
             'tva': 20.0  # TVA standard par défaut
         })
     except Exception as e:
-        print(f"Erreur lors de l'extraction des articles d'acompte: {str(e)}")
+        report_error(f"Erreur lors de l'extraction des articles d'acompte: {str(e)}")
 
     return articles
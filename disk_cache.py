@@ -0,0 +1,118 @@
+import json
+import os
+from pathlib import Path
+
+# Dossier racine des caches persistants : NOMADS_CACHE_DIR, sinon le dossier de cache
+# de l'utilisateur ($XDG_CACHE_HOME ou ~/.cache), indépendant du répertoire courant
+CACHE_ROOT = Path(os.environ.get("NOMADS_CACHE_DIR")
+                  or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "nomads_facturation"
+                  ).expanduser().resolve()
+
+class DiskCache:
+    """
+    Cache clé/valeur persistant sur disque, borné en taille avec éviction LRU.
+
+    Chaque entrée est un fichier JSON nommé d'après sa clé. La date de
+    modification du fichier sert d'horodatage d'accès : elle est rafraîchie à
+    chaque lecture et les entrées les plus anciennes sont supprimées en premier
+    quand la taille totale dépasse max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(path.stat().st_size for path in self.directory.glob("*.json"))
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        """Retourne la valeur associée à la clé, ou None si absente"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        try:
+            # Marquer l'entrée comme récemment utilisée
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Enregistre une valeur sérialisable en JSON sous la clé donnée"""
+        path = self._path(key)
+        payload = json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+        try:
+            previous_size = path.stat().st_size
+        except OSError:
+            previous_size = 0
+
+        # Écriture atomique pour ne jamais exposer une entrée tronquée à un autre processus
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Erreur lors de l'écriture dans le cache {self.directory}: {str(e)}")
+            return
+
+        self._size += len(payload) - previous_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la limite"""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        # Descendre un peu sous la limite pour ne pas évincer à chaque écriture
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                continue
+        self._size = total
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro"""
+        for path in self.directory.glob("*.json"):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Retourne les compteurs et l'occupation du cache"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': sum(1 for _ in self.directory.glob("*.json")),
+            'size_bytes': self._size,
+            'max_bytes': self.max_bytes
+        }
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from typing import Optional
+from invoice_frame import InvoiceFrameBuilder
+from sheet_schema import ANOMALIES, ANOMALY_ROW, DATE_FORMAT, FACTURES, HEADER_FORMAT, SheetSchema
+
+class _StreamedSheet:
+    """Feuille écrite ligne par ligne, dans l'ordre et avec les formats des colonnes du schéma"""
+
+    def __init__(self, workbook, schema: SheetSchema):
+        self.schema = schema
+        self.rows = 0
+        self.worksheet = workbook.add_worksheet(schema.name)
+        self._kinds = [spec.kind for spec in schema]
+
+        # En mode constant_memory, les formats de colonne doivent être posés avant
+        # la première ligne ; seules les largeurs sont recalculées à la fermeture
+        self._formats = schema.excel_formats(workbook, schema.headers)
+        # Comme column_widths, les colonnes de date ont la largeur d'une date même vides
+        self._widths = [max(len(str(spec.name)), len(DATE_FORMAT) if spec.kind == 'date' else 0)
+                        for spec in schema]
+        self.set_widths()
+
+        header_format = workbook.add_format(HEADER_FORMAT)
+        for col_num, value in enumerate(schema.headers):
+            self.worksheet.write(0, col_num, value, header_format)
+
+    def write_row(self, values):
+        """Écrit une ligne (valeurs dans l'ordre des colonnes, cellules vides du schéma ignorées)"""
+        self.rows += 1
+        row_num = self.rows
+        worksheet, widths, formats = self.worksheet, self._widths, self._formats
+        for idx, (value, kind) in enumerate(zip(values, self._kinds)):
+            if kind == 'text':
+                if value == '':
+                    continue
+                width = len(str(value))
+                worksheet.write(row_num, idx, value)
+            elif kind == 'date':
+                if np.isnat(value):
+                    continue
+                width = len(DATE_FORMAT)
+                worksheet.write_datetime(row_num, idx, value.astype('datetime64[us]').item(), formats.get(idx))
+            else:
+                if np.isnan(value):
+                    continue
+                width = len(str(value))
+                worksheet.write_number(row_num, idx, value, formats.get(idx))
+            if width > widths[idx]:
+                widths[idx] = width
+
+    def write_frame(self, df: pd.DataFrame):
+        """Écrit les lignes d'un DataFrame ayant les colonnes du schéma"""
+        columns = [df[name].to_numpy() for name in self.schema.headers]
+        for index in range(len(df)):
+            self.write_row(values[index] for values in columns)
+
+    def set_widths(self):
+        for idx, width in enumerate(self._widths):
+            self.worksheet.set_column(idx, idx, width + 2, self._formats.get(idx))
+
+# Nombre de factures calculées ensemble avant d'être écrites
+STREAM_CHUNK_SIZE = 500
+
+class StreamingExcelWriter:
+    """
+    Écrit le classeur par lots de factures, au fil de l'analyse.
+
+    Le classeur xlsxwriter est ouvert en mode constant_memory : chaque ligne
+    est écrite sur disque dès que la suivante commence, sans table des
+    cellules en mémoire. Seul le lot en cours (chunk_size factures) est gardé :
+    la mémoire utilisée ne dépend donc pas du nombre de factures exportées.
+
+    Chaque lot est converti par build_frames(invoices) -> (factures, articles),
+    comme le classeur complet (create_invoice_excel.create_invoice_tables :
+    mêmes colonnes, articles calculés en lot, corrections). Avec
+    articles_schema (disposition normalisée), les articles sont écrits dans
+    une seconde feuille, une ligne par article. Avec reconcile (voir
+    reconciliation.reconcile), les anomalies de chaque lot sont écrites dans
+    la feuille Anomalies et gardées (elles seules) dans anomalies.
+
+    Exemple:
+        with StreamingExcelWriter("factures.xlsx", create_invoice_tables) as writer:
+            for key, invoice in invoices:
+                writer.write_invoice(key, invoice)
+    """
+
+    def __init__(self, path, build_frames, schema: SheetSchema = FACTURES,
+                 articles_schema: Optional[SheetSchema] = None, chunk_size: int = STREAM_CHUNK_SIZE,
+                 reconcile=None):
+        self.path = path
+        self._build_frames = build_frames
+        self._reconcile = reconcile
+        self.chunk_size = chunk_size
+        self.workbook = xlsxwriter.Workbook(str(path), {'constant_memory': True})
+        self.invoices = _StreamedSheet(self.workbook, schema)
+        self.articles = _StreamedSheet(self.workbook, articles_schema) if articles_schema else None
+        self._anomalies_sheet = _StreamedSheet(self.workbook, ANOMALIES) if reconcile else None
+        self._anomalies = []
+        self._pending = {}
+
+    @property
+    def rows(self) -> int:
+        """Nombre de factures écrites"""
+        return self.invoices.rows
+
+    @property
+    def anomalies(self) -> Optional[pd.DataFrame]:
+        """Anomalies des lots écrits (None sans rapprochement)"""
+        if self._anomalies_sheet is None:
+            return None
+        if not self._anomalies:
+            return InvoiceFrameBuilder(0, ANOMALIES).to_frame()
+        return pd.concat(self._anomalies, ignore_index=True)
+
+    def write_invoice(self, key, invoice):
+        """
+        Ajoute une facture au lot en cours, écrit dès qu'il est complet.
+
+        Args:
+            key (str): Clé de la facture (nom du PDF et numéro de facture)
+            invoice (dict): Entrée de factures.json ('data' : données extraites)
+        """
+        self._pending[key] = invoice
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Convertit et écrit les factures du lot en cours"""
+        if not self._pending:
+            return
+        df, articles = self._build_frames(self._pending)
+        self._pending = {}
+        # Rang dans la feuille de la première facture du lot, moins un
+        offset = self.invoices.rows
+        self.invoices.write_frame(df)
+        if self.articles is not None and articles is not None:
+            self.articles.write_frame(articles)
+        if self._anomalies_sheet is not None:
+            anomalies = self._reconcile(df, articles)
+            # Rangs du lot rapportés à la feuille entière
+            anomalies[ANOMALY_ROW] += offset
+            self._anomalies_sheet.write_frame(anomalies)
+            if not anomalies.empty:
+                self._anomalies.append(anomalies)
+
+    def close(self):
+        """Écrit le dernier lot, applique les largeurs finales des colonnes et ferme le classeur"""
+        self.flush()
+        for sheet in (self.invoices, self.articles, self._anomalies_sheet):
+            if sheet is not None:
+                sheet.set_widths()
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
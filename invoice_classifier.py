@@ -0,0 +1,97 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple
+from regex_registry import register
+
+# Mots-clés indicateurs : mot-clé -> (type de facture, poids). Un poids de 1.0
+# est décisif : le mot-clé suffit à déterminer le type.
+KEYWORDS: Dict[str, Tuple[str, float]] = {
+    'UGS': ('internet', 1.0),
+    "Facture d'acompte": ('acompte', 1.0),
+    'N° de commande': ('internet', 0.5),
+    'Date de commande': ('internet', 0.5),
+    'N° de facture': ('internet', 0.3),
+    'Livraison gratuite': ('internet', 0.3),
+    'Acompte': ('acompte', 0.3),
+    'Libellé': ('meg', 0.4),
+    'Détail de la TVA': ('meg', 0.4),
+    'N° client': ('meg', 0.3),
+    'Echéance(s)': ('meg', 0.2),
+}
+
+# Types testés dans l'ordre pour les mots-clés décisifs, puis type par défaut
+PRIORITY = ('internet', 'acompte')
+DEFAULT_TYPE = 'meg'
+
+# Un seul parcours du texte pour tous les mots-clés (les plus longs d'abord,
+# pour qu'un mot-clé inclus dans un autre ne le masque pas)
+KEYWORD_SCAN = register(
+    'classifier.keywords',
+    "|".join(re.escape(keyword) for keyword in sorted(KEYWORDS, key=len, reverse=True))
+)
+
+@dataclass(frozen=True)
+class Classification:
+    """Type d'une facture, confiance (0 à 1) et nombre de pages lues pour le déterminer"""
+    type: str
+    confidence: float
+    pages_scanned: int
+
+class InvoiceClassifier:
+    """
+    Classe les factures d'après leurs mots-clés, en lisant le moins de pages possible.
+
+    Les mots-clés de tous les types sont repérés en un seul parcours de
+    chaque page. Seul le mot-clé décisif du type prioritaire (UGS) arrête la
+    lecture : meg (type par défaut) et acompte ne sont acquis qu'une fois
+    toutes les pages lues, quelle que soit la confiance. Le résultat est donc
+    toujours celui des règles historiques sur le texte complet : UGS ->
+    internet, "Facture d'acompte" -> acompte, sinon meg.
+    """
+
+    def _decide(self, found) -> Tuple[str, float]:
+        """Type et confiance d'après l'ensemble des mots-clés trouvés"""
+        decisive = set()
+        evidence: Dict[str, float] = {}
+        for keyword in found:
+            invoice_type, weight = KEYWORDS[keyword]
+            if weight >= 1.0:
+                decisive.add(invoice_type)
+            evidence[invoice_type] = evidence.get(invoice_type, 0.0) + weight
+
+        for invoice_type in PRIORITY:
+            if invoice_type in decisive:
+                return invoice_type, 1.0
+
+        # Confiance : part des indices en faveur du type par défaut, pondérée
+        # par la quantité d'indices trouvés
+        total = sum(evidence.values())
+        score = evidence.get(DEFAULT_TYPE, 0.0)
+        confidence = (score / total) * min(1.0, score) if total else 0.0
+        return DEFAULT_TYPE, round(confidence, 2)
+
+    def classify_pages(self, pages: Iterable[str], stop_early: bool = True) -> Classification:
+        """
+        Classe une facture à partir de ses pages, lues une à une.
+
+        pages peut être un générateur : les pages suivantes ne sont pas lues
+        (ni extraites) après un code UGS. Avec stop_early=False, toutes
+        les pages sont lues (même résultat, confiance calculée sur toute la facture).
+        """
+        found = set()
+        result = Classification(DEFAULT_TYPE, 0.0, 0)
+        for pages_scanned, text in enumerate(pages, 1):
+            found.update(match.group(0) for match in KEYWORD_SCAN.finditer(text))
+            result = Classification(*self._decide(found), pages_scanned)
+            # Rien ne peut plus l'emporter sur le premier type prioritaire ; meg (type par
+            # défaut) et acompte peuvent encore céder à un mot-clé des pages suivantes
+            if stop_early and result.type == PRIORITY[0]:
+                break
+        return result
+
+    def classify(self, text: str) -> Classification:
+        """Classe le texte complet d'une facture"""
+        return self.classify_pages([text])
+
+# Classifieur partagé (voir invoice_engine.classify)
+CLASSIFIER = InvoiceClassifier()
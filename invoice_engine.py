@@ -0,0 +1,213 @@
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional
+from anchor_index import AnchorIndex
+from data_extractor import error_count, extract_data
+from disk_cache import CACHE_ROOT, DiskCache
+from invoice_classifier import CLASSIFIER, Classification
+from regex_registry import REGISTRY
+
+# Cache des factures analysées : activation (PARSE_CACHE=0 pour le désactiver)
+# et taille maximale (en Mo)
+PARSE_CACHE_ENABLED = os.environ.get("PARSE_CACHE", "1") != "0"
+PARSE_CACHE_MAX_MB = int(os.environ.get("PARSE_CACHE_MAX_MB", "100"))
+
+# Version du code d'extraction (data_extractor, anchor_index, table_parser,
+# invoice_model.parse_decimal) : à incrémenter lorsqu'une modification du code,
+# hors motifs du registre, change les données extraites
+EXTRACTOR_VERSION = 2
+
+# Motifs du registre utilisés par les parseurs (voir regex_registry.PatternRegistry.fingerprint)
+PARSER_PATTERNS = ('data.', 'anchors.')
+
+_parse_cache = None
+_fingerprints: Dict[tuple, str] = {}
+
+def get_parse_cache():
+    """Retourne le cache disque partagé des factures analysées"""
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = DiskCache(CACHE_ROOT / "parsed", max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024)
+    return _parse_cache
+
+def extractor_fingerprint(patterns: Iterable[str] = PARSER_PATTERNS) -> str:
+    """
+    Empreinte du code d'extraction : EXTRACTOR_VERSION et définitions des motifs
+    du registre dont le nom commence par l'un des préfixes donnés
+    """
+    patterns = tuple(patterns)
+    # Les motifs sont enregistrés à l'import des extracteurs : l'empreinte n'est
+    # recalculée que si le registre a changé depuis
+    memo_key = (patterns, len(REGISTRY))
+    if memo_key not in _fingerprints:
+        _fingerprints[memo_key] = f"x{EXTRACTOR_VERSION}.{REGISTRY.fingerprint(patterns)}"
+    return _fingerprints[memo_key]
+
+def parse_cache_key(text: str, invoice_type: str, version: int, with_words: bool = False,
+                    patterns: Iterable[str] = PARSER_PATTERNS) -> str:
+    """
+    Clé de cache : SHA-256 du texte de la facture, type et version du parseur,
+    et empreinte du code d'extraction (voir extractor_fingerprint).
+
+    Incrémenter la version du parseur d'un type invalide uniquement les
+    entrées de ce type ; modifier un motif ou incrémenter EXTRACTOR_VERSION
+    invalide toutes les entrées.
+    """
+    key = f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}-{invoice_type}-v{version}-{extractor_fingerprint(patterns)}"
+    if with_words:
+        key += "-words"
+    return key
+
+def classify(text: str) -> str:
+    """
+    Détermine le type d'une facture d'après son contenu.
+
+    Un code UGS indique une facture internet, la mention "Facture d'acompte"
+    une facture d'acompte, sinon c'est une facture MEG.
+    """
+    return CLASSIFIER.classify(text).type
+
+def classify_pages(pages: Iterable[str], stop_early: bool = True) -> Classification:
+    """
+    Détermine le type d'une facture en lisant ses pages une à une.
+
+    La lecture s'arrête au premier code UGS ; une facture MEG ou d'acompte est
+    lue jusqu'au bout (voir invoice_classifier.InvoiceClassifier).
+    """
+    return CLASSIFIER.classify_pages(pages, stop_early)
+
+def empty_invoice_data(invoice_type: str = 'unknown') -> Dict:
+    """Structure de données d'une facture, avec les valeurs par défaut de chaque champ"""
+    return {
+        'type': invoice_type,
+        'articles': [],
+        'TOTAL': {
+            'total_ht': 0,
+            'total_ttc': 0,
+            'tva': 0,
+            'remise': 0
+        },
+        'frais_expedition': {
+            'montant': 0,
+            'description': ''
+        },
+        'client_name': '',
+        'numero_facture': '',
+        'date_facture': '',
+        'date_commande': '',
+        'commentaire': '',
+        'Type_Vente': '',
+        'Réseau_Vente': '',
+        'nombre_articles': 0
+    }
+
+class InvoiceParser:
+    """
+    Parseur d'un type de facture.
+
+    Le parseur reçoit le texte de la facture et son AnchorIndex, calculé une
+    seule fois par le moteur. Une nouvelle version d'un parseur s'enregistre
+    avec un numéro de version supérieur et remplace la précédente.
+    """
+
+    type: str = None
+    version: int = 1
+
+    def parse(self, text: str, index: AnchorIndex, pages_words: List[List[Dict]] = None) -> Dict:
+        return extract_data(text, self.type, pages_words, index)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.type!r}, v{self.version})"
+
+class MegParser(InvoiceParser):
+    type = 'meg'
+
+class InternetParser(InvoiceParser):
+    type = 'internet'
+
+class AcompteParser(InvoiceParser):
+    type = 'acompte'
+
+class ParserRegistry:
+    """Registre des parseurs, un par type de facture"""
+
+    def __init__(self):
+        self._parsers: Dict[str, InvoiceParser] = {}
+
+    def register(self, parser: InvoiceParser) -> InvoiceParser:
+        """Enregistre un parseur, sauf si une version plus récente du même type l'est déjà"""
+        existing = self._parsers.get(parser.type)
+        if existing is not None and existing.version > parser.version:
+            return existing
+        self._parsers[parser.type] = parser
+        return parser
+
+    def __getitem__(self, invoice_type) -> InvoiceParser:
+        return self._parsers[invoice_type]
+
+    def __contains__(self, invoice_type):
+        return invoice_type in self._parsers
+
+    def types(self) -> List[str]:
+        return list(self._parsers)
+
+# Registre partagé par app.py, streamlit_app.py et create_invoice_excel.py
+PARSERS = ParserRegistry()
+for _parser in (MegParser(), InternetParser(), AcompteParser()):
+    PARSERS.register(_parser)
+
+def register_parser(parser: InvoiceParser) -> InvoiceParser:
+    """Enregistre un parseur dans le registre partagé"""
+    return PARSERS.register(parser)
+
+def parse_invoice(text: str, pages_words: List[List[Dict]] = None, invoice_type: Optional[str] = None,
+                  use_cache: bool = True) -> Dict:
+    """
+    Point d'entrée unique de l'extraction : classe et analyse une facture une seule fois.
+
+    Le résultat est mis en cache sur disque sous (texte, type, version du
+    parseur, empreinte du code d'extraction) : une facture déjà analysée par
+    le même code n'est pas ré-analysée, par exemple pour régénérer un
+    classeur après un changement de mise en forme Excel.
+
+    Args:
+        text: Texte de toutes les pages de la facture
+        pages_words: Mots de chaque page, pour le parseur de tableau MEG (optionnel)
+        invoice_type: Type de facture s'il est déjà connu (par exemple par
+            classify_pages()), sinon déterminé par classify()
+        use_cache: Réutiliser le résultat d'une analyse précédente du même texte
+
+    Returns:
+        dict: Données de la facture, complétées par les valeurs par défaut de
+        empty_invoice_data() pour les champs non trouvés
+    """
+    invoice_type = invoice_type or classify(text)
+    # Pas de cache pour un type sans parseur (l'erreur est signalée plus bas)
+    cache = get_parse_cache() if use_cache and PARSE_CACHE_ENABLED and invoice_type in PARSERS else None
+    if cache is not None:
+        parser = PARSERS[invoice_type]
+        cache_key = parse_cache_key(text, parser.type, parser.version, bool(pages_words))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    data = empty_invoice_data(invoice_type)
+    degraded_before, errors_before = REGISTRY.degraded_count(), error_count()
+    complete = True
+
+    try:
+        extracted_data = PARSERS[invoice_type].parse(text, AnchorIndex(text), pages_words)
+        # Fusionner les données extraites avec la structure de base
+        data.update(extracted_data)
+    except Exception as e:
+        print(f"Erreur lors de l'extraction des données détaillées: {str(e)}")
+        complete = False
+
+    data['nombre_articles'] = len(data['articles'])
+
+    # Un résultat incomplet n'est pas mis en cache : exception, erreur signalée par
+    # l'extracteur, motif interrompu ou désactivé (résultat du motif de secours ou vide)
+    complete = complete and error_count() == errors_before and REGISTRY.degraded_count() == degraded_before
+    if cache is not None and complete:
+        cache.set(cache_key, data)
+    return data
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+from sheet_schema import ARTICLE_COLUMNS, ARTICLE_INVOICE_INDEX, ARTICLES, FACTURES, INVOICE_KEY, MAX_ARTICLES, SheetSchema
+
+class RowWriter:
+    """Accès par nom de colonne à une ligne du builder, écrit directement dans les colonnes"""
+
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, columns: Dict[str, np.ndarray], index: int):
+        self._columns = columns
+        self._index = index
+
+    def __setitem__(self, column, value):
+        self._columns[column][self._index] = value
+
+    def __getitem__(self, column):
+        return self._columns[column][self._index]
+
+class InvoiceFrameBuilder:
+    """
+    Construit le DataFrame des factures colonne par colonne.
+
+    Les colonnes sont préallouées pour le lot avec le type déclaré par le
+    schéma (voir sheet_schema), toutes vides au départ ; chaque
+    facture est écrite dans sa ligne, puis le DataFrame est créé une seule
+    fois, sans dictionnaire par ligne ni passe de complétion des colonnes.
+
+    Une ligne n'est conservée qu'après commit() : une facture en erreur est
+    effacée et sa ligne réutilisée par la suivante.
+    """
+
+    def __init__(self, capacity: int, schema: SheetSchema = FACTURES):
+        self.schema = schema
+        self.capacity = capacity
+        self.size = 0
+        self._pending = False
+        self.columns: Dict[str, np.ndarray] = {
+            spec.name: schema.empty_column(spec.name, capacity) for spec in schema
+        }
+
+    def new_row(self) -> RowWriter:
+        """Ligne suivante, vidée si la facture précédente n'a pas été validée"""
+        if self._pending:
+            for spec in self.schema:
+                self.columns[spec.name][self.size] = spec.empty
+        self._pending = True
+        return RowWriter(self.columns, self.size)
+
+    def commit(self):
+        """Valide la ligne en cours"""
+        self._pending = False
+        self.size += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame des lignes validées, dans l'ordre exact des colonnes"""
+        return pd.DataFrame({column: values[:self.size] for column, values in self.columns.items()},
+                            columns=self.schema.headers)
+
+def articles_from_slots(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Table des articles (une ligne par article, schéma ARTICLES) à partir des
+    colonnes ref1..20, q1..20, etc. de la disposition large.
+
+    Les colonnes de chaque champ sont empilées en une matrice (facture x
+    emplacement) puis aplaties ; un emplacement est occupé si sa quantité
+    est renseignée. L'index de la table est la position de la facture de
+    chaque article dans df (ARTICLE_INVOICE_INDEX) ; la colonne INVOICE_KEY
+    reprend celle de df.
+    """
+    slots = range(1, MAX_ARTICLES + 1)
+    fields = {field: df[[f'{field}{slot}' for slot in slots]].to_numpy().ravel() for field, _ in ARTICLE_COLUMNS}
+    used = ~np.isnan(fields['q'].astype('float64'))
+    invoice_rows = np.repeat(np.arange(len(df)), MAX_ARTICLES)[used]
+
+    keys = df[INVOICE_KEY].to_numpy(dtype=object) if INVOICE_KEY in df.columns else np.full(len(df), '', dtype=object)
+    articles = {
+        INVOICE_KEY: np.repeat(keys, MAX_ARTICLES)[used],
+        'N° Syst.': np.repeat(df['N° Syst.'].to_numpy(dtype=object), MAX_ARTICLES)[used],
+        'ligne': np.tile(np.arange(1, MAX_ARTICLES + 1, dtype='float64'), len(df))[used],
+    }
+    for field, _ in ARTICLE_COLUMNS:
+        articles[field] = fields[field][used]
+    return pd.DataFrame({spec.name: np.asarray(articles[spec.name], dtype=spec.dtype) for spec in ARTICLES},
+                        columns=ARTICLES.headers, index=pd.Index(invoice_rows, name=ARTICLE_INVOICE_INDEX))
@@ -0,0 +1,165 @@
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Optional, Tuple
+
+def parse_decimal(value) -> float:
+    """
+    Convertit un nombre au format français ("1 645,00 €", "20,00%") en float.
+
+    Les nombres sont renvoyés tels quels ; une valeur vide ou invalide vaut 0.0.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        clean_value = "".join(value.replace('€', '').replace('%', '').split())
+        return float(clean_value.replace(',', '.'))
+    except (ValueError, AttributeError):
+        return 0.0
+
+def _round_half_up(value: float, factor: int = 1) -> int:
+    """Arrondi commercial (0,5 -> 1) de value x factor à l'entier le plus proche, calculé en décimal"""
+    return int((Decimal(repr(value)) * factor).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+class Money(int):
+    """
+    Montant en centimes d'euro.
+
+    Les montants sont additionnés et soustraits en entiers, sans dérive
+    d'arrondi (HT + TVA = TTC au centime près) ; seules les multiplications
+    par un taux (scale) arrondissent, au centime, une seule fois.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_euros(cls, euros) -> 'Money':
+        """Montant en euros (nombre ou texte au format français) arrondi au centime"""
+        if isinstance(euros, Money):
+            return euros
+        return cls(_round_half_up(parse_decimal(euros), 100))
+
+    @property
+    def euros(self) -> float:
+        return int(self) / 100
+
+    def scale(self, factor: float) -> 'Money':
+        """Montant multiplié par un taux ou une quantité, arrondi au centime"""
+        return Money(_round_half_up(int(self) * factor))
+
+    def __add__(self, other):
+        return Money(int(self) + int(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Money(int(self) - int(other))
+
+    def __rsub__(self, other):
+        return Money(int(other) - int(self))
+
+    def __neg__(self):
+        return Money(-int(self))
+
+    def __abs__(self):
+        return Money(abs(int(self)))
+
+    def __repr__(self):
+        return f"Money({self.euros:.2f})"
+
+ZERO = Money(0)
+
+@dataclass(slots=True)
+class Article:
+    """Ligne d'article d'une facture ; remise en décimal (0.10 pour 10 %), tva en pourcentage"""
+    reference: str = ''
+    description: str = ''
+    quantite: float = 0.0
+    prix_unitaire: Money = ZERO
+    prix_ttc: Money = ZERO
+    montant_ht: Money = ZERO
+    remise: float = 0.0
+    tva: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, article: Dict) -> 'Article':
+        tva = article.get('tva')
+        return cls(
+            reference=article.get('reference', '') or '',
+            description=article.get('description', '') or '',
+            quantite=parse_decimal(article.get('quantite', 0)),
+            prix_unitaire=Money.from_euros(article.get('prix_unitaire', 0)),
+            prix_ttc=Money.from_euros(article.get('prix_ttc', 0)),
+            montant_ht=Money.from_euros(article.get('montant_ht', 0)),
+            remise=parse_decimal(article.get('remise', 0)),
+            tva=parse_decimal(tva) if tva not in (None, '') else None
+        )
+
+    @property
+    def remise_ht(self) -> Money:
+        """Remise de la ligne en euros HT (prix unitaire x taux de remise x quantité)"""
+        return self.prix_unitaire.scale(self.remise * self.quantite)
+
+@dataclass(slots=True)
+class Totals:
+    """Totaux d'une facture"""
+    total_ht: Money = ZERO
+    total_ttc: Money = ZERO
+    tva: Money = ZERO
+    remise: Money = ZERO
+
+    @classmethod
+    def from_dict(cls, totals: Dict) -> 'Totals':
+        return cls(*(Money.from_euros(totals.get(key, 0)) for key in ('total_ht', 'total_ttc', 'tva', 'remise')))
+
+@dataclass(slots=True)
+class Invoice:
+    """
+    Facture analysée, sous une forme compacte pour la génération du classeur.
+
+    Les parseurs produisent des dictionnaires (format de factures.json et du
+    cache des factures analysées) ; from_dict les convertit une seule fois en
+    montants entiers et attributs.
+    """
+    type: str = 'unknown'
+    numero_facture: str = ''
+    numero_commande: str = ''
+    client_name: str = ''
+    date_facture: str = ''
+    date_commande: str = ''
+    commentaire: str = ''
+    type_vente: str = ''
+    reseau_vente: str = ''
+    statut_paiement: str = ''
+    totals: Totals = field(default_factory=Totals)
+    articles: Tuple[Article, ...] = ()
+    frais_expedition: Money = ZERO
+    expedition_description: str = ''
+    acompte_montant: Optional[Money] = None
+    acompte_date: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Invoice':
+        expedition = data.get('frais_expedition') or {}
+        echeance = data.get('acomptes') or {}
+        return cls(
+            type=data.get('type', 'unknown'),
+            numero_facture=data.get('numero_facture', '') or '',
+            numero_commande=data.get('numero_commande', '') or '',
+            client_name=data.get('client_name', ''),
+            date_facture=data.get('date_facture', ''),
+            date_commande=data.get('date_commande', ''),
+            commentaire=data.get('commentaire', ''),
+            type_vente=data.get('Type_Vente', ''),
+            reseau_vente=data.get('Réseau_Vente', ''),
+            statut_paiement=data.get('statut_paiement', ''),
+            totals=Totals.from_dict(data.get('TOTAL') or {}),
+            articles=tuple(Article.from_dict(article) for article in data.get('articles', [])),
+            frais_expedition=Money.from_euros(expedition.get('montant', 0)),
+            expedition_description=expedition.get('description', '') or '',
+            acompte_montant=Money.from_euros(echeance['montant']) if 'montant' in echeance else None,
+            acompte_date=echeance.get('date', '')
+        )
+
+    @property
+    def total_quantity(self) -> float:
+        return sum(article.quantite for article in self.articles)
@@ -0,0 +1,129 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from invoice_classifier import Classification
+from invoice_engine import classify_pages, parse_invoice
+from regex_registry import register
+
+# Numéro de facture d'une page, pour regrouper les pages d'une même facture
+PAGE_NUMERO_MEG = register('pages.numero_meg', r'N°\s*:\s*([A-Z0-9]+)')
+PAGE_NUMERO_INTERNET = register('internet.numero_facture', r'N° de facture\s*:\s*([^\n]+)')
+
+def page_invoice_number(text: str) -> Optional[str]:
+    """Numéro de facture imprimé sur une page (MEG puis internet), None s'il n'y en a pas"""
+    match = PAGE_NUMERO_MEG.search(text) or PAGE_NUMERO_INTERNET.search(text)
+    return match.group(1).strip() if match else None
+
+@dataclass
+class SplitInvoice:
+    """Pages consécutives d'un PDF appartenant à une même facture"""
+    invoice_num: Optional[str]
+    first_page: int
+    last_page: int
+    pages_text: List[str] = field(default_factory=list)
+    pages_words: List[List[Dict]] = field(default_factory=list)
+    source: str = ''
+
+    @property
+    def text(self) -> str:
+        """Texte de toutes les pages de la facture"""
+        return "\n\n".join(self.pages_text)
+
+    @property
+    def key(self) -> str:
+        """Clé unique de la facture dans factures.json (nom du PDF et numéro de facture)"""
+        return f"{self.source}_{self.invoice_num}" if self.invoice_num else f"{self.source}"
+
+class InvoiceSplitter:
+    """
+    Découpe un PDF en factures à mesure que ses pages sont lues.
+
+    Une page porte le numéro de sa facture ("N° :" pour MEG, "N° de facture"
+    pour internet) ; une page sans numéro, ou avec un autre numéro, commence
+    une nouvelle facture. Une facture est donc complète dès que l'en-tête de
+    la suivante apparaît : elle est restituée à ce moment-là, sans attendre la
+    fin du PDF, et seules les pages de la facture en cours restent en mémoire.
+    """
+
+    def __init__(self, source: str = ''):
+        self.source = source
+        self.pages_seen = 0
+
+    def split(self, pages: Iterable[Tuple]) -> Iterator[SplitInvoice]:
+        """
+        Args:
+            pages: Tuples (numéro de page, texte) ou (numéro de page, texte, mots),
+                tels que produits par pdf_extractor.iter_pages()
+
+        Yields:
+            SplitInvoice: Chaque facture, dès que sa dernière page est connue
+        """
+        current = None
+        for page_idx, text, *words in pages:
+            self.pages_seen += 1
+            if not text.strip():
+                continue
+
+            invoice_num = page_invoice_number(text)
+
+            # Même numéro que la facture courante : page supplémentaire de celle-ci
+            if current and current.invoice_num and invoice_num and current.invoice_num == invoice_num:
+                current.pages_text.append(text)
+                current.pages_words.extend(words)
+                current.last_page = page_idx
+                continue
+
+            # Sinon la facture précédente est complète
+            if current:
+                yield current
+            current = SplitInvoice(invoice_num, page_idx, page_idx, [text], list(words), self.source)
+
+        # Dernière facture du PDF
+        if current:
+            yield current
+
+def split_invoices(pages: Iterable[Tuple], source: str = '') -> Iterator[SplitInvoice]:
+    """Découpe une suite de pages en factures (voir InvoiceSplitter), source étant le nom du PDF"""
+    return InvoiceSplitter(source).split(pages)
+
+def parse_split_invoice(invoice: SplitInvoice) -> Tuple[Classification, Dict]:
+    """Classe et analyse une facture découpée (fonction de niveau module, exécutable dans un worker)"""
+    # Classer la facture sur toutes ses pages, déjà en mémoire, puis l'analyser une seule fois
+    classification = classify_pages(invoice.pages_text, stop_early=False)
+    data = parse_invoice(invoice.text, invoice.pages_words, classification.type)
+    return classification, data
+
+def iter_parsed_invoices(invoices: Iterable[SplitInvoice], executor=None,
+                         max_pending: int = 16) -> Iterator[Tuple[SplitInvoice, Classification, Dict]]:
+    """
+    Analyse les factures à mesure qu'elles sont découpées.
+
+    Sans executor, chaque facture est analysée dès qu'elle est complète. Avec
+    un executor (pool de processus), elle lui est confiée aussitôt : le pool
+    analyse la facture N pendant que les pages de la facture N+1 sont encore
+    en cours d'extraction.
+
+    Args:
+        invoices: Factures, par exemple produites par split_invoices()
+        executor: concurrent.futures.Executor pour l'analyse (optionnel)
+        max_pending: Nombre maximal de factures en cours d'analyse dans le pool
+
+    Yields:
+        tuple: (facture, classification, données), dans l'ordre des factures
+    """
+    if executor is None:
+        for invoice in invoices:
+            yield (invoice, *parse_split_invoice(invoice))
+        return
+
+    pending = deque()
+    for invoice in invoices:
+        pending.append((invoice, executor.submit(parse_split_invoice, invoice)))
+        # Restituer les factures déjà analysées, sans attendre la fin du PDF
+        while pending and (pending[0][1].done() or len(pending) >= max_pending):
+            done_invoice, future = pending.popleft()
+            yield (done_invoice, *future.result())
+
+    while pending:
+        done_invoice, future = pending.popleft()
+        yield (done_invoice, *future.result())
@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Dossier des tâches (état, PDF reçus, résultats), conservé d'un démarrage à l'autre
+JOBS_DIR = Path(os.environ.get("JOBS_DIR", "jobs"))
+# Nombre de tâches traitées en même temps, et de processus analysant leurs PDF
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(os.cpu_count() or 1)))
+# Durée de conservation (en heures) d'une tâche terminée, PDF reçus compris
+JOB_RETENTION_HOURS = float(os.environ.get("JOB_RETENTION_HOURS", "24"))
+# Nouvelles tentatives d'un fichier dont l'analyse a été interrompue par l'arrêt d'un processus du pool
+POOL_RETRIES = 1
+
+# États d'une tâche et de chacun de ses fichiers
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+FINISHED = (DONE, FAILED)
+
+RESULT_NAME = 'factures.xlsx'
+
+_JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+class JobStore:
+    """
+    État des tâches sur disque, un dossier par tâche (root/<id>) :
+    - state.json : état de la tâche et de chaque fichier, remplacé d'un bloc
+      (os.replace) à chaque mise à jour
+    - inputs/<n>.pdf : PDF reçus, dans l'ordre de l'envoi
+    - parsed/<n>.json : factures de chaque fichier déjà analysé
+    - factures.xlsx : classeur produit
+    """
+
+    def __init__(self, root=JOBS_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+    def input_path(self, job_id: str, index: int) -> Path:
+        return self._dir(job_id) / 'inputs' / f'{index}.pdf'
+
+    def parsed_path(self, job_id: str, index: int) -> Path:
+        return self._dir(job_id) / 'parsed' / f'{index}.json'
+
+    def result_path(self, job_id: str) -> Path:
+        return self._dir(job_id) / RESULT_NAME
+
+    def create(self, files: List[Tuple[str, bytes]]) -> Dict:
+        """Enregistre les PDF d'une nouvelle tâche (en attente) ; renvoie son état"""
+        job_id = uuid.uuid4().hex
+        for folder in ('inputs', 'parsed'):
+            (self._dir(job_id) / folder).mkdir(parents=True)
+        for index, (_, content) in enumerate(files):
+            self.input_path(job_id, index).write_bytes(content)
+
+        state = {
+            'id': job_id,
+            'status': QUEUED,
+            'created_at': _now(),
+            'updated_at': _now(),
+            'error': None,
+            'result': None,
+            'files': [{'name': name, 'status': QUEUED, 'invoices': 0, 'error': None} for name, _ in files],
+        }
+        self._write(state)
+        return state
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """État de la tâche, None si elle n'existe pas"""
+        path = self._dir(job_id) / 'state.json'
+        if not _JOB_ID.fullmatch(job_id) or not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def all(self) -> List[Dict]:
+        """États de toutes les tâches enregistrées, des plus anciennes aux plus récentes"""
+        states = [self.get(path.name) for path in self.root.iterdir() if path.is_dir()]
+        return sorted((state for state in states if state), key=lambda state: state['created_at'])
+
+    def purge(self, max_age: timedelta) -> int:
+        """Supprime les tâches terminées depuis plus de max_age (dossier complet) ; renvoie leur nombre"""
+        limit = datetime.now(timezone.utc) - max_age
+        removed = 0
+        for path in self.root.iterdir():
+            if not path.is_dir():
+                continue
+            state = self.get(path.name)
+            if state is None:
+                # Dossier sans état (tâche dont la création a été interrompue)
+                expired = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc) < limit
+            else:
+                expired = state['status'] in FINISHED and datetime.fromisoformat(state['updated_at']) < limit
+            if expired:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def update(self, job_id: str, file_index: Optional[int] = None, **changes) -> Dict:
+        """Modifie l'état de la tâche, ou d'un de ses fichiers si file_index est donné"""
+        with self._lock:
+            state = self.get(job_id)
+            target = state if file_index is None else state['files'][file_index]
+            target.update(changes)
+            state['updated_at'] = _now()
+            self._write(state)
+        return state
+
+    def _write(self, state: Dict):
+        path = self._dir(state['id']) / 'state.json'
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+def progress(state: Dict) -> Dict:
+    """Avancement d'une tâche : fichiers terminés (analysés ou en erreur) et factures trouvées"""
+    return {
+        'files_done': sum(file['status'] in FINISHED for file in state['files']),
+        'files_total': len(state['files']),
+        'invoices': sum(file['invoices'] for file in state['files']),
+    }
+
+class JobManager:
+    """
+    Traitement des tâches en arrière-plan.
+
+    Chaque tâche est suivie par un thread (JOB_CONCURRENCY tâches à la fois)
+    qui confie ses PDF à un pool de processus partagé (JOB_WORKERS) et met à
+    jour l'état de chaque fichier dès qu'il est analysé ; les factures d'un
+    fichier sont enregistrées aussitôt. Le classeur est écrit quand tous les
+    fichiers sont traités. Un fichier en erreur n'arrête pas la tâche.
+
+    Au démarrage, resume() relance les tâches interrompues : seuls les
+    fichiers qui n'avaient pas été analysés le sont à nouveau.
+
+    Le pool de processus (pool()) est créé à la première analyse. Si un processus
+    s'arrête brutalement (BrokenProcessPool), le pool est recréé et les
+    fichiers en cours sont analysés à nouveau (POOL_RETRIES fois au plus).
+    Les tâches terminées sont supprimées après JOB_RETENTION_HOURS heures.
+
+    Args:
+        store (JobStore): État des tâches
+        parse_file: parse_file(nom, chemin) -> factures du PDF (format de factures.json),
+            appelée dans un processus du pool (fonction de module)
+        write_results: write_results(factures, chemin du classeur), appelée une fois par tâche
+        retention_hours (float): Durée de conservation des tâches terminées
+    """
+
+    def __init__(self, store: JobStore, parse_file: Callable[[str, Path], Dict],
+                 write_results: Callable[[Dict, Path], Path],
+                 concurrency: int = JOB_CONCURRENCY, workers: int = JOB_WORKERS,
+                 retention_hours: float = JOB_RETENTION_HOURS):
+        self.store = store
+        self._parse_file = parse_file
+        self._write_results = write_results
+        self._retention = timedelta(hours=retention_hours)
+        self._jobs = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job')
+        self._nb_workers = workers
+        self._workers: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        """
+        Pool de processus d'analyse, créé au premier appel ou après l'arrêt du
+        précédent ; partagé avec les analyses synchrones de l'API (voir
+        app.process_pdfs), qui appellent discard_pool si elles le trouvent arrêté
+        """
+        with self._lock:
+            if self._workers is None:
+                self._workers = ProcessPoolExecutor(max_workers=self._nb_workers)
+            return self._workers
+
+    def discard_pool(self, pool: ProcessPoolExecutor):
+        """Abandonne le pool s'il est toujours le pool courant (une autre tâche a pu le remplacer)"""
+        with self._lock:
+            if self._workers is pool:
+                self._workers = None
+                logger.warning("Worker process pool broken, a new one will be started")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def purge(self) -> int:
+        """Supprime les tâches terminées depuis plus que la durée de conservation ; renvoie leur nombre"""
+        removed = self.store.purge(self._retention)
+        if removed:
+            logger.info(f"{removed} expired job(s) removed")
+        return removed
+
+    def submit(self, files: List[Tuple[str, bytes]]) -> Dict:
+        """Enregistre une tâche et la met en file d'attente ; renvoie son état"""
+        self.purge()
+        state = self.store.create(files)
+        self._jobs.submit(self._run, state['id'])
+        logger.info(f"Job {state['id']} queued ({len(files)} file(s))")
+        return state
+
+    def resume(self) -> int:
+        """Remet en file d'attente les tâches non terminées ; renvoie leur nombre"""
+        pending = [state for state in self.store.all() if state['status'] not in FINISHED]
+        for state in pending:
+            self._jobs.submit(self._run, state['id'])
+            logger.info(f"Job {state['id']} resumed")
+        return len(pending)
+
+    def shutdown(self):
+        self._jobs.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            pool, self._workers = self._workers, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _parse_files(self, job_id: str, state: Dict, indexes: List[int], invoices_data: Dict):
+        """Analyse les fichiers indexes de la tâche dans le pool ; relance ceux interrompus par un arrêt du pool"""
+        store = self.store
+        for attempt in range(POOL_RETRIES + 1):
+            pool = self.pool()
+            futures, interrupted, broken = {}, [], False
+            for index in indexes:
+                try:
+                    futures[pool.submit(self._parse_file, state['files'][index]['name'],
+                                        store.input_path(job_id, index))] = index
+                except RuntimeError:
+                    # Pool arrêté (BrokenProcessPool) ou remplacé entre-temps
+                    interrupted.append(index)
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    file_invoices = future.result()
+                except BrokenProcessPool as e:
+                    broken = True
+                    if attempt < POOL_RETRIES:
+                        interrupted.append(index)
+                    else:
+                        self._file_failed(job_id, state, index, e)
+                    continue
+                except Exception as e:
+                    self._file_failed(job_id, state, index, e)
+                    continue
+                with open(store.parsed_path(job_id, index), 'w', encoding='utf-8') as f:
+                    json.dump(file_invoices, f, ensure_ascii=False)
+                invoices_data[index] = file_invoices
+                store.update(job_id, index, status=DONE, invoices=len(file_invoices))
+
+            if broken or interrupted:
+                self.discard_pool(pool)
+            if not interrupted:
+                return
+            logger.warning(f"Job {job_id}: {len(interrupted)} file(s) interrupted, retrying")
+            indexes = sorted(interrupted)
+
+        for index in indexes:
+            self._file_failed(job_id, state, index, RuntimeError("Worker process pool unavailable"))
+
+    def _file_failed(self, job_id: str, state: Dict, index: int, error: Exception):
+        logger.error(f"Job {job_id}: error on {state['files'][index]['name']}: {str(error)}")
+        self.store.update(job_id, index, status=FAILED, error=str(error))
+
+    def _run(self, job_id: str):
+        store = self.store
+        try:
+            state = store.update(job_id, status=RUNNING)
+            invoices_data = {}
+            to_parse = []
+            for index, file in enumerate(state['files']):
+                parsed = store.parsed_path(job_id, index)
+                if file['status'] == DONE and parsed.exists():
+                    # Fichier analysé avant l'interruption de la tâche
+                    with open(parsed, encoding='utf-8') as f:
+                        invoices_data[index] = json.load(f)
+                elif file['status'] != FAILED:
+                    store.update(job_id, index, status=RUNNING)
+                    to_parse.append(index)
+            self._parse_files(job_id, state, to_parse, invoices_data)
+
+            # Factures dans l'ordre des fichiers envoyés
+            all_invoices = {key: invoice for index in sorted(invoices_data)
+                            for key, invoice in invoices_data[index].items()}
+            if not all_invoices:
+                raise ValueError("No invoice found in the uploaded files")
+            self._write_results(all_invoices, store.result_path(job_id))
+            store.update(job_id, status=DONE, result=RESULT_NAME)
+            logger.info(f"Job {job_id} done ({len(all_invoices)} invoice(s))")
+
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            store.update(job_id, status=FAILED, error=str(e))
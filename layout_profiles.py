@@ -0,0 +1,186 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+@dataclass(frozen=True)
+class Region:
+    """
+    Bande horizontale d'une page à extraire.
+
+    La bande commence au premier ancrage de `start` trouvé sur la page (haut
+    de page si None) et s'arrête au premier ancrage de `end` situé plus bas
+    (à défaut, au début de la région suivante ou du pied de page). Si aucun
+    ancrage de `start` n'est trouvé, la région est ignorée : son contenu est
+    couvert par la région précédente, qui s'étend alors jusqu'à son propre
+    ancrage de fin.
+    """
+    name: str
+    start: Optional[Tuple[str, ...]] = None
+    end: Optional[Tuple[str, ...]] = None
+    x0_ratio: float = 0.0
+    x1_ratio: float = 1.0
+
+@dataclass(frozen=True)
+class LayoutProfile:
+    """
+    Régions utiles d'un type de facture et ancrages du pied de page à ignorer.
+
+    Le pied de page (mentions légales et pagination "Page X de Y") n'est pas
+    extrait : ne pas utiliser de profil si ces informations sont nécessaires.
+    """
+    name: str
+    regions: Tuple[Region, ...]
+    # Au moins un de ces ancrages doit être présent, sinon la page entière est extraite
+    required: Tuple[str, ...]
+    footer: Tuple[str, ...] = ()
+
+_FOOTER_ANCHORS = ("Conditions générales", "SIRET", "RCS", "capital", "Mentions légales")
+
+PROFILES: Dict[str, LayoutProfile] = {
+    'meg': LayoutProfile(
+        name='meg',
+        regions=(
+            # N°, Date, N° client et nom du client
+            Region('entete', end=("Libellé",)),
+            # Tableau des articles
+            Region('articles', start=("Libellé",), end=("Détail de la TVA",)),
+            # Détail de la TVA, totaux et échéances
+            Region('totaux', start=("Détail de la TVA",)),
+        ),
+        required=("Libellé", "Détail de la TVA"),
+        footer=_FOOTER_ANCHORS
+    ),
+    'internet': LayoutProfile(
+        name='internet',
+        regions=(
+            Region('entete', end=("Produit",)),
+            Region('articles', start=("Produit",), end=("Sous-total",)),
+            Region('totaux', start=("Sous-total",)),
+        ),
+        required=("Produit", "Sous-total"),
+        footer=_FOOTER_ANCHORS
+    ),
+    'acompte': LayoutProfile(
+        name='acompte',
+        regions=(
+            Region('entete', end=("Libellé", "Désignation")),
+            Region('articles', start=("Libellé", "Désignation"), end=("Détail de la TVA", "TOTAL")),
+            Region('totaux', start=("Détail de la TVA", "TOTAL")),
+        ),
+        required=("Libellé", "Désignation", "Détail de la TVA"),
+        footer=_FOOTER_ANCHORS
+    ),
+}
+
+def _normalize(text):
+    return "".join(text.split())
+
+class PageAnchors:
+    """
+    Localise des ancrages textuels sur une page sans calcul de mise en page.
+
+    Les caractères de la page sont parcourus dans l'ordre du flux PDF, espaces
+    exclus, ce qui suffit pour retrouver des libellés écrits d'un seul tenant.
+    """
+
+    def __init__(self, page):
+        chars = [char for char in page.chars if char["text"] and not char["text"].isspace()]
+        self.text = "".join(char["text"] for char in chars)
+        if len(self.text) == len(chars):
+            self._tops = [char["top"] for char in chars]
+        else:
+            # Glyphes multi-caractères (ligatures) : une ordonnée par caractère produit
+            self._tops = []
+            for char in chars:
+                self._tops.extend([char["top"]] * len(char["text"]))
+
+    def top(self, anchor, below=None):
+        """Ordonnée du haut de la première occurrence de l'ancrage (sous `below` si donné)"""
+        needle = _normalize(anchor)
+        position = self.text.find(needle)
+        while position != -1:
+            top = self._tops[position]
+            if below is None or top > below:
+                return top
+            position = self.text.find(needle, position + 1)
+        return None
+
+    def first_top(self, anchors, below=None):
+        """Ordonnée la plus haute parmi les ancrages trouvés"""
+        tops = [top for top in (self.top(anchor, below) for anchor in anchors) if top is not None]
+        return min(tops) if tops else None
+
+def detect_profile(anchors):
+    """Choisit le profil d'une page d'après ses ancrages (mêmes règles que la détection de type)"""
+    if "UGS" in anchors.text:
+        return PROFILES['internet']
+    if _normalize("Facture d'acompte") in anchors.text:
+        return PROFILES['acompte']
+    return PROFILES['meg']
+
+def extract_page_regions(page, profile):
+    """
+    Extrait le texte des seules régions utiles d'une page via page.crop().
+
+    Args:
+        page: Page pdfplumber
+        profile: Nom d'un profil de PROFILES, LayoutProfile, ou "auto"
+
+    Returns:
+        str: Texte des régions, dans l'ordre de la page. La page entière est
+        extraite si les ancrages requis du profil sont absents.
+    """
+    anchors = PageAnchors(page)
+    if profile == "auto":
+        profile = detect_profile(anchors)
+    elif isinstance(profile, str):
+        profile = PROFILES[profile]
+
+    required_top = anchors.first_top(profile.required)
+    if required_top is None:
+        return page.extract_text() or ""
+
+    # Petite marge pour que la ligne de l'ancrage appartienne bien à sa région
+    margin = 1
+
+    # Le pied de page (mentions légales, pagination) est cherché sous le corps de la facture
+    footer_top = anchors.first_top(profile.footer, below=required_top) if profile.footer else None
+    page_bottom = footer_top - margin if footer_top is not None else page.bbox[3]
+    found = []
+    for region in profile.regions:
+        if region.start is None:
+            found.append((region, page.bbox[1]))
+            continue
+        top = anchors.first_top(region.start)
+        if top is not None:
+            found.append((region, max(page.bbox[1], top - margin)))
+
+    boxes = []
+    for index, (region, top) in enumerate(found):
+        # Une région s'arrête à son ancrage de fin, au début de la région suivante
+        # ou au pied de page
+        bottom = page_bottom
+        if index + 1 < len(found):
+            bottom = min(bottom, found[index + 1][1])
+        if region.end:
+            end_top = anchors.first_top(region.end, below=top + margin)
+            if end_top is not None:
+                bottom = min(bottom, end_top - margin)
+        if bottom <= top:
+            continue
+
+        x0 = page.bbox[0] + page.width * region.x0_ratio
+        x1 = page.bbox[0] + page.width * region.x1_ratio
+        # Des régions contiguës de même largeur sont extraites en un seul crop :
+        # chaque crop refiltre tous les objets de la page
+        if boxes and boxes[-1][0] == x0 and boxes[-1][2] == x1 and boxes[-1][3] >= top:
+            boxes[-1] = (x0, boxes[-1][1], x1, bottom)
+        else:
+            boxes.append((x0, top, x1, bottom))
+
+    texts = []
+    for bbox in boxes:
+        region_text = page.crop(bbox, strict=True).extract_text()
+        if region_text:
+            texts.append(region_text)
+
+    return "\n".join(texts)
@@ -0,0 +1,135 @@
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from invoice_frame import articles_from_slots
+from sheet_schema import ARTICLES, FACTURES_NORMALISEES, INVOICE_KEY, SheetSchema
+
+# Export Parquet des tables factures et articles à chaque génération du classeur
+# (PARQUET_EXPORT=0 pour le désactiver), dans PARQUET_DIR
+PARQUET_EXPORT_ENABLED = os.environ.get("PARQUET_EXPORT", "1") != "0"
+PARQUET_ROOT = Path(os.environ.get("PARQUET_DIR", "parquet"))
+
+# Colonne de partition : mois de la date de facture (AAAA-MM)
+MONTH_COLUMN = 'mois'
+UNKNOWN_MONTH = 'inconnu'
+
+# Type Arrow de chaque type de colonne du schéma (voir sheet_schema.KINDS)
+ARROW_TYPES = {
+    'text': pa.string(),
+    'amount': pa.float64(),
+    'quantity': pa.float64(),
+    'percent': pa.float64(),
+    'date': pa.date32(),
+}
+
+# Un export à la fois par processus (requêtes simultanées de l'API) : les
+# fichiers existants sont réécrits avant l'ajout des nouveaux
+_export_lock = threading.Lock()
+
+def arrow_schema(schema: SheetSchema) -> pa.Schema:
+    """Schéma Arrow d'une table : colonnes typées du schéma, puis le mois de partition"""
+    return pa.schema([pa.field(spec.name, ARROW_TYPES[spec.kind]) for spec in schema]
+                     + [pa.field(MONTH_COLUMN, pa.string())])
+
+def _arrow_column(values: pd.Series, kind: str) -> pa.Array:
+    """Colonne Arrow typée ; les cellules vides ('' ou NaN) deviennent nulles"""
+    if kind == 'text':
+        values = values.where(values != '', None)
+    array = pa.array(values, from_pandas=True)
+    return array.cast(ARROW_TYPES[kind])
+
+def to_arrow_table(df: pd.DataFrame, schema: SheetSchema, months) -> pa.Table:
+    """Table Arrow des colonnes du schéma présentes dans df, avec le mois de partition"""
+    columns = [_arrow_column(df[spec.name], spec.kind) for spec in schema]
+    columns.append(pa.array(np.asarray(months, dtype=object), type=pa.string()))
+    return pa.Table.from_arrays(columns, schema=arrow_schema(schema))
+
+def invoice_months(df: pd.DataFrame) -> pd.Series:
+    """Mois (AAAA-MM) de la date de chaque facture, UNKNOWN_MONTH si elle est absente"""
+    return df['Date facture'].dt.strftime('%Y-%m').fillna(UNKNOWN_MONTH)
+
+def drop_invoices(table_root: Path, keys: pa.Array) -> int:
+    """
+    Retire des fichiers d'une table les lignes des factures dont la clé
+    (INVOICE_KEY) est dans keys ; renvoie le nombre de lignes retirées.
+
+    Seule la colonne de clé de chaque fichier est lue ; un fichier n'est
+    réécrit (ou supprimé s'il ne garde aucune ligne) que s'il contient l'une
+    de ces factures.
+    """
+    removed = 0
+    for path in sorted(Path(table_root).glob('*/*.parquet')):
+        parquet_file = pq.ParquetFile(path)
+        # Fichier écrit avant l'ajout de la clé : rien à comparer
+        if INVOICE_KEY not in parquet_file.schema_arrow.names:
+            continue
+        mask = pc.is_in(parquet_file.read(columns=[INVOICE_KEY]).column(INVOICE_KEY), value_set=keys)
+        count = pc.sum(mask).as_py() or 0
+        if not count:
+            continue
+        removed += count
+        if count == parquet_file.metadata.num_rows:
+            path.unlink()
+            continue
+        # ParquetFile.read ne déduit pas la partition du chemin : le fichier réécrit garde son schéma
+        kept = parquet_file.read().filter(pc.invert(mask))
+        tmp_path = path.with_suffix('.tmp')
+        pq.write_table(kept, tmp_path)
+        os.replace(tmp_path, path)
+    return removed
+
+def export_parquet(df: pd.DataFrame, articles: Optional[pd.DataFrame] = None, run_id: Optional[str] = None,
+                   root: Optional[Path] = None) -> Path:
+    """
+    Écrit les tables factures et articles au format Parquet, partitionnées par mois.
+
+    Les tables sont construites à partir des mêmes DataFrame que le classeur
+    (voir create_invoice_excel.create_invoice_tables) : root/factures et
+    root/articles contiennent un dossier mois=AAAA-MM par mois de facture, et
+    chaque export y ajoute un fichier nommé d'après run_id. Les deux tables
+    portent la clé de la facture (INVOICE_KEY, nom du PDF et numéro de
+    facture) : les lignes déjà exportées d'une facture sont retirées avant
+    l'ajout (voir drop_invoices), si bien que relancer un export ou renvoyer
+    un PDF à l'API remplace ses factures sans les compter deux fois. Le dossier se lit
+    d'un bloc avec pandas.read_parquet ou DuckDB (read_parquet('.../*/*.parquet',
+    hive_partitioning = true)).
+
+    Args:
+        df (DataFrame): Feuille Factures (disposition large ou normalisée)
+        articles (DataFrame): Feuille Articles ; déduite des colonnes d'articles de df si None
+        run_id (str): Identifiant de l'export, préfixe des fichiers (date et heure et suffixe unique par défaut)
+        root (Path): Dossier de destination (PARQUET_ROOT par défaut)
+
+    Returns:
+        Path: Dossier de destination
+    """
+    root = Path(root or PARQUET_ROOT)
+    run_id = run_id or f"{datetime.now().strftime('%y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    if articles is None:
+        articles = articles_from_slots(df)
+
+    months = invoice_months(df)
+    # Mois de chaque article : celui de sa facture, par sa position dans df (index de la table des articles)
+    article_months = months.to_numpy(dtype=object)[articles.index.to_numpy(dtype=np.int64)]
+
+    invoices = to_arrow_table(df, FACTURES_NORMALISEES, months)
+    keys = pc.drop_null(pc.unique(invoices.column(INVOICE_KEY)))
+    with _export_lock:
+        for name, table in (
+            ('factures', invoices),
+            ('articles', to_arrow_table(articles, ARTICLES, article_months)),
+        ):
+            # Les factures exportées remplacent leurs versions précédentes, quel qu'en soit le mois
+            drop_invoices(root / name, keys)
+            pq.write_to_dataset(table, root / name, partition_cols=[MONTH_COLUMN],
+                                basename_template=f"{run_id}-{{i}}.parquet",
+                                existing_data_behavior='overwrite_or_ignore')
+    return root
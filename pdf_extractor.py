@@ -1,36 +1,377 @@
 import pdfplumber
+import pypdfium2 as pdfium
+import hashlib
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTTextContainer
+from disk_cache import CACHE_ROOT, DiskCache
+from layout_profiles import extract_page_regions
+from table_parser import page_words
 
-def extract_text_from_pdf(pdf_path):
+# Version de l'extraction : à incrémenter dès que le texte produit change,
+# pour invalider les entrées du cache calculées avec l'ancienne version
+EXTRACTOR_VERSION = "1"
+
+# Taille maximale du cache de texte extrait (en Mo)
+TEXT_CACHE_MAX_MB = int(os.environ.get("PDF_TEXT_CACHE_MAX_MB", "200"))
+# Nombre maximal de pages d'un PDF mis en cache : au-delà, les pages ne sont
+# pas conservées pendant l'extraction et la mémoire utilisée reste constante
+TEXT_CACHE_MAX_PAGES = int(os.environ.get("PDF_TEXT_CACHE_MAX_PAGES", "50"))
+
+# Taille des blocs lus pour calculer l'empreinte d'un PDF sans le charger entièrement
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Profil de mise en page par défaut ("auto", "meg", "internet", "acompte"),
+# vide pour extraire les pages entières
+DEFAULT_LAYOUT_PROFILE = os.environ.get("PDF_LAYOUT_PROFILE") or None
+
+# Moteurs d'extraction de texte disponibles :
+# - pdfplumber : mise en page caractère par caractère (référence, le plus lent)
+# - pypdfium2 : texte brut de PDFium, dans l'ordre du flux PDF (le plus rapide)
+# - pdfminer : analyse de mise en page pdfminer avec des LAParams adaptés aux factures
+TEXT_BACKENDS = ("pdfplumber", "pypdfium2", "pdfminer")
+DEFAULT_TEXT_BACKEND = os.environ.get("PDF_TEXT_BACKEND") or "pdfplumber"
+
+# char_margin élevé : les colonnes d'une même ligne du tableau restent sur une seule ligne ;
+# boxes_flow=None : pas de tri des blocs de texte, inutile pour des factures sur une colonne
+PDFMINER_LAPARAMS = LAParams(line_margin=0.3, char_margin=50.0, boxes_flow=None)
+
+_text_cache = None
+
+def get_text_cache():
+    """Retourne le cache disque partagé du texte extrait des PDF"""
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = DiskCache(CACHE_ROOT / "pdf_text", max_bytes=TEXT_CACHE_MAX_MB * 1024 * 1024)
+    return _text_cache
+
+def text_cache_key(pdf_source, profile=None, backend="pdfplumber", with_words=False):
+    """Clé de cache : SHA-256 du contenu du PDF, version de l'extracteur, moteur et profil de mise en page"""
+    key = f"{_source_digest(pdf_source)}-v{EXTRACTOR_VERSION}"
+    if backend != "pdfplumber":
+        key += f"-{backend}"
+    if profile:
+        key += f"-{getattr(profile, 'name', profile)}"
+    if with_words:
+        key += "-words"
+    return key
+
+def _check_backend(backend, profile, with_words=False):
+    """Vérifie la combinaison moteur / profil de mise en page / positions des mots"""
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"Moteur d'extraction inconnu: {backend} (attendu: {', '.join(TEXT_BACKENDS)})")
+    if profile and backend != "pdfplumber":
+        raise ValueError("Les profils de mise en page ne sont disponibles qu'avec le moteur pdfplumber")
+    if with_words and backend != "pdfplumber":
+        raise ValueError("Les positions des mots ne sont disponibles qu'avec le moteur pdfplumber")
+
+def _is_path(pdf_source):
+    """Indique si la source est un chemin de fichier (et non un PDF en mémoire)"""
+    return isinstance(pdf_source, (str, os.PathLike))
+
+def _read_pdf_bytes(pdf_source):
+    """Retourne le contenu d'une source PDF : chemin, bytes, memoryview ou objet fichier"""
+    if _is_path(pdf_source):
+        return Path(pdf_source).read_bytes()
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return bytes(pdf_source)
+    if isinstance(pdf_source, memoryview):
+        return pdf_source.tobytes()
+    if hasattr(pdf_source, 'read'):
+        if hasattr(pdf_source, 'seek'):
+            pdf_source.seek(0)
+        return pdf_source.read()
+    raise TypeError(f"Source PDF non supportée: {type(pdf_source).__name__}")
+
+def _is_seekable_file(pdf_source):
+    return hasattr(pdf_source, 'read') and hasattr(pdf_source, 'seek')
+
+def _source_digest(pdf_source):
+    """SHA-256 du contenu d'une source PDF ; fichiers et objets fichier lus par blocs"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf_source).hexdigest()
+    digest = hashlib.sha256()
+    if _is_path(pdf_source):
+        with open(pdf_source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    if _is_seekable_file(pdf_source):
+        pdf_source.seek(0)
+        for chunk in iter(lambda: pdf_source.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+        pdf_source.seek(0)
+        return digest.hexdigest()
+    return hashlib.sha256(_read_pdf_bytes(pdf_source)).hexdigest()
+
+def _open_pdf(pdf_source):
+    """Source passée au moteur d'extraction : chemin ou objet fichier ouvert tel quel, bytes enveloppés"""
+    if _is_path(pdf_source):
+        return str(pdf_source)
+    if _is_seekable_file(pdf_source):
+        pdf_source.seek(0)
+        return pdf_source
+    return io.BytesIO(_read_pdf_bytes(pdf_source))
+
+def _describe_source(pdf_source):
+    """Nom lisible d'une source PDF pour les messages d'erreur"""
+    if _is_path(pdf_source):
+        return str(pdf_source)
+    return getattr(pdf_source, 'name', None) or "<PDF en mémoire>"
+
+def _iter_pdfplumber_pages(pdf_file, profile=None, with_words=False):
+    """Génère le texte (et les mots) de chaque page avec pdfplumber en libérant la page après extraction"""
+    with pdfplumber.open(pdf_file) as pdf:
+        for page_index, page in enumerate(pdf.pages):
+            if profile:
+                page_text = extract_page_regions(page, profile)
+            else:
+                page_text = page.extract_text() or ""  # "" pour une page vide
+            # Les mots réutilisent les caractères déjà analysés pour le texte
+            words = page_words(page) if with_words else None
+            # Libérer les objets pdfminer et le layout de la page avant de passer à la suivante
+            page.close()
+            if with_words:
+                yield page_index, page_text, words
+            else:
+                yield page_index, page_text
+
+def _iter_pypdfium2_pages(pdf_file):
+    """Génère le texte brut de chaque page avec PDFium"""
+    pdf = pdfium.PdfDocument(pdf_file)
+    try:
+        for page_index in range(len(pdf)):
+            page = pdf[page_index]
+            textpage = page.get_textpage()
+            page_text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            yield page_index, page_text.replace("\r\n", "\n").replace("\r", "\n").strip()
+    finally:
+        pdf.close()
+
+def _iter_pdfminer_pages(pdf_file):
+    """Génère le texte de chaque page avec pdfminer et PDFMINER_LAPARAMS"""
+    for page_index, layout in enumerate(extract_pages(pdf_file, laparams=PDFMINER_LAPARAMS)):
+        page_text = "".join(
+            element.get_text() for element in layout if isinstance(element, LTTextContainer)
+        )
+        yield page_index, page_text.strip()
+
+def _iter_pdf_pages(pdf_file, profile=None, backend="pdfplumber", with_words=False):
+    """Génère le texte de chaque page avec le moteur demandé"""
+    if backend == "pypdfium2":
+        return _iter_pypdfium2_pages(pdf_file)
+    if backend == "pdfminer":
+        return _iter_pdfminer_pages(pdf_file)
+    return _iter_pdfplumber_pages(pdf_file, profile, with_words)
+
+def iter_pages(pdf_source, use_cache=True, profile=DEFAULT_LAYOUT_PROFILE, backend=DEFAULT_TEXT_BACKEND,
+               with_words=False):
+    """
+    Génère le texte d'un PDF page par page, sans garder les pages en mémoire.
+
+    Un fichier est ouvert directement par le moteur d'extraction, sans être
+    chargé en mémoire (son empreinte pour le cache est calculée par blocs) ;
+    les objets page de pdfplumber sont libérés au fur et à mesure. Les textes
+    produits ne sont conservés, pour le cache, que jusqu'à TEXT_CACHE_MAX_PAGES
+    pages : un PDF plus long n'est pas mis en cache. Le cache n'est alimenté
+    que si toutes les pages ont été lues.
+
+    Args:
+        pdf_source: Chemin vers le fichier PDF, ou contenu du PDF en mémoire
+            (bytes, memoryview ou objet fichier), lu sans fichier temporaire
+        use_cache (bool): Réutiliser le texte déjà extrait d'un PDF identique
+        profile (str): Profil de layout_profiles ("auto", "meg", "internet",
+            "acompte") pour n'extraire que les régions utiles de chaque page
+        backend (str): Moteur d'extraction parmi TEXT_BACKENDS
+        with_words (bool): Fournir aussi la position des mots de chaque page
+            (pour table_parser, moteur pdfplumber uniquement)
+
+    Yields:
+        tuple: (index de la page, texte de la page), ou (index, texte, mots)
+        avec with_words
+    """
+    _check_backend(backend, profile, with_words)
+
+    if not use_cache:
+        yield from _iter_pdf_pages(_open_pdf(pdf_source), profile, backend, with_words)
+        return
+
+    if not _is_path(pdf_source) and not _is_seekable_file(pdf_source):
+        # Contenu lu une seule fois, pour l'empreinte et pour l'extraction
+        pdf_source = _read_pdf_bytes(pdf_source)
+    cache = get_text_cache()
+    key = text_cache_key(pdf_source, profile, backend, with_words)
+
+    cached_pages = cache.get(key)
+    if cached_pages is not None:
+        for page_index, cached_page in enumerate(cached_pages):
+            # Avec with_words, chaque entrée est une paire [texte, mots]
+            yield (page_index, *cached_page) if with_words else (page_index, cached_page)
+        return
+
+    pages = []
+    for page in _iter_pdf_pages(_open_pdf(pdf_source), profile, backend, with_words):
+        if pages is not None:
+            pages.append(list(page[1:]) if with_words else page[1])
+            if len(pages) > TEXT_CACHE_MAX_PAGES:
+                # PDF trop long pour le cache : les pages ne sont plus conservées
+                pages = None
+        yield page
+
+    if pages:
+        cache.set(key, pages)
+
+def extract_text_from_pdf(pdf_source, use_cache=True, profile=DEFAULT_LAYOUT_PROFILE,
+                          backend=DEFAULT_TEXT_BACKEND):
     """
     Extrait le texte d'un fichier PDF, page par page.
 
     Args:
-        pdf_path (str): Chemin vers le fichier PDF
+        pdf_source: Chemin vers le fichier PDF, ou contenu du PDF en mémoire
+            (bytes, memoryview ou objet fichier)
+        use_cache (bool): Réutiliser le texte déjà extrait d'un PDF identique
+        profile (str): Profil de mise en page limitant l'extraction aux régions utiles
+        backend (str): Moteur d'extraction parmi TEXT_BACKENDS (pdfplumber par défaut)
 
     Returns:
         list: Liste de textes extraits, un par page
     """
+    _check_backend(backend, profile)
+
     try:
-        if not os.path.exists(pdf_path):
-            print(f"Le fichier {pdf_path} n'existe pas.")
+        if _is_path(pdf_source) and not os.path.exists(pdf_source):
+            print(f"Le fichier {pdf_source} n'existe pas.")
             return []
 
-        pages_text = []
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    pages_text.append(page_text)
-                else:
-                    pages_text.append("")  # Page vide
-
-        return pages_text
+        return [page_text for _, page_text in iter_pages(pdf_source, use_cache, profile, backend)]
     except Exception as e:
-        print(f"Erreur lors de l'extraction du texte du PDF {pdf_path}: {str(e)}")
+        print(f"Erreur lors de l'extraction du texte du PDF {_describe_source(pdf_source)}: {str(e)}")
         return []
 
+def _resolve_pool_size(nb_items, max_workers=None, chunksize=None):
+    """Calcule le nombre de workers et la taille des lots pour un traitement par lot"""
+    workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, nb_items))
+    if not chunksize:
+        # Quelques lots par worker pour équilibrer la charge sans multiplier les allers-retours
+        chunksize = max(1, nb_items // (workers * 4))
+    return workers, chunksize
+
+def imap_pdfs(func, pdf_sources, max_workers=None, chunksize=None, executor=None):
+    """
+    Applique une fonction à chaque PDF dans un pool de processus, en générant
+    chaque résultat dès qu'il est disponible.
+
+    Args:
+        func: Fonction de niveau module (picklable) appelée avec chaque source
+        pdf_sources (iterable): Sources PDF à traiter
+        max_workers (int): Nombre de processus (par défaut: nombre de cœurs)
+        chunksize (int): Nombre de PDF envoyés à un worker en une fois
+        executor: Pool existant à utiliser (par exemple celui d'un serveur) ; un
+            pool de max_workers processus est créé pour l'appel sinon
+
+    Yields:
+        Résultats dans le même ordre que pdf_sources
+    """
+    sources = list(pdf_sources)
+    if not sources:
+        return
+
+    workers, chunksize = _resolve_pool_size(len(sources), max_workers, chunksize)
+    if executor is not None:
+        yield from executor.map(func, sources, chunksize=chunksize)
+        return
+    if workers == 1:
+        # Pas de pool pour un seul fichier : on évite le coût de démarrage des processus
+        for source in sources:
+            yield func(source)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map conserve l'ordre d'entrée, quel que soit l'ordre de fin des workers
+        yield from executor.map(func, sources, chunksize=chunksize)
+
+def map_pdfs(func, pdf_sources, max_workers=None, chunksize=None, executor=None):
+    """
+    Applique une fonction à chaque PDF dans un pool de processus.
+
+    Args:
+        func: Fonction de niveau module (picklable) appelée avec chaque source
+        pdf_sources (iterable): Sources PDF à traiter
+        max_workers (int): Nombre de processus (par défaut: nombre de cœurs)
+        chunksize (int): Nombre de PDF envoyés à un worker en une fois
+        executor: Pool existant à utiliser (voir imap_pdfs)
+
+    Returns:
+        list: Résultats dans le même ordre que pdf_sources
+    """
+    return list(imap_pdfs(func, pdf_sources, max_workers, chunksize, executor))
+
+def extract_texts_from_pdfs(pdf_sources, max_workers=None, chunksize=None, use_cache=True,
+                            profile=DEFAULT_LAYOUT_PROFILE, backend=DEFAULT_TEXT_BACKEND, executor=None):
+    """
+    Extrait le texte de plusieurs PDF en parallèle.
+
+    Args:
+        pdf_sources (iterable): Chemins vers les fichiers PDF, ou contenus des
+            PDF en mémoire (bytes, memoryview ou objets fichier)
+        max_workers (int): Nombre de processus (par défaut: nombre de cœurs)
+        chunksize (int): Nombre de PDF envoyés à un worker en une fois
+        use_cache (bool): Réutiliser le texte déjà extrait des PDF identiques
+        profile (str): Profil de mise en page limitant l'extraction aux régions utiles
+        backend (str): Moteur d'extraction parmi TEXT_BACKENDS (pdfplumber par défaut)
+        executor: Pool existant à utiliser plutôt qu'un pool créé pour l'appel
+
+    Returns:
+        list: Pour chaque PDF (dans l'ordre d'entrée), la liste des textes par page
+    """
+    _check_backend(backend, profile)
+    extract = partial(extract_text_from_pdf, use_cache=False, profile=profile, backend=backend)
+
+    # Les workers reçoivent des chemins ou des bytes (les objets fichier ne sont pas picklables)
+    pdf_sources = [
+        str(source) if _is_path(source) else _read_pdf_bytes(source)
+        for source in pdf_sources
+    ]
+    if not use_cache:
+        return map_pdfs(extract, pdf_sources, max_workers, chunksize, executor)
+
+    # Les consultations du cache se font dans le processus principal pour que
+    # les compteurs hits/misses reflètent tout le lot ; seuls les PDF absents
+    # du cache sont envoyés aux workers
+    cache = get_text_cache()
+    results = [None] * len(pdf_sources)
+    keys = {}
+    to_extract = []
+    for index, pdf_source in enumerate(pdf_sources):
+        try:
+            key = text_cache_key(pdf_source, profile, backend)
+        except OSError:
+            # Le worker signalera l'erreur de lecture
+            to_extract.append(index)
+            continue
+
+        pages_text = cache.get(key)
+        if pages_text is not None:
+            results[index] = pages_text
+        else:
+            keys[index] = key
+            to_extract.append(index)
+
+    extracted = map_pdfs(extract, [pdf_sources[index] for index in to_extract], max_workers, chunksize, executor)
+    for index, pages_text in zip(to_extract, extracted):
+        results[index] = pages_text
+        if pages_text and index in keys and len(pages_text) <= TEXT_CACHE_MAX_PAGES:
+            cache.set(keys[index], pages_text)
+
+    return results
+
 def main():
     """Fonction principale pour tester l'extraction de texte"""
     pdf_folder = Path("data_factures/facturesv3")
@@ -39,9 +380,9 @@ def main():
         print(f"Le dossier {pdf_folder} n'existe pas.")
         return
 
-    for pdf_path in pdf_folder.glob("*.pdf"):
+    pdf_paths = sorted(pdf_folder.glob("*.pdf"))
+    for pdf_path, pages_text in zip(pdf_paths, extract_texts_from_pdfs(pdf_paths)):
         print(f"Traitement de {pdf_path.name}...")
-        pages_text = extract_text_from_pdf(str(pdf_path))
         if pages_text:
             print(f"Texte extrait avec succès ({len(pages_text)} pages)")
             for i, text in enumerate(pages_text):
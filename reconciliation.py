@@ -0,0 +1,189 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from article_batch import TRANSPORT_REFERENCE
+from invoice_frame import articles_from_slots
+from sheet_schema import ANOMALIES, ANOMALY_ROW
+
+# Rapprochement des montants à chaque génération du classeur (RECONCILIATION=0 pour le désactiver)
+RECONCILIATION_ENABLED = os.environ.get("RECONCILIATION", "1") != "0"
+
+# Écart toléré (en euros) entre deux montants qui devraient être égaux
+TOLERANCE = float(os.environ.get("RECONCILIATION_TOLERANCE", "0.02"))
+# Écart d'arrondi admis en plus par ligne d'article (chaque ligne est arrondie au centime)
+LINE_TOLERANCE = 0.01
+
+# Taux de TVA applicables (normal, intermédiaire, réduit, particulier, exonéré)
+VAT_RATES = np.array([0.20, 0.10, 0.055, 0.021, 0.0])
+
+# Attribut du DataFrame des factures : lignes dont un montant (Credit TTC, Credit HT,
+# TVA Collectee) a été calculé faute d'être extrait (voir create_invoice_excel.build_invoice_frames)
+COMPUTED_AMOUNTS = 'montants_calculés'
+
+# Contrôles, dans l'ordre de la feuille Anomalies
+CHECK_MISSING = 'total TTC manquant'
+CHECK_COMPUTED = 'montant calculé'
+CHECK_TOTALS = 'HT + TVA = TTC'
+CHECK_ARTICLES = 'Σ articles HT = total HT'
+CHECK_RATE = 'taux de TVA facture'
+CHECK_ARTICLE_RATE = 'taux de TVA article'
+CHECKS = (CHECK_MISSING, CHECK_COMPUTED, CHECK_TOTALS, CHECK_ARTICLES, CHECK_RATE, CHECK_ARTICLE_RATE)
+
+def _amounts(frame: pd.DataFrame, column: str) -> np.ndarray:
+    return frame[column].fillna(0).to_numpy(dtype='float64')
+
+def _computed(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Masque des factures dont le montant de la colonne a été calculé (df.attrs[COMPUTED_AMOUNTS])"""
+    mask = np.zeros(len(df), dtype=bool)
+    mask[np.asarray(df.attrs.get(COMPUTED_AMOUNTS, {}).get(column, []), dtype=np.int64)] = True
+    return mask
+
+def _anomalies(df: pd.DataFrame, rows: np.ndarray, check: str, attendu, constate, details=None) -> pd.DataFrame:
+    """Lignes de la feuille Anomalies pour les factures rows de df, du plus grand au plus petit écart"""
+    ecart = np.round(np.asarray(constate, dtype='float64') - np.asarray(attendu, dtype='float64'), 2)
+    values = {
+        ANOMALY_ROW: np.asarray(rows, dtype=np.int64) + 1,
+        'N° Syst.': df['N° Syst.'].to_numpy(dtype=object)[rows],
+        'Client': df['Client'].to_numpy(dtype=object)[rows],
+        'Date facture': df['Date facture'].to_numpy()[rows],
+        'contrôle': np.full(len(rows), check, dtype=object),
+        'attendu': np.round(attendu, 2),
+        'constaté': np.round(constate, 2),
+        'écart': ecart,
+        'détail': np.asarray(details if details is not None else [''] * len(rows), dtype=object),
+    }
+    order = np.argsort(-np.abs(ecart), kind='stable')
+    return pd.DataFrame({spec.name: np.asarray(values[spec.name], dtype=spec.dtype)[order] for spec in ANOMALIES},
+                        columns=ANOMALIES.headers)
+
+def reconcile(df: pd.DataFrame, articles: Optional[pd.DataFrame] = None,
+              tolerance: float = TOLERANCE) -> pd.DataFrame:
+    """
+    Rapproche les montants de toutes les factures du lot et renvoie leurs anomalies.
+
+    Les contrôles portent sur les colonnes de la feuille Factures (Credit HT,
+    TVA Collectee, Credit TTC, remise) et sur les articles, calculés par
+    opérations vectorielles sur tout le lot :
+    - total TTC manquant alors que la facture a des montants ou des articles
+    - montant calculé : Credit TTC, Credit HT ou TVA Collectee complété par
+      fill_invoice_row faute d'avoir été extrait (df.attrs[COMPUTED_AMOUNTS]) ;
+      les contrôles suivants ne portent que sur les montants extraits
+    - HT + TVA = TTC (HT avant ou après remise)
+    - somme des HT des articles = total HT (avec ou sans la ligne de transport,
+      avant ou après remise), à une tolérance près par ligne d'article
+    - TVA de la facture entre 0 et le taux normal (20 %) du HT
+    - TVA de chaque article proche d'un taux applicable (VAT_RATES) ; une
+      anomalie par facture, pour l'article le plus éloigné
+
+    Les articles sont rattachés à leur facture par l'index de leur table
+    (position de la facture dans df, voir sheet_schema.ARTICLE_INVOICE_INDEX),
+    et non par le N° Syst., qui peut être vide ou partagé par deux factures.
+
+    Args:
+        df (DataFrame): Feuille Factures (disposition large ou normalisée)
+        articles (DataFrame): Feuille Articles indexée par facture ; déduite des colonnes d'articles de df si None
+        tolerance (float): Écart toléré en euros
+
+    Returns:
+        DataFrame: Feuille Anomalies (schéma sheet_schema.ANOMALIES), une ligne par anomalie,
+            la facture étant repérée par son rang dans df (ANOMALY_ROW, à partir de 1)
+    """
+    if articles is None:
+        articles = articles_from_slots(df)
+    tolerance += 1e-9  # Montants au centime : l'écart égal à la tolérance est admis
+
+    ht, tva, ttc, remise = (_amounts(df, column) for column in ('Credit HT', 'TVA Collectee', 'Credit TTC', 'remise'))
+    computed_ht, computed_tva, computed_ttc = (_computed(df, column)
+                                               for column in ('Credit HT', 'TVA Collectee', 'Credit TTC'))
+
+    # Sommes des articles par facture (marchandises : sans la ligne de transport)
+    line_rows = articles.index.to_numpy(dtype=np.int64)
+    line_ht, line_tva = _amounts(articles, 'ht'), _amounts(articles, 'tva€')
+    transport = articles['ref'].to_numpy(dtype=object) == TRANSPORT_REFERENCE
+    marchandises = np.bincount(line_rows, weights=np.where(transport, 0.0, line_ht), minlength=len(df))
+    transport_ht = np.bincount(line_rows, weights=np.where(transport, line_ht, 0.0), minlength=len(df))
+    nb_lines = np.bincount(line_rows, minlength=len(df))
+
+    pieces = []
+
+    # Total TTC manquant
+    rows = np.flatnonzero((ttc == 0) & ((ht != 0) | (tva != 0) | (nb_lines > 0)))
+    pieces.append(_anomalies(df, rows, CHECK_MISSING, ht[rows] + tva[rows], ttc[rows]))
+
+    # Montants calculés : valeur retenue dans la feuille, aucun montant extrait
+    for column, computed in (('Credit TTC', computed_ttc), ('Credit HT', computed_ht), ('TVA Collectee', computed_tva)):
+        rows = np.flatnonzero(computed)
+        values = _amounts(df, column)[rows]
+        pieces.append(_anomalies(df, rows, CHECK_COMPUTED, values, np.zeros(len(rows)),
+                                 [f"{column} non extrait, calculé : {value:.2f} €" for value in values]))
+
+    # HT + TVA = TTC, le HT pouvant être avant ou après remise
+    expected = np.stack([ht + tva, ht - remise + tva])
+    closest = expected[np.abs(expected - ttc).argmin(axis=0), np.arange(len(df))]
+    extracted = ~(computed_ht | computed_tva | computed_ttc)
+    rows = np.flatnonzero(extracted & (ttc != 0) & (np.abs(np.round(ttc - closest, 2)) > tolerance))
+    pieces.append(_anomalies(df, rows, CHECK_TOTALS, closest[rows], ttc[rows]))
+
+    # Somme des articles = total HT : avec ou sans transport, avant ou après remise
+    expected = np.stack([marchandises + transport_ht, marchandises, marchandises + transport_ht - remise,
+                         marchandises - remise])
+    closest = expected[np.abs(expected - ht).argmin(axis=0), np.arange(len(df))]
+    rows = np.flatnonzero(~computed_ht & (nb_lines > 0)
+                          & (np.abs(np.round(ht - closest, 2)) > tolerance + LINE_TOLERANCE * nb_lines))
+    details = [f"{lines:.0f} ligne(s) : marchandises {goods:.2f} €, transport {shipping:.2f} €, remise {discount:.2f} €"
+               for lines, goods, shipping, discount
+               in zip(nb_lines[rows], marchandises[rows], transport_ht[rows], remise[rows])]
+    pieces.append(_anomalies(df, rows, CHECK_ARTICLES, closest[rows], ht[rows], details))
+
+    # TVA de la facture entre 0 et le taux normal du HT
+    maximum = ht * VAT_RATES.max()
+    rows = np.flatnonzero(~(computed_ht | computed_tva) & (ht > 0) & ((tva - maximum > tolerance) | (tva < -tolerance)))
+    details = [f"taux {rate:.2%}" for rate in tva[rows] / ht[rows]]
+    pieces.append(_anomalies(df, rows, CHECK_RATE, np.clip(tva[rows], 0, maximum[rows]), tva[rows], details))
+
+    # TVA de chaque article : écart au taux applicable le plus proche
+    expected = line_ht[:, None] * VAT_RATES
+    closest = expected[np.arange(len(articles)), np.abs(line_tva[:, None] - expected).argmin(axis=1)]
+    gap = np.round(line_tva - closest, 2)
+    bad = np.flatnonzero((line_ht != 0) & (np.abs(gap) > tolerance))
+    if bad.size:
+        lines = pd.DataFrame({'row': line_rows[bad], 'ref': articles['ref'].to_numpy(dtype=object)[bad],
+                              'ht': line_ht[bad], 'tva': line_tva[bad], 'attendu': closest[bad],
+                              'gap': np.abs(gap[bad])})
+        counts = np.bincount(lines['row'], minlength=len(df))
+        worst = lines.sort_values('gap', ascending=False, kind='stable').drop_duplicates('row')
+        details = [f"{counts[row]} article(s), dont {ref} : TVA {tva_line / ht_line:.2%} du HT"
+                   for row, ref, tva_line, ht_line in worst[['row', 'ref', 'tva', 'ht']].itertuples(index=False)]
+        pieces.append(_anomalies(df, worst['row'].to_numpy(), CHECK_ARTICLE_RATE,
+                                 worst['attendu'].to_numpy(), worst['tva'].to_numpy(), details))
+
+    return pd.concat(pieces, ignore_index=True)
+
+def reconciliation_report(anomalies: pd.DataFrame, nb_invoices: int, tolerance: float = TOLERANCE) -> Dict:
+    """Rapport du rapprochement : nombre d'anomalies par contrôle et détail de chacune"""
+    counts = anomalies['contrôle'].value_counts()
+    records = anomalies.assign(**{'Date facture': anomalies['Date facture'].dt.strftime('%Y-%m-%d').fillna('')})
+    return {
+        'factures': nb_invoices,
+        # Factures repérées par leur rang : le N° Syst. peut être vide ou partagé
+        'factures_en_anomalie': int(anomalies[ANOMALY_ROW].nunique()),
+        'anomalies': len(anomalies),
+        'tolérance': tolerance,
+        'contrôles': {check: int(counts.get(check, 0)) for check in CHECKS},
+        'détail': records.to_dict('records'),
+    }
+
+def report_path(excel_path) -> Path:
+    """Chemin du rapport JSON d'un classeur (factures_auto_X.xlsx -> factures_auto_X_anomalies.json)"""
+    excel_path = Path(excel_path)
+    return excel_path.with_name(f"{excel_path.stem}_anomalies.json")
+
+def write_reconciliation_report(anomalies: pd.DataFrame, path, nb_invoices: int) -> Path:
+    """Écrit le rapport JSON du rapprochement ; renvoie son chemin"""
+    path = Path(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(reconciliation_report(anomalies, nb_invoices), f, ensure_ascii=False, indent=2)
+    return path
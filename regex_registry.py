@@ -0,0 +1,255 @@
+import hashlib
+import os
+import time
+from typing import Dict, Iterable, List
+import regex
+
+# Temps maximal (en secondes) d'un appel à un motif, modifiable par motif
+TIME_BUDGET = float(os.environ.get("REGEX_TIME_BUDGET", "1.0"))
+
+# Nombre de dépassements consécutifs après lequel un motif ayant une version
+# de secours n'est plus exécuté : la version de secours est utilisée directement
+# pendant TRIP_SECONDS secondes, puis le motif principal est de nouveau essayé
+TRIP_AFTER = 3
+TRIP_SECONDS = float(os.environ.get("REGEX_TRIP_SECONDS", "60"))
+
+class Pattern:
+    """
+    Expression régulière compilée, nommée et versionnée, avec ses statistiques.
+
+    Expose les méthodes usuelles de re.Pattern (search, match, finditer,
+    findall, sub) et compte pour chacune le nombre d'appels, le nombre
+    d'appels ayant trouvé au moins une correspondance et le temps cumulé.
+    search, match et finditer acceptent les bornes pos/endpos de re.Pattern
+    pour ne parcourir qu'une section du texte sans la copier.
+
+    Le motif est exécuté par le module regex (même syntaxe que re), qui
+    interrompt un appel dépassant le budget de temps. Le dépassement est
+    signalé et l'appel est rejoué avec le motif de secours (fallback), une
+    variante sans retour arrière coûteux ; sans motif de secours, l'appel ne
+    trouve rien. Après TRIP_AFTER dépassements consécutifs, un motif ayant
+    une version de secours n'est plus exécuté pendant TRIP_SECONDS secondes
+    (ou jusqu'au prochain reset_stats()) ; un motif sans version de secours
+    est toujours exécuté. Les appels dont le résultat ne vient pas du motif
+    principal (dépassement ou motif désactivé) sont comptés dans degraded.
+    """
+
+    __slots__ = ('name', 'version', 'flags', 'regex', 'fallback', 'budget',
+                 'calls', 'hits', 'total_time', 'timeouts', 'degraded', 'strikes', 'tripped_until')
+
+    def __init__(self, name, pattern, flags=0, version=1, fallback=None, budget=None):
+        self.name = name
+        self.version = version
+        self.flags = int(flags)
+        self.regex = regex.compile(pattern, self.flags)
+        self.fallback = regex.compile(fallback, self.flags) if fallback else None
+        self.budget = TIME_BUDGET if budget is None else budget
+        self.calls = 0
+        self.hits = 0
+        self.total_time = 0.0
+        self.timeouts = 0
+        self.degraded = 0
+        self.strikes = 0
+        self.tripped_until = 0.0
+
+    @property
+    def pattern(self):
+        return self.regex.pattern
+
+    @property
+    def tripped(self):
+        """Motif principal momentanément remplacé par sa version de secours"""
+        return time.monotonic() < self.tripped_until
+
+    def _record(self, start, found):
+        self.total_time += time.perf_counter() - start
+        self.calls += 1
+        if found:
+            self.hits += 1
+
+    def _run(self, call, text, empty=None):
+        """
+        Exécute call(motif compilé) dans le budget de temps avec le motif
+        principal, ou avec le motif de secours en cas de dépassement
+        """
+        if not self.tripped:
+            try:
+                result = call(self.regex)
+                self.strikes = 0
+                return result
+            except TimeoutError:
+                self.timeouts += 1
+                self.strikes += 1
+                tripped = self.fallback is not None and self.strikes >= TRIP_AFTER
+                if tripped:
+                    self.strikes = 0
+                    self.tripped_until = time.monotonic() + TRIP_SECONDS
+                print(f"⚠️ Motif '{self.name}' interrompu après {self.budget}s sur un texte de "
+                      f"{len(text)} caractères{f' (désactivé {TRIP_SECONDS:g}s)' if tripped else ''}"
+                      f"{', motif de secours utilisé' if self.fallback else ''}")
+        self.degraded += 1
+        if self.fallback is None:
+            return empty
+        try:
+            return call(self.fallback)
+        except TimeoutError:
+            print(f"⚠️ Motif de secours de '{self.name}' interrompu après {self.budget}s")
+            return empty
+
+    def search(self, text, pos=0, endpos=None):
+        start = time.perf_counter()
+        endpos = len(text) if endpos is None else endpos
+        match = self._run(lambda compiled: compiled.search(text, pos, endpos, timeout=self.budget), text)
+        self._record(start, match is not None)
+        return match
+
+    def match(self, text, pos=0, endpos=None):
+        start = time.perf_counter()
+        endpos = len(text) if endpos is None else endpos
+        match = self._run(lambda compiled: compiled.match(text, pos, endpos, timeout=self.budget), text)
+        self._record(start, match is not None)
+        return match
+
+    def finditer(self, text, pos=0, endpos=None):
+        # Les correspondances sont collectées d'un coup pour que le temps mesuré
+        # soit celui de la recherche et non celui du traitement de l'appelant
+        start = time.perf_counter()
+        endpos = len(text) if endpos is None else endpos
+        matches = self._run(
+            lambda compiled: list(compiled.finditer(text, pos, endpos, timeout=self.budget)), text, empty=[]
+        )
+        self._record(start, bool(matches))
+        return iter(matches)
+
+    def findall(self, text):
+        start = time.perf_counter()
+        matches = self._run(lambda compiled: compiled.findall(text, timeout=self.budget), text, empty=[])
+        self._record(start, bool(matches))
+        return matches
+
+    def sub(self, repl, text, count=0):
+        start = time.perf_counter()
+        result, nb_subs = self._run(
+            lambda compiled: compiled.subn(repl, text, count, timeout=self.budget), text, empty=(text, 0)
+        )
+        self._record(start, nb_subs > 0)
+        return result
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'pattern': self.pattern,
+            'calls': self.calls,
+            'hits': self.hits,
+            'timeouts': self.timeouts,
+            'total_ms': self.total_time * 1000
+        }
+
+    def __repr__(self):
+        return f"Pattern({self.name!r}, v{self.version}, {self.pattern!r})"
+
+class PatternRegistry:
+    """
+    Registre central des expressions régulières des extracteurs.
+
+    Chaque motif est compilé une seule fois, à l'import du module qui
+    l'enregistre. Un même nom peut être enregistré par plusieurs modules s'il
+    désigne le même motif : l'entrée (et ses statistiques) est alors partagée.
+    """
+
+    def __init__(self):
+        self._patterns: Dict[str, Pattern] = {}
+
+    def register(self, name, pattern, flags=0, version=1, fallback=None, budget=None) -> Pattern:
+        """
+        Compile et enregistre un motif, ou retourne l'entrée existante du même nom
+
+        fallback : variante du motif en temps linéaire, utilisée si le motif
+        dépasse son budget de temps (budget, en secondes, TIME_BUDGET par défaut)
+        """
+        existing = self._patterns.get(name)
+        if existing is not None:
+            if (existing.pattern, existing.flags, existing.version) != (pattern, int(flags), version):
+                raise ValueError(f"Motif '{name}' déjà enregistré avec une autre définition: {existing!r}")
+            return existing
+        entry = Pattern(name, pattern, flags, version, fallback, budget)
+        self._patterns[name] = entry
+        return entry
+
+    def __getitem__(self, name) -> Pattern:
+        return self._patterns[name]
+
+    def __contains__(self, name):
+        return name in self._patterns
+
+    def __iter__(self):
+        return iter(self._patterns.values())
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def fingerprint(self, prefixes: Iterable[str] = ()) -> str:
+        """
+        Empreinte des définitions (nom, motif, options, version, secours) des
+        motifs dont le nom commence par l'un des préfixes (tous si aucun)
+
+        Modifier un motif change l'empreinte, sans incrémenter sa version.
+        """
+        prefixes = tuple(prefixes)
+        digest = hashlib.sha256()
+        for name in sorted(self._patterns):
+            if prefixes and not name.startswith(prefixes):
+                continue
+            entry = self._patterns[name]
+            fallback = entry.fallback.pattern if entry.fallback is not None else ''
+            digest.update(f"{name}\0{entry.pattern}\0{entry.flags}\0{entry.version}\0{fallback}\n".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def stats(self) -> List[Dict]:
+        """Statistiques de chaque motif, du plus coûteux au moins coûteux"""
+        return sorted((entry.stats() for entry in self), key=lambda stat: stat['total_ms'], reverse=True)
+
+    def timed_out(self) -> List[str]:
+        """Noms des motifs ayant dépassé leur budget de temps au moins une fois"""
+        return [entry.name for entry in self if entry.timeouts]
+
+    def timeout_count(self) -> int:
+        """Nombre total de dépassements de budget, tous motifs confondus"""
+        return sum(entry.timeouts for entry in self)
+
+    def degraded_count(self) -> int:
+        """Nombre total d'appels résolus sans le motif principal (dépassement ou motif désactivé)"""
+        return sum(entry.degraded for entry in self)
+
+    def never_matched(self) -> List[str]:
+        """Noms des motifs appelés au moins une fois sans jamais correspondre"""
+        return [entry.name for entry in self if entry.calls and not entry.hits]
+
+    def reset_stats(self):
+        """Remet à zéro les compteurs de tous les motifs"""
+        for entry in self:
+            entry.calls = 0
+            entry.hits = 0
+            entry.total_time = 0.0
+            entry.timeouts = 0
+            entry.degraded = 0
+            entry.strikes = 0
+            entry.tripped_until = 0.0
+
+    def report(self, limit=None) -> str:
+        """Tableau texte des motifs triés par temps cumulé"""
+        lines = [f"{'motif':<45}{'v':>3}{'appels':>9}{'trouvés':>9}{'délais':>8}{'ms':>10}"]
+        for stat in self.stats()[:limit]:
+            lines.append(
+                f"{stat['name']:<45}{stat['version']:>3}{stat['calls']:>9}{stat['hits']:>9}"
+                f"{stat['timeouts']:>8}{stat['total_ms']:>10.2f}"
+            )
+        return "\n".join(lines)
+
+# Registre partagé par tous les extracteurs
+REGISTRY = PatternRegistry()
+
+def register(name, pattern, flags=0, version=1, fallback=None, budget=None) -> Pattern:
+    """Enregistre un motif dans le registre partagé"""
+    return REGISTRY.register(name, pattern, flags, version, fallback, budget)
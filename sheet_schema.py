@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+
+# Types de colonnes : type pandas (dtype), valeur d'une cellule vide et format Excel
+KINDS = {
+    'text': ('object', '', None),
+    'amount': ('float64', np.nan, '#,##0.00 "€"'),
+    'quantity': ('float64', np.nan, None),
+    'percent': ('float64', np.nan, '0.00%'),
+    'date': ('datetime64[ns]', np.datetime64('NaT', 'ns'), 'dd/mm/yyyy'),
+}
+
+# Format des dates écrites par pandas (qui applique son propre format aux cellules de date)
+DATE_FORMAT = KINDS['date'][2]
+
+# Format de la ligne d'en-tête des feuilles
+HEADER_FORMAT = {
+    'bold': True,
+    'text_wrap': True,
+    'valign': 'top',
+    'bg_color': '#D9E1F2',
+    'border': 1
+}
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    """Colonne d'une feuille : nom, type (clé de KINDS) et format Excel"""
+    name: str
+    kind: str = 'text'
+
+    @property
+    def dtype(self) -> str:
+        return KINDS[self.kind][0]
+
+    @property
+    def empty(self):
+        return KINDS[self.kind][1]
+
+    @property
+    def num_format(self) -> Optional[str]:
+        return KINDS[self.kind][2]
+
+class SheetSchema:
+    """
+    Registre des colonnes d'une feuille, dans l'ordre du classeur.
+
+    Le DataFrame garde le type de chaque colonne (float64 pour les montants,
+    datetime64 pour les dates) et format_excel applique le format Excel
+    déclaré : les cellules sont des nombres et des dates natifs, que les
+    comptables peuvent additionner sans conversion.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._columns: Dict[str, ColumnSpec] = {}
+
+    def register(self, name: str, kind: str = 'text') -> ColumnSpec:
+        if kind not in KINDS:
+            raise ValueError(f"Type de colonne inconnu: {kind} (attendu: {', '.join(KINDS)})")
+        spec = self._columns[name] = ColumnSpec(name, kind)
+        return spec
+
+    def __getitem__(self, name) -> ColumnSpec:
+        return self._columns[name]
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    def __iter__(self) -> Iterator[ColumnSpec]:
+        return iter(self._columns.values())
+
+    def __len__(self):
+        return len(self._columns)
+
+    @property
+    def headers(self) -> List[str]:
+        return list(self._columns)
+
+    def empty_column(self, name: str, size: int) -> np.ndarray:
+        """Colonne de size cellules vides, du type déclaré"""
+        spec = self._columns[name]
+        return np.full(size, spec.empty, dtype=spec.dtype)
+
+    def excel_formats(self, workbook, columns) -> Dict[int, object]:
+        """Formats xlsxwriter (index de colonne -> format) des colonnes données"""
+        cache = {}
+        formats = {}
+        for idx, column in enumerate(columns):
+            num_format = self._columns[column].num_format if column in self._columns else None
+            if num_format:
+                if num_format not in cache:
+                    cache[num_format] = workbook.add_format({'num_format': num_format})
+                formats[idx] = cache[num_format]
+        return formats
+
+def to_excel_date(iso_date: str):
+    """Date YYYY-MM-DD en datetime64 (NaT si vide ou invalide)"""
+    try:
+        return np.datetime64(iso_date, 'ns') if iso_date else KINDS['date'][1]
+    except ValueError:
+        return KINDS['date'][1]
+
+# Colonnes de chaque article (suffixées par le numéro de l'article, de 1 à MAX_ARTICLES)
+MAX_ARTICLES = 20
+ARTICLE_COLUMNS = (
+    ('supfam', 'text'), ('fam', 'text'), ('ref', 'text'), ('q', 'quantity'),
+    ('prix', 'amount'), ('r€', 'amount'), ('ht', 'amount'), ('tva€', 'amount'),
+)
+
+# Colonnes de la facture, avant celles des articles
+INVOICE_COLUMNS = (
+    ('Type-facture', 'text'), ('n°ordre', 'text'), ('saisie', 'text'), ('Syst', 'text'),
+    ('N° Syst.', 'text'), ('comptable', 'text'), ('Type_facture', 'text'),
+    ('Type_Vente', 'text'), ('Réseau_Vente', 'text'), ('Client', 'text'), ('Typologie', 'text'),
+    ('Banque créditée', 'text'), ('Date commande', 'date'), ('Date facture', 'date'),
+    ('Date expédition', 'date'), ('Commentaire', 'text'),
+    ('date1', 'date'), ('acompte1', 'amount'), ('date2', 'date'), ('acompte2', 'amount'),
+    ('Date solde', 'date'), ('solde', 'amount'), ('contrôle paiement', 'text'), ('reste dû', 'amount'),
+    ('AVO', 'text'), ('tva', 'percent'), ('ttc', 'amount'), ('Credit TTC', 'amount'),
+    ('Credit HT', 'amount'), ('remise', 'amount'), ('TVA Collectee', 'amount'), ('quantité', 'quantity'),
+)
+
+# Feuille "Factures" du classeur Nomads (une ligne par facture, MAX_ARTICLES articles au plus)
+FACTURES = SheetSchema('Factures')
+for _name, _kind in INVOICE_COLUMNS:
+    FACTURES.register(_name, _kind)
+for _i in range(1, MAX_ARTICLES + 1):
+    for _field, _kind in ARTICLE_COLUMNS:
+        FACTURES.register(f'{_field}{_i}', _kind)
+
+# Clé de la facture dans factures.json (nom du PDF et numéro de facture) : unique
+# dans un classeur, contrairement au N° Syst., qui peut être vide ou partagé
+INVOICE_KEY = 'Clé facture'
+
+# Disposition normalisée : feuille "Factures" sans colonnes d'article et feuille
+# "Articles" (une ligne par article, sans limite), reliées par la clé de la facture
+FACTURES_NORMALISEES = SheetSchema('Factures')
+FACTURES_NORMALISEES.register(INVOICE_KEY, 'text')
+for _name, _kind in INVOICE_COLUMNS:
+    FACTURES_NORMALISEES.register(_name, _kind)
+
+ARTICLES = SheetSchema('Articles')
+ARTICLES.register(INVOICE_KEY, 'text')
+ARTICLES.register('N° Syst.', 'text')
+ARTICLES.register('ligne', 'quantity')
+for _field, _kind in ARTICLE_COLUMNS:
+    ARTICLES.register(_field, _kind)
+# Index des tables d'articles (non exporté) : position de la facture de chaque
+# article dans la feuille Factures, le N° Syst. pouvant être vide ou partagé
+ARTICLE_INVOICE_INDEX = 'facture'
+
+# Feuille "Anomalies" : écarts relevés par le rapprochement des montants (voir reconciliation),
+# la facture étant repérée par son rang dans la feuille Factures (à partir de 1)
+ANOMALY_ROW = 'ligne facture'
+ANOMALIES = SheetSchema('Anomalies')
+for _name, _kind in (
+    (ANOMALY_ROW, 'quantity'), ('N° Syst.', 'text'), ('Client', 'text'), ('Date facture', 'date'), ('contrôle', 'text'),
+    ('attendu', 'amount'), ('constaté', 'amount'), ('écart', 'amount'), ('détail', 'text'),
+):
+    ANOMALIES.register(_name, _kind)
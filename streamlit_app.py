@@ -1,14 +1,14 @@
 import streamlit as st
 import os
-from create_invoice_excel import create_invoice_dataframe, format_excel
-import pandas as pd
+from create_invoice_excel import create_invoice_tables, excel_writer, write_invoice_sheets
+from reconciliation import RECONCILIATION_ENABLED, reconcile
+from sheet_schema import ANOMALIES, INVOICE_KEY
 from datetime import datetime
 import pytz
 import json
 from pathlib import Path
-from pdf_extractor import extract_text_from_pdf
-from data_extractor import extract_data
-import tempfile
+from pdf_extractor import extract_texts_from_pdfs
+from invoice_splitter import iter_parsed_invoices, split_invoices
 
 # Set page configuration (must be the first Streamlit command)
 st.set_page_config(
@@ -37,70 +37,29 @@ if uploaded_files:
                 # Traiter directement les fichiers uploadés sans les sauvegarder
                 all_invoices_data = {}
 
-                for uploaded_file in uploaded_files:
-                    try:
-                        # Créer un fichier temporaire pour l'extraction
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
-                            tmp_path = tmp_file.name
+                # Extraire le texte de tous les PDF en parallèle, directement
+                # depuis le contenu des uploads (sans fichier temporaire)
+                all_pages_text = extract_texts_from_pdfs(
+                    [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+                )
 
-                        # Extraire le texte du PDF
-                        pages_text = extract_text_from_pdf(tmp_path)
+                for uploaded_file, pages_text in zip(uploaded_files, all_pages_text):
+                    try:
                         if not pages_text:
                             st.error(f"Impossible d'extraire le texte de {uploaded_file.name}")
                             continue
 
-                        # Fusionner le texte de toutes les pages
-                        combined_text = "\n\n".join(pages_text)
+                        # Découper le PDF en factures (il peut en contenir plusieurs),
+                        # puis classer et analyser chacune une seule fois
+                        invoices = split_invoices(enumerate(pages_text), uploaded_file.name)
+                        for invoice, _, data in iter_parsed_invoices(invoices):
+                            # Ajouter au dictionnaire principal
+                            all_invoices_data[invoice.key] = {
+                                'text': invoice.text,
+                                'data': data
+                            }
 
-                        # Déterminer le type de facture
-                        is_internet = "UGS" in combined_text
-                        is_acompte = "Facture d'acompte" in combined_text
-
-                        if is_internet:
-                            facture_type = "internet"
-                        elif is_acompte:
-                            facture_type = "acompte"
-                        else:
-                            facture_type = "meg"
-
-                        # Extraire les données structurées
-                        extracted_data = extract_data(combined_text, facture_type)
-
-                        # Structure de base pour les données
-                        data = {
-                            'type': facture_type,
-                            'articles': extracted_data.get('articles', []),
-                            'TOTAL': extracted_data.get('TOTAL', {
-                                'total_ht': 0,
-                                'total_ttc': 0,
-                                'tva': 0,
-                                'remise': 0
-                            }),
-                            'frais_expedition': extracted_data.get('frais_expedition', {
-                                'montant': 0,
-                                'description': ''
-                            }),
-                            'client_name': extracted_data.get('client_name', ''),
-                            'numero_facture': extracted_data.get('numero_facture', ''),
-                            'date_facture': extracted_data.get('date_facture', ''),
-                            'date_commande': extracted_data.get('date_commande', ''),
-                            'commentaire': extracted_data.get('commentaire', ''),
-                            'Type_Vente': extracted_data.get('Type_Vente', ''),
-                            'Réseau_Vente': extracted_data.get('Réseau_Vente', ''),
-                            'nombre_articles': len(extracted_data.get('articles', []))
-                        }
-
-                        # Ajouter au dictionnaire principal
-                        all_invoices_data[uploaded_file.name] = {
-                            'text': combined_text,
-                            'data': data
-                        }
-
-                        st.success(f"✓ {uploaded_file.name} traité avec succès")
-
-                        # Nettoyer le fichier temporaire
-                        os.unlink(tmp_path)
+                            st.success(f"✓ {invoice.key} traité avec succès")
 
                     except Exception as e:
                         st.error(f"Erreur lors du traitement de {uploaded_file.name}: {str(e)}")
@@ -109,15 +68,12 @@ if uploaded_files:
                 # Vérifier si des données ont été trouvées
                 if all_invoices_data:
                     try:
-                        df = create_invoice_dataframe(all_invoices_data)
+                        df, articles = create_invoice_tables(all_invoices_data)
 
                         if not df.empty:
-                            # Correction spécifique pour les factures 990 et 994 dans le DataFrame
-                            for index, row in df.iterrows():
-                                if "990" in str(row['N° Syst.']) or "994" in str(row['N° Syst.']):
-                                    if row['Credit TTC'] > 0:
-                                        df.at[index, 'solde'] = row['Credit TTC']
-                                        st.info(f"Correction solde pour {row['N° Syst.']} - Nouveau solde: {row['Credit TTC']} €")
+                            # Corrections déclarées dans correction_rules (appliquées par create_invoice_tables)
+                            for rule_name, row in df.attrs.get('corrections', []):
+                                st.info(f"Correction '{rule_name}' appliquée à {df[INVOICE_KEY].iat[row]}")
 
                             # Générer le nom du fichier avec timestamp
                             paris_tz = pytz.timezone('Europe/Paris')
@@ -129,9 +85,15 @@ if uploaded_files:
                             os.makedirs('temp_files', exist_ok=True)
                             excel_path = os.path.join('temp_files', filename)
 
-                            with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-                                df.to_excel(writer, sheet_name='Factures', index=False)
-                                format_excel(writer, df)
+                            # Rapprochement des montants (feuille Anomalies)
+                            anomalies = reconcile(df, articles) if RECONCILIATION_ENABLED else None
+                            if anomalies is not None and not anomalies.empty:
+                                st.warning(f"{len(anomalies)} anomalie(s) de montants à vérifier "
+                                           f"(feuille {ANOMALIES.name} du classeur)")
+                                st.dataframe(anomalies)
+
+                            with excel_writer(excel_path) as writer:
+                                write_invoice_sheets(writer, df, articles, anomalies)
 
                             # Proposer le téléchargement via Streamlit
                             with open(excel_path, 'rb') as f:
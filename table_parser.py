@@ -0,0 +1,207 @@
+import os
+import re
+from typing import Dict, List, Optional
+from invoice_model import parse_decimal
+
+# Active le parseur par coordonnées pour les articles MEG dans create_invoice_excel
+TABLE_PARSER_ENABLED = os.environ.get("PDF_TABLE_PARSER") == "1"
+
+# En-têtes du tableau des articles MEG : colonne -> libellés possibles de l'en-tête
+COLUMN_HEADERS = (
+    ('libelle', ("Libellé", "Désignation")),
+    ('quantite', ("Qté", "Quantité")),
+    ('prix_unitaire', ("P.U.", "PU", "Prix")),
+    ('remise', ("Remise",)),
+    ('montant_ht', ("Montant",)),
+    ('tva', ("TVA",)),
+)
+
+# Premiers mots des lignes qui terminent le tableau
+TABLE_END_WORDS = ("Détail", "Total", "Echéance(s)", "Échéance(s)")
+
+# Écart vertical maximal (en points) entre deux mots d'une même ligne
+LINE_TOLERANCE = 3
+
+# Référence au format XXXX-XXXXXX-XXXX en tête du libellé
+_REFERENCE = re.compile(r'([A-Z0-9]+-[A-Z0-9]+-[A-Z0-9]+)\s*-\s*(.*)')
+
+# Symboles isolés qui ne portent pas de valeur et débordent sur la colonne voisine
+_SYMBOLS = {"€", "%"}
+
+def page_words(page):
+    """
+    Mots d'une page pdfplumber réduits aux champs utiles au parseur.
+
+    Les coordonnées sont arrondies pour garder les mots compacts en cache.
+    """
+    return [
+        {
+            'text': word['text'],
+            'x0': round(word['x0'], 1),
+            'x1': round(word['x1'], 1),
+            'top': round(word['top'], 1)
+        }
+        for word in page.extract_words()
+    ]
+
+def group_lines(words):
+    """Regroupe les mots en lignes (de haut en bas, de gauche à droite)"""
+    lines = []
+    for word in sorted(words, key=lambda word: (word['top'], word['x0'])):
+        if lines and word['top'] - lines[-1][0]['top'] <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    for line in lines:
+        line.sort(key=lambda word: word['x0'])
+    return lines
+
+def _header_position(line, labels):
+    """Centre horizontal du premier libellé d'en-tête trouvé dans la ligne"""
+    for word in line:
+        if word['text'] in labels:
+            return (word['x0'] + word['x1']) / 2
+    return None
+
+def detect_columns(line):
+    """
+    Calcule les plages horizontales des colonnes à partir de la ligne d'en-tête.
+
+    Les montants étant alignés à droite, ils débordent de leur en-tête : une
+    colonne s'étend jusqu'à mi-chemin des centres des en-têtes voisins. Le
+    libellé s'arrête une demi-colonne avant le centre de la première colonne
+    numérique.
+
+    Returns:
+        list: [(colonne, x début, x fin)] de gauche à droite, ou None si la
+        ligne n'est pas l'en-tête du tableau des articles
+    """
+    centers = []
+    for column, labels in COLUMN_HEADERS:
+        center = _header_position(line, labels)
+        if center is None:
+            return None
+        centers.append((column, center))
+    centers.sort(key=lambda item: item[1])
+    if centers[0][0] != 'libelle':
+        return None
+
+    first_width = centers[2][1] - centers[1][1]
+    bounds = [centers[1][1] - first_width / 2]
+    for (_, left), (_, right) in zip(centers[1:], centers[2:]):
+        bounds.append((left + right) / 2)
+
+    starts = [float('-inf')] + bounds
+    ends = bounds + [float('inf')]
+    return [(column, start, end) for (column, _), start, end in zip(centers, starts, ends)]
+
+def _split_cells(line, columns):
+    """Répartit les mots d'une ligne dans les colonnes d'après leur centre"""
+    cells = {}
+    for word in line:
+        if word['text'] in _SYMBOLS:
+            continue
+        center = (word['x0'] + word['x1']) / 2
+        for column, start, end in columns:
+            if start <= center < end:
+                cells.setdefault(column, []).append(word['text'])
+                break
+    return {column: " ".join(texts) for column, texts in cells.items()}
+
+
+def _build_article(libelle, cells):
+    """Construit un article au format de data_extractor.extract_articles"""
+    match = _REFERENCE.match(libelle)
+    reference = match.group(1)
+    tva_taux = parse_decimal(cells.get('tva', ''))
+    # Les articles CADEAU ne sont pas soumis à la TVA
+    if "CADEAU" in reference.upper():
+        tva_taux = 0.0
+    return {
+        'reference': reference,
+        'description': match.group(2).strip(),
+        'quantite': parse_decimal(cells.get('quantite', '')),
+        'prix_unitaire': parse_decimal(cells.get('prix_unitaire', '')),
+        'remise': parse_decimal(cells.get('remise', '')) / 100,
+        'montant_ht': parse_decimal(cells.get('montant_ht', '')),
+        'tva': tva_taux
+    }
+
+def extract_page_articles(words) -> Optional[List[Dict]]:
+    """
+    Extrait les articles MEG d'une page à partir de la position des mots.
+
+    Les colonnes sont détectées une fois sur la ligne d'en-tête, puis chaque
+    mot est affecté à sa cellule en un seul passage. Une ligne sans montants
+    sous un article prolonge sa description (libellé sur plusieurs lignes).
+
+    Args:
+        words: Mots de la page (dicts avec text, x0, x1 et top), par exemple
+            issus de page_words() ou de page.extract_words()
+
+    Returns:
+        list: Articles de la page, ou None si la page n'a pas d'en-tête de tableau
+    """
+    columns = None
+    articles = []
+    current = None  # (libellé, cellules numériques) de l'article en cours
+    previous_top = None
+    max_gap = None
+
+    for line in group_lines(words):
+        top = line[0]['top']
+        if columns is None:
+            columns = detect_columns(line)
+            previous_top = top
+            continue
+        if line[0]['text'] in TABLE_END_WORDS:
+            break
+        # L'interligne entre l'en-tête et la première ligne sert de référence :
+        # une ligne plus éloignée (pied de page...) ne prolonge pas l'article en cours
+        if max_gap is None:
+            max_gap = (top - previous_top) * 1.5
+        contiguous = top - previous_top <= max_gap
+        previous_top = top
+
+        cells = _split_cells(line, columns)
+        libelle = cells.pop('libelle', "")
+        if _REFERENCE.match(libelle):
+            if current and current[1]:
+                articles.append(_build_article(*current))
+            current = (libelle, cells)
+        elif current and contiguous:
+            # Suite du libellé, et montants centrés verticalement sur un libellé sur deux lignes
+            if libelle:
+                current = (f"{current[0]} {libelle}", current[1])
+            for column, value in cells.items():
+                current[1].setdefault(column, value)
+        else:
+            if current and current[1]:
+                articles.append(_build_article(*current))
+            current = None
+
+    if columns is None:
+        return None
+    if current and current[1]:
+        articles.append(_build_article(*current))
+    return articles
+
+def extract_table_articles(pages_words) -> Optional[List[Dict]]:
+    """
+    Extrait les articles MEG de toutes les pages d'une facture.
+
+    Args:
+        pages_words: Liste des mots de chaque page
+
+    Returns:
+        list: Articles dans l'ordre des pages, ou None si aucune page n'a
+        d'en-tête de tableau (le parseur par expressions régulières prend alors le relais)
+    """
+    articles = None
+    for words in pages_words:
+        page_articles = extract_page_articles(words)
+        if page_articles is not None:
+            if articles is None:
+                articles = []
+            articles.extend(page_articles)
+    return articles
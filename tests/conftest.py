@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Les modules du dépôt sont importés directement (pas de paquet), sans cache
+# disque des factures analysées ni export Parquet
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("PARSE_CACHE", "0")
+os.environ.setdefault("PARQUET_EXPORT", "0")
@@ -0,0 +1,51 @@
+from anchor_index import AnchorIndex
+
+HEADER = "FACTURE\nN° : FAC00000001\nN° client : C001\n"
+TABLE = "Libellé Qté PU HT\nART001 - Planche 1,00 100,00 €\n"
+VAT = "Détail de la TVA\n20,00 % 100,00 20,00\n"
+TOTALS = "Total HT 100,00\nTotal TTC 120,00\n"
+
+def spans(text, index, name):
+    start, end = index.section(name)
+    return text[start:end]
+
+def test_sections_of_a_single_page_invoice():
+    text = HEADER + TABLE + VAT + TOTALS
+    index = AnchorIndex(text)
+    assert spans(text, index, 'entete') == HEADER
+    assert spans(text, index, 'articles') == TABLE
+    assert spans(text, index, 'totaux') == VAT + TOTALS
+    assert index.section('document') == (0, len(text))
+
+def test_missing_anchors_cover_the_whole_text():
+    text = "Texte sans ancrage\n"
+    index = AnchorIndex(text)
+    for name in ('entete', 'articles', 'totaux'):
+        assert index.section(name) == (0, len(text))
+
+def test_articles_extend_to_the_last_vat_detail_of_a_multi_page_invoice():
+    second_table = "Libellé Qté PU HT\nART002 - Leash 1,00 20,00 €\n"
+    text = HEADER + TABLE + VAT + "Page 1 de 2\n" + second_table + VAT + TOTALS
+    index = AnchorIndex(text)
+    articles = spans(text, index, 'articles')
+    assert articles.startswith(TABLE)
+    assert "ART002" in articles
+    assert articles.endswith(second_table)
+
+def test_articles_extend_to_the_end_without_a_later_vat_detail():
+    second_table = "Libellé Qté PU HT\nART002 - Leash 1,00 20,00 €\n"
+    text = HEADER + TABLE + VAT + second_table + TOTALS
+    index = AnchorIndex(text)
+    assert index.section('articles') == (len(HEADER), len(text))
+
+def test_internet_articles_start_at_the_line_before_the_first_ugs():
+    text = "N° de facture : 2025-00001\nJonc de surf\nUGS : LEPF-JONC00-5000\nSous-total 50,00 €\n"
+    index = AnchorIndex(text)
+    assert spans(text, index, 'articles') == "Jonc de surf\nUGS : LEPF-JONC00-5000\n"
+    assert spans(text, index, 'totaux') == "Sous-total 50,00 €\n"
+
+def test_pages_split_at_page_markers():
+    text = "page un\nPage 1 de 2\npage deux\nPage 2 de 2\nfin"
+    index = AnchorIndex(text)
+    assert [text[start:end] for start, end in index.pages()] == ["page un\n", "\npage deux\n", "\nfin"]
+    assert AnchorIndex("sans marqueur").pages() == []
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from correction_rules import CORRECTIONS, CorrectionRule, CorrectionRules
+from create_invoice_excel import build_invoice_frames
+from invoice_frame import articles_from_slots
+from sheet_schema import MAX_ARTICLES
+
+def invoice(client, quantity, numero=''):
+    """Facture internet d'un seul article (jonc à 10 € TTC)"""
+    return {'data': {
+        'type': 'internet', 'numero_facture': numero, 'client_name': client,
+        'articles': [{'reference': 'LEPF-JONC00-5000', 'quantite': quantity, 'prix_unitaire': 10.0,
+                      'montant_ht': 10.0 * quantity, 'taux_tva': 20.0}],
+        'TOTAL': {'total_ht': 10.0 * quantity, 'total_ttc': 12.0 * quantity, 'tva': 2.0 * quantity, 'remise': 0},
+    }}
+
+def frames(invoices_data, layout):
+    """Feuilles Factures et Articles (None en disposition large), sans les corrections connues"""
+    return build_invoice_frames(invoices_data, article_slots=MAX_ARTICLES if layout == 'wide' else 0)
+
+def quantities(df, articles):
+    """Quantités des articles, par facture"""
+    if articles is None:
+        articles = articles_from_slots(df)
+    return articles.groupby(level=0)['q'].sum().to_dict()
+
+# Deux factures sans numéro : le N° Syst. vide ne doit pas les confondre
+INVOICES = {'a.pdf': invoice('Alice', 1), 'b.pdf': invoice('Bob', 2)}
+
+@pytest.mark.parametrize('layout', ['wide', 'articles'])
+def test_article_override_only_touches_the_matched_invoice(layout):
+    df, articles = frames(INVOICES, layout)
+    rules = CorrectionRules([CorrectionRule('quantité Alice', 'client', ('alice ',), {'q': 5})])
+
+    assert rules.apply(df, articles) == [('quantité Alice', 0)]
+    assert quantities(df, articles) == {0: 5, 1: 2}
+
+@pytest.mark.parametrize('layout', ['wide', 'articles'])
+def test_reference_rule_reports_invoice_rows(layout):
+    df, articles = frames(INVOICES, layout)
+    rules = CorrectionRules([CorrectionRule('prix jonc', 'reference', ('lepf-jonc00-5000',), {'prix': 9.0})])
+
+    assert rules.apply(df, articles) == [('prix jonc', 0), ('prix jonc', 1)]
+    prices = (articles if articles is not None else articles_from_slots(df))['prix']
+    assert (prices == 9.0).all()
+
+@pytest.mark.parametrize('layout', ['wide', 'articles'])
+def test_invoice_override_by_numero(layout):
+    df, articles = frames({'a.pdf': invoice('Alice', 1, '2025-00001'), 'b.pdf': invoice('Bob', 2)}, layout)
+    rules = CorrectionRules([CorrectionRule('client', 'numero', ('2025-00001',), {'Client': 'ALICE SARL'})])
+
+    assert rules.apply(df, articles) == [('client', 0)]
+    assert df['Client'].tolist() == ['ALICE SARL', 'Bob']
+
+@pytest.mark.parametrize('layout', ['wide', 'articles'])
+def test_solde_copies_the_total_only_when_positive(layout):
+    invoices = {'990.pdf': invoice('Alice', 1, 'FAC00000990'), '994.pdf': invoice('Bob', 0, 'FAC00000994')}
+    df, articles = frames(invoices, layout)
+    df['solde'] = np.nan
+
+    assert CORRECTIONS.apply(df, articles) == [('solde 990/994', 0)]
+    assert df['solde'].iloc[0] == df['Credit TTC'].iloc[0] == 12.0
+    assert np.isnan(df['solde'].iloc[1])
+
+def test_empty_sheet_and_unknown_key():
+    df, articles = frames({}, 'articles')
+    assert CORRECTIONS.apply(df, articles) == []
+    with pytest.raises(ValueError):
+        CorrectionRule('inconnue', 'montant', ('1',))
+
+def test_matches():
+    assert CORRECTIONS.matches('fac00000990', '', [])
+    assert not CORRECTIONS.matches('FAC00000991', 'Alice', ['LEPF-JONC00-5000'])
@@ -0,0 +1,46 @@
+from invoice_classifier import InvoiceClassifier
+from invoice_engine import classify, classify_pages
+
+MEG_PAGE = "FACTURE\nN° : FAC00000001\nN° client : C001\nLibellé Qté PU HT\nDétail de la TVA\n"
+
+def pages_read(pages, read):
+    """Générateur de pages qui note chaque page lue"""
+    for page in pages:
+        read.append(page)
+        yield page
+
+def test_classify_keywords():
+    assert classify("Commande\nUGS : LEPF-JONC00-5000\n") == 'internet'
+    assert classify("Facture d'acompte\nAcompte de 30 %\n") == 'acompte'
+    assert classify(MEG_PAGE) == 'meg'
+    assert classify("") == 'meg'
+
+def test_ugs_wins_over_acompte():
+    assert classify("Facture d'acompte\nUGS : ABC\n") == 'internet'
+
+def test_meg_invoice_is_read_to_the_end():
+    # Une confiance MEG élevée dès la première page ne suffit pas : meg n'est que le type par défaut
+    pages = [MEG_PAGE, "UGS : LEPF-JONC00-5000\n"]
+    result = classify_pages(pages)
+    assert (result.type, result.pages_scanned) == ('internet', 2)
+    assert result.type == classify("\n\n".join(pages))
+
+def test_acompte_invoice_is_read_to_the_end():
+    pages = ["Facture d'acompte\n", "UGS : ABC\n"]
+    assert classify_pages(pages).type == classify("\n\n".join(pages)) == 'internet'
+
+def test_reading_stops_on_ugs():
+    read = []
+    result = classify_pages(pages_read(["UGS : ABC\n", MEG_PAGE, MEG_PAGE], read))
+    assert (result.type, result.confidence, result.pages_scanned) == ('internet', 1.0, 1)
+    assert len(read) == 1
+
+def test_stop_early_false_reads_every_page():
+    result = InvoiceClassifier().classify_pages(["UGS : ABC\n", MEG_PAGE], stop_early=False)
+    assert (result.type, result.pages_scanned) == ('internet', 2)
+
+def test_meg_confidence_grows_with_evidence():
+    weak = classify_pages(["Echéance(s)\n"])
+    strong = classify_pages([MEG_PAGE])
+    assert weak.type == strong.type == 'meg'
+    assert weak.confidence < strong.confidence
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from jobs import DONE, FAILED, QUEUED, RESULT_NAME, JobManager, JobStore, progress
+
+def parse_file(name, path):
+    """Analyse factice (processus du pool) : une facture par ligne du fichier"""
+    content = path.read_text(encoding='utf-8')
+    if content == 'erreur':
+        raise ValueError(f"{name} illisible")
+    return {f"{name}_{line}": {'data': {'numero_facture': line}} for line in content.split()}
+
+def write_results(invoices, path):
+    path.write_text(json.dumps(list(invoices)), encoding='utf-8')
+    return path
+
+def wait(store, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = store.get(job_id)
+        if state['status'] in (DONE, FAILED):
+            return state
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / 'jobs')
+
+@pytest.fixture
+def manager(store):
+    manager = JobManager(store, parse_file, write_results, concurrency=1, workers=1)
+    yield manager
+    manager.shutdown()
+
+def test_create_get_update(store):
+    state = store.create([('a.pdf', b'1 2'), ('b.pdf', b'3')])
+    job_id = state['id']
+
+    assert store.get(job_id) == state
+    assert state['status'] == QUEUED
+    assert [file['name'] for file in state['files']] == ['a.pdf', 'b.pdf']
+    assert store.input_path(job_id, 1).read_bytes() == b'3'
+
+    store.update(job_id, 0, status=DONE, invoices=2)
+    state = store.update(job_id, status=DONE, result=RESULT_NAME)
+    assert store.get(job_id) == state
+    assert (state['files'][0]['status'], state['files'][1]['status']) == (DONE, QUEUED)
+    assert progress(state) == {'files_done': 1, 'files_total': 2, 'invoices': 2}
+    assert [job['id'] for job in store.all()] == [job_id]
+
+@pytest.mark.parametrize('job_id', ['inconnu', '../jobs', '0' * 32])
+def test_unknown_job(store, job_id):
+    assert store.get(job_id) is None
+
+def test_purge_removes_expired_finished_jobs(store):
+    old = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat(timespec='seconds')
+    expired = store.create([('a.pdf', b'1')])['id']
+    store.update(expired, status=DONE)
+    running = store.create([('b.pdf', b'1')])['id']
+    recent = store.create([('c.pdf', b'1')])['id']
+    store.update(recent, status=FAILED)
+    for job_id in (expired, running):
+        state = store.get(job_id)
+        state['updated_at'] = old
+        store._write(state)
+    # Dossier d'une tâche dont la création a été interrompue
+    orphan = store.root / ('f' * 32)
+    orphan.mkdir()
+    os.utime(orphan, (0, 0))
+
+    assert store.purge(timedelta(hours=24)) == 2
+    assert {job['id'] for job in store.all()} == {running, recent}
+    assert not orphan.exists()
+
+def test_job_runs_to_completion(store, manager):
+    state = manager.submit([('a.pdf', b'1 2'), ('b.pdf', b'erreur'), ('c.pdf', b'3')])
+    state = wait(store, state['id'])
+
+    assert state['status'] == DONE
+    assert [file['status'] for file in state['files']] == [DONE, FAILED, DONE]
+    assert state['files'][1]['error'] == "b.pdf illisible"
+    assert progress(state) == {'files_done': 3, 'files_total': 3, 'invoices': 3}
+    assert json.loads(store.result_path(state['id']).read_text()) == ['a.pdf_1', 'a.pdf_2', 'c.pdf_3']
+
+def test_job_without_invoices_fails(store, manager):
+    state = wait(store, manager.submit([('a.pdf', b'')])['id'])
+    assert state['status'] == FAILED
+    assert state['error'] == "No invoice found in the uploaded files"
+
+def test_resume_only_parses_pending_files(store, manager):
+    job_id = store.create([('a.pdf', b'1'), ('b.pdf', b'2')])['id']
+    # Premier fichier analysé avant l'arrêt du serveur : son PDF n'est plus relu
+    store.parsed_path(job_id, 0).write_text(json.dumps({'a.pdf_déjà': {}}), encoding='utf-8')
+    store.update(job_id, 0, status=DONE, invoices=1)
+    store.input_path(job_id, 0).write_bytes(b'erreur')
+
+    assert manager.resume() == 1
+    state = wait(store, job_id)
+    assert state['status'] == DONE
+    assert json.loads(store.result_path(job_id).read_text()) == ['a.pdf_déjà', 'b.pdf_2']
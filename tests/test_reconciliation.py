@@ -0,0 +1,66 @@
+import pytest
+from create_invoice_excel import build_invoice_frames, create_invoice_tables
+from excel_stream import StreamingExcelWriter
+from reconciliation import (CHECK_ARTICLES, CHECK_COMPUTED, CHECK_TOTALS, reconcile,
+                            reconciliation_report)
+from sheet_schema import ANOMALY_ROW, ARTICLES, FACTURES_NORMALISEES, MAX_ARTICLES
+
+def invoice(client, ht, tva, ttc, lines, numero=''):
+    """Facture MEG : un article par montant HT de lines, TVA à 20 %"""
+    return {'data': {
+        'type': 'meg', 'numero_facture': numero, 'client_name': client,
+        'articles': [{'reference': f'ART{index}', 'description': 'Article', 'quantite': 1, 'prix_unitaire': amount,
+                      'montant_ht': amount, 'tva': 20.0} for index, amount in enumerate(lines)],
+        'TOTAL': {'total_ht': ht, 'total_ttc': ttc, 'tva': tva, 'remise': 0},
+    }}
+
+# Factures sans numéro : les anomalies sont repérées par leur rang, pas par le N° Syst.
+INVOICES = {
+    'ok.pdf': invoice('A', 100, 20, 120, [60, 40]),
+    'ttc.pdf': invoice('B', 100, 20, 130, [100]),
+    'articles.pdf': invoice('C', 100, 20, 120, [90]),
+    'calcul.pdf': invoice('D', 100, 20, 0, [100]),
+}
+
+def frames(invoices_data, layout):
+    return build_invoice_frames(invoices_data, article_slots=MAX_ARTICLES if layout == 'wide' else 0)
+
+@pytest.mark.parametrize('layout', ['wide', 'articles'])
+def test_anomalies_are_located_by_invoice_row(layout):
+    df, articles = frames(INVOICES, layout)
+    anomalies = reconcile(df, articles)
+
+    found = dict(zip(anomalies['contrôle'], anomalies[ANOMALY_ROW]))
+    assert found == {CHECK_TOTALS: 2, CHECK_ARTICLES: 3, CHECK_COMPUTED: 4}
+    assert anomalies['écart'].abs().is_monotonic_decreasing
+
+def test_computed_amounts_are_reported_but_not_reconciled():
+    df, articles = frames({'calcul.pdf': invoice('D', 100, 20, 0, [100])}, 'articles')
+    assert df.attrs['montants_calculés'] == {'Credit TTC': [0]}
+
+    anomalies = reconcile(df, articles)
+    assert anomalies['contrôle'].tolist() == [CHECK_COMPUTED]
+    assert anomalies['détail'].iloc[0] == "Credit TTC non extrait, calculé : 120.00 €"
+
+def test_tolerance():
+    df, articles = frames({'ttc.pdf': invoice('B', 100, 20, 120.02, [100])}, 'articles')
+    assert reconcile(df, articles).empty
+    assert reconcile(df, articles, tolerance=0.01)['contrôle'].tolist() == [CHECK_TOTALS]
+
+def test_report_counts_invoices_by_row():
+    df, articles = frames(INVOICES, 'articles')
+    report = reconciliation_report(reconcile(df, articles), len(df))
+
+    assert (report['factures'], report['factures_en_anomalie'], report['anomalies']) == (4, 3, 3)
+    assert report['contrôles'][CHECK_TOTALS] == 1
+
+def test_streamed_anomalies_are_located_in_the_whole_sheet(tmp_path):
+    build = lambda invoices: create_invoice_tables(invoices, layout='articles')
+    with StreamingExcelWriter(tmp_path / 'factures.xlsx', build, FACTURES_NORMALISEES, ARTICLES,
+                              chunk_size=2, reconcile=reconcile) as writer:
+        for key, entry in INVOICES.items():
+            writer.write_invoice(key, entry)
+
+    anomalies = writer.anomalies
+    assert writer.rows == 4
+    assert sorted(anomalies[ANOMALY_ROW]) == [2, 3, 4]